@@ -67,8 +67,23 @@ mkdir -p packages
 cd lambda-code
 cp ../local/aws_quotas.py .
 cp ../local/quota_update_dynamo.py .
-zip ../packages/quota_guard_1.0.0.zip index.py aws_quotas.py quota_update_dynamo.py tests/*
-rm aws_quotas.py quota_update_dynamo.py
+cp ../local/rate_limiter.py .
+cp ../local/quota_scheduler.py .
+cp ../local/quota_history.py .
+cp ../local/quota_alerts.py .
+cp ../local/quota_stream.py .
+cp ../local/quota_specs.py .
+cp ../local/quota_planner.py .
+cp ../local/quota_dependencies.json .
+cp ../local/quota_collectors.py .
+cp ../local/quota_cache.py .
+cp ../local/quota_counters.py .
+cp ../local/quota_breaches.py .
+cp ../local/quota_iam_digests.py .
+cp ../local/quota_resources.py .
+cp ../local/quota_sinks.py .
+zip ../packages/quota_guard_1.0.0.zip index.py aws_quotas.py quota_update_dynamo.py rate_limiter.py quota_scheduler.py quota_history.py quota_alerts.py quota_stream.py quota_specs.py quota_planner.py quota_dependencies.json quota_collectors.py quota_cache.py quota_counters.py quota_breaches.py quota_iam_digests.py quota_resources.py quota_sinks.py tests/*
+rm aws_quotas.py quota_update_dynamo.py rate_limiter.py quota_scheduler.py quota_history.py quota_alerts.py quota_stream.py quota_specs.py quota_planner.py quota_dependencies.json quota_collectors.py quota_cache.py quota_counters.py quota_breaches.py quota_iam_digests.py quota_resources.py quota_sinks.py
 cd ..
 
 
@@ -10,11 +10,15 @@ import inspect
 # Missing this line:
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'local'))
 import quota_update_dynamo
+import quota_scheduler
+import quota_specs
+import quota_planner
+import quota_cache
+import quota_counters
+import quota_iam_digests
+import quota_sinks
 import aws_quotas
 
-# Inject updateQuotaUsage function into aws_quotas module
-aws_quotas.updateQuotaUsage = quota_update_dynamo.updateQuotaUsage
-
 # Setup logger
 # Setup logging
 logger = logging.getLogger()
@@ -36,10 +40,39 @@ eventbridge = boto3.client('events')
 bucket = os.environ['SERVICEQUOTA_BUCKET']
 quotaUsageTable = os.environ['DDB_TABLE']
 eventBus = os.environ['EVENT_BUS']
+# Optional table enabling adaptive scheduling; every check runs on every tick when unset
+scheduleTable = os.environ.get('SCHEDULE_TABLE', '')
+# Optional table of incremental counters fed by CloudTrail events; covered quotas are read from it
+# in the regions whose events reach this function, with a full reconcile scan every COUNTER_RECONCILE_MINUTES
+counterTable = os.environ.get('COUNTER_TABLE', '')
+counterEventRegions = os.environ.get('COUNTER_EVENT_REGIONS', os.environ.get('AWS_REGION', '')).split(',')
+# Optional table of IAM user digests and counts; per-user quotas then only recompute the changed users,
+# with a full scan every IAM_FULL_SCAN_MINUTES
+iamDigestTable = os.environ.get('IAM_DIGEST_TABLE', '')
+# Comma-separated sinks receiving the quota usages: dynamodb (with history and alerts), stdout
+sinkNames = os.environ.get('QUOTA_SINKS', 'dynamodb')
 
 logger.info("Loading function")
 
 
+def runChecks(checks, counters=None):
+    """
+    Run the checks of one evaluation stage of the execution plan
+    :param checks: List of quota_planner.Check (several only for spec quotas sharing a source)
+    :param counters: quota_counters.CounterEvaluator answering covered quotas from their counters
+    :return: None
+    """
+    if counters:
+        checks = [check for check in checks if not counters.evaluate(check.serviceCode, check.quotaCode, check.threshold, check.region, aws_quotas.updateQuotaUsage)]
+    if not checks:
+        return
+    if len(checks) > 1:
+        quota_specs.evaluate([(check.serviceCode, check.quotaCode, check.threshold) for check in checks], checks[0].region, aws_quotas.updateQuotaUsage)
+        return
+    for check in checks:
+        logger.info(f"Running function: {check.functionName} for region {check.region}")
+        getattr(aws_quotas, check.functionName)(serviceCode=check.serviceCode, quotaCode=check.quotaCode, threshold=check.threshold, region=check.region)
+
 
 
 def lambda_handler(event, context):
@@ -50,35 +83,85 @@ def lambda_handler(event, context):
     :return: a json response object with statusMessage 'OK' when succesfull
     """
     logger.info(f"Running lambda handler with event: {json.dumps(event,indent=2)}")
+    if event.get('detail-type') == quota_counters.CLOUDTRAIL_DETAIL_TYPE:
+        # Create/delete API call: adjust the counters, quotas are reported on the next scheduled run
+        if counterTable:
+            quota_counters.applyEvent(event, quota_counters.DynamoCounterStore(counterTable))
+        return {
+                'isBase64Encoded': False,
+                'statusCode': 200,
+                'headers': {},
+                'multiValueHeaders': {},
+                'body': '{"statusMessage": "OK" }'
+            }
     key = os.environ['QUOTALIST_FILE']
     response = s3.get_object(Bucket = bucket, Key = key)
     content = response['Body']
     jsonObject = json.loads(content.read())
     logger.info(f"Using the following config: {json.dumps(jsonObject,indent=2)}")
-    
+    # Enumerations cached by a warm container are reused within their CacheTTLMinutes, unless the
+    # event asks for a refresh
+    quota_cache.configure(jsonObject, forceRefresh=bool(event.get('forceRefresh')))
+
+    scheduler = None
+    if scheduleTable:
+        # The growth rate comes from the usage history (HISTORY_TABLE) the DynamoDB writer appends to
+        scheduler = quota_scheduler.QuotaScheduler(quota_scheduler.DynamoScheduleStore(scheduleTable), quota_update_dynamo.historyStore)
+
+    # Collect the due checks, then run them in the order of the execution plan so checks
+    # reading the same APIs run back to back and share their responses
+    checks = []
+    currentRegion= os.environ['AWS_REGION']
+    regionList = os.environ['REGION_LIST']
+    regions= regionList.split(',')
     for quotaObject in jsonObject:
         logger.info(f"Processing: {quotaObject}")
         serviceCodeValue = quotaObject['ServiceCode']
         quotaCodeValue = quotaObject['QuotaCode']
         thresholdValue = quotaObject['Threshold']
         QuotaReportingFunc = quotaCodeValue.replace("-", "_")
-        logger.info(f"Running function: {QuotaReportingFunc}")
-        currentRegion= os.environ['AWS_REGION']
-        regionList = os.environ['REGION_LIST']
-        regions= regionList.split(',')
         if(quotaObject['QuotaAppliedAtLevel'] == 'Regional'):
-            for region in regions:
-                logger.debug("Pulling Quotas for ",region)
-                if hasattr(aws_quotas,QuotaReportingFunc):
-                    getattr(aws_quotas, QuotaReportingFunc)(serviceCode=serviceCodeValue,quotaCode=quotaCodeValue, threshold=thresholdValue, region=region)
-                else:
-                    logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {region}")
+            checkRegions = regions
         else:
-            logger.debug("Pulling Quotas for current region ",currentRegion)
+            checkRegions = [currentRegion]
+        for region in checkRegions:
+            if scheduler and not scheduler.isDue(quotaCodeValue, region, thresholdValue):
+                logger.info(f"Skipping {quotaCodeValue} for region {region}: not due yet")
+                continue
             if hasattr(aws_quotas,QuotaReportingFunc):
-                    getattr(aws_quotas, QuotaReportingFunc)(serviceCode=serviceCodeValue,quotaCode=quotaCodeValue, threshold=thresholdValue, region=currentRegion)
+                checks.append(quota_planner.Check(serviceCodeValue, quotaCodeValue, thresholdValue, region))
             else:
-                logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {currentRegion}")
+                logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {region}")
+
+    plan = quota_planner.buildPlan(checks, quota_planner.loadManifest())
+    if event.get('plan'):
+        # Dry-run: return the plan and the estimated API call count without running any check
+        return {
+                'isBase64Encoded': False,
+                'statusCode': 200,
+                'headers': {},
+                'multiValueHeaders': {},
+                'body': json.dumps({"statusMessage": "OK", "plan": plan.describe()})
+            }
+
+    if iamDigestTable:
+        quota_iam_digests.configure(quota_iam_digests.DynamoDigestStore(iamDigestTable))
+
+    # Usages are written by a background thread while the checks run
+    quota_sinks.install(quota_sinks.buildSink(sinkNames, {
+        'dynamodb': lambda: quota_sinks.FunctionSink(quota_update_dynamo.updateQuotaUsage, quota_update_dynamo.flushAlerts),
+        'stdout': quota_sinks.StdoutJsonSink,
+    }, scheduler.wrap if scheduler else None))
+
+    counters = None
+    if counterTable:
+        counters = quota_counters.CounterEvaluator(quota_counters.DynamoCounterStore(counterTable), counterEventRegions)
+
+    try:
+        quota_planner.execute(plan, lambda stageChecks: runChecks(stageChecks, counters))
+    finally:
+        # Write the queued usages and send queued alerts even when a check fails part way through the run
+        quota_sinks.flush()
 
     response = {
                 'isBase64Encoded': False,
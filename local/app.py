@@ -6,12 +6,19 @@ import logging
 import sys
 import csv
 import quota_update_csv
+import quota_scheduler
+import quota_specs
+import quota_planner
+import quota_cache
+import quota_counters
+import quota_iam_digests
+import quota_accounts
+import quota_sinks
+import quota_alerts
+import quota_sqlite
 import aws_quotas
 from quota_update_csv import updateQuotaUsage
 from collections import defaultdict
-
-# Inject updateQuotaUsage function into aws_quotas module
-aws_quotas.updateQuotaUsage = updateQuotaUsage
 from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
 import inspect
@@ -60,11 +67,85 @@ def ensure_csv_exists():
         with open(csv_path, 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
             # Write headers
-            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp'])
+            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp', 'ResourceCount', 'ResourceListUri'])
         logger.info(f"Created new CSV file with headers at {csv_path}")
 
 # Remove duplicate function - using the one from quota_update_csv.py
 
+def run_checks(checks, counters=None):
+    """
+    Run the checks of one evaluation stage of the execution plan
+    :param checks: List of quota_planner.Check (several only for spec quotas sharing a source)
+    :param counters: quota_counters.CounterEvaluator answering covered quotas from their counters
+    :return: None
+    """
+    if counters:
+        checks = [check for check in checks if not counters.evaluate(check.serviceCode, check.quotaCode, check.threshold, check.region, aws_quotas.updateQuotaUsage)]
+    if not checks:
+        return
+    if len(checks) > 1:
+        try:
+            quota_specs.evaluate([(check.serviceCode, check.quotaCode, check.threshold) for check in checks], checks[0].region, aws_quotas.updateQuotaUsage)
+        except Exception as e:
+            logger.error(f"Error evaluating spec quotas for region {checks[0].region}: {str(e)}")
+        return
+    for check in checks:
+        logger.info(f"Running function: {check.functionName} for region {check.region}")
+        try:
+            getattr(aws_quotas, check.functionName)(serviceCode=check.serviceCode, quotaCode=check.quotaCode, threshold=check.threshold, region=check.region)
+        except Exception as e:
+            logger.error(f"Error processing quota {check.quotaCode} for region {check.region}: {str(e)}")
+            logger.info(f"Continuing with next quota...")
+
+
+def dynamodb_sink():
+    """
+    Sink writing to the DDB_TABLE quota usage table like the Lambda, with its history. Alerts are only
+    sent by the eventbridge sink, so listing both does not send them twice; the forecast and the
+    resource list URI reach it on the record.
+    :return: The sink
+    """
+    # Imported on demand, the module creates its clients and reads the Lambda environment on import
+    import quota_update_dynamo
+    return quota_sinks.StoringSink(quota_update_dynamo.storeQuotaUsage)
+
+
+def account_usage_writer(sqliteSink=None):
+    """
+    Writer of the multi-account scan results
+    :param sqliteSink: A quota_sqlite.SqliteSink also receiving the results, if any
+    :return: Function called with (accountId, records)
+    """
+    def write(accountId, records):
+        quota_update_csv.writeAccountQuotaUsage(accountId, records)
+        if sqliteSink:
+            sqliteSink.writeAccount(accountId, records)
+    return write
+
+
+def compare_counters(touched, store, currentRegion):
+    """
+    Compare the incremental counters touched by replayed events with full scans
+    :param touched: Set of (quotaCode, counter region) from quota_counters.replay
+    :param store: The counter store the events were applied to
+    :param currentRegion: Region used to scan global counters
+    :return: The number of mismatching counters
+    """
+    mismatches = 0
+    for quotaCode, counterRegion in sorted(touched):
+        spec = quota_counters.SPECS_BY_CODE[quotaCode]
+        region = currentRegion if counterRegion == quota_specs.GLOBAL else counterRegion
+        _, counts = store.counts(quota_counters.counterKey(quotaCode, counterRegion))
+        scanned = {}
+        for group in spec.scan(spec, region).values():
+            scanned[group] = scanned.get(group, 0) + 1
+        incremental = quota_counters.usageOf(spec, counts)
+        full = quota_counters.usageOf(spec, scanned)
+        status = 'OK' if counts == scanned else 'MISMATCH'
+        mismatches += status != 'OK'
+        print(f"{quotaCode} {counterRegion}: incremental={incremental} full scan={full} {status}")
+    return mismatches
+
     
 
 
@@ -78,8 +159,36 @@ if __name__ == "__main__":
                         help='AWS region (default: AWS_REGION env var or us-east-1)')
     parser.add_argument('--region-list', dest='region_list',
                         help='Comma-separated list of regions (default: REGION_LIST env var)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Only run checks that are due according to headroom and growth rate '
+                             '(state in SCHEDULE_STATE_PATH, default: quota_schedule.json)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Print the execution plan and the estimated API call count without running any check')
+    parser.add_argument('--counters', action='store_true',
+                        help='Report covered quotas from the incremental counters, reconciling stale ones with a full scan '
+                             '(state in COUNTER_STATE_PATH, default: quota_counters.json)')
+    parser.add_argument('--replay-events', dest='replay_events',
+                        help='Apply recorded CloudTrail events to the counters and compare them with full scans')
+    parser.add_argument('--incremental-iam', dest='incremental_iam', action='store_true',
+                        help='Only recompute the per-user IAM quotas of users whose digest changed, with a full scan every '
+                             'IAM_FULL_SCAN_MINUTES (state in IAM_DIGEST_STATE_PATH, default: quota_iam_digests.json)')
+    parser.add_argument('--sinks',
+                        help='Comma-separated sinks receiving the quota usages: csv, stdout, dynamodb, eventbridge, sqlite '
+                             '(default: QUOTA_SINKS env var or csv; --accounts writes the CSV and, if listed, sqlite)')
+    parser.add_argument('--accounts',
+                        help='Comma-separated list of account ids scanned by assuming --role-name in each '
+                             '(default: ACCOUNT_LIST env var; results in QUOTA_ACCOUNTS_CSV_PATH)')
+    parser.add_argument('--role-name', dest='role_name',
+                        help='Role assumed in every account (default: SCAN_ROLE_NAME env var or QuotaGuardScannerRole)')
+    parser.add_argument('--max-workers', dest='max_workers', type=int,
+                        help='Accounts scanned in parallel (default: one per account up to the CPU count)')
     args = parser.parse_args()
 
+    accountList = args.accounts or os.environ.get('ACCOUNT_LIST', '')
+    accounts = [account.strip() for account in accountList.split(',') if account.strip()]
+    if accounts and (args.adaptive or args.counters or args.replay_events or args.incremental_iam):
+        parser.error('--adaptive, --counters, --replay-events and --incremental-iam only apply to the current account, not to --accounts')
+
     # CLI args take precedence over env vars
     currentRegion = args.aws_region or os.environ.get('AWS_REGION', 'us-east-1')
     regionList = args.region_list or os.environ.get('REGION_LIST', '')
@@ -90,36 +199,82 @@ if __name__ == "__main__":
 
     logger.info(f"Using region(s): {regions}")
 
+    counterStore = None
+    if args.counters or args.replay_events:
+        counterStore = quota_counters.JsonFileCounterStore(os.environ.get('COUNTER_STATE_PATH', 'quota_counters.json'))
+    if args.replay_events:
+        touched = quota_counters.replay(args.replay_events, counterStore)
+        sys.exit(1 if compare_counters(touched, counterStore, currentRegion) else 0)
+
     with open('../config/QuotaList.json', 'r') as f:
         config = json.load(f)
     logger.info(f"Using the following config: {json.dumps(config,indent=2)}")
+    quota_cache.configure(config)
+    if args.incremental_iam:
+        quota_iam_digests.configure(quota_iam_digests.JsonFileDigestStore(os.environ.get('IAM_DIGEST_STATE_PATH', 'quota_iam_digests.json')))
+
+    scheduler = None
+    if args.adaptive:
+        schedulePath = os.environ.get('SCHEDULE_STATE_PATH', 'quota_schedule.json')
+        # The growth rate comes from the usage history the CSV writer appends to
+        scheduler = quota_scheduler.QuotaScheduler(quota_scheduler.JsonFileScheduleStore(schedulePath), quota_update_csv.get_history_store())
+
+    # Collect the due checks, then run them in the order of the execution plan so checks
+    # reading the same APIs run back to back and share their responses
+    checks = []
     for quotaObject in config:
         logger.info(f"Processing: {quotaObject}")
         serviceCodeValue = quotaObject['ServiceCode']
         quotaCodeValue = quotaObject['QuotaCode']
         thresholdValue = quotaObject['Threshold']
         QuotaReportingFunc = quotaCodeValue.replace("-", "_")
-        logger.info(f"Running function: {QuotaReportingFunc}")
         if(quotaObject['QuotaAppliedAtLevel'] == 'Regional'):
-            for region in regions:
-                logger.debug("Pulling Quotas for ",region)
-                if hasattr(aws_quotas, QuotaReportingFunc):
-                    try:
-                        getattr(aws_quotas, QuotaReportingFunc)(serviceCode=serviceCodeValue,quotaCode=quotaCodeValue, threshold=thresholdValue, region=region)
-                    except Exception as e:
-                        logger.error(f"Error processing quota {quotaCodeValue} for region {region}: {str(e)}")
-                        logger.info(f"Continuing with next quota...")
-                else:
-                    logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {region}")
+            checkRegions = regions
         else:
-            logger.debug("Pulling Quotas for current region ",currentRegion)
+            checkRegions = [currentRegion]
+        for region in checkRegions:
+            if scheduler and not scheduler.isDue(quotaCodeValue, region, thresholdValue):
+                logger.info(f"Skipping {quotaCodeValue} for region {region}: not due yet")
+                continue
             if hasattr(aws_quotas, QuotaReportingFunc):
-                try:
-                    getattr(aws_quotas, QuotaReportingFunc)(serviceCode=serviceCodeValue,quotaCode=quotaCodeValue, threshold=thresholdValue, region=currentRegion)
-                except Exception as e:
-                    logger.error(f"Error processing quota {quotaCodeValue} for region {currentRegion}: {str(e)}")
-                    logger.info(f"Continuing with next quota...")
+                checks.append(quota_planner.Check(serviceCodeValue, quotaCodeValue, thresholdValue, region))
             else:
-                logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {currentRegion}")
-
+                logger.warning(f"Quota not implemented: {QuotaReportingFunc}. Skipping this check for region {region}")
 
+    plan = quota_planner.buildPlan(checks, quota_planner.loadManifest())
+    if args.plan:
+        print(plan.describe())
+        sys.exit(0)
+    sinkNames = args.sinks or os.environ.get('QUOTA_SINKS', 'csv')
+    if accounts:
+        roleName = args.role_name or os.environ.get('SCAN_ROLE_NAME', 'QuotaGuardScannerRole')
+        sqliteSink = quota_sqlite.SqliteSink() if 'sqlite' in [name.strip() for name in sinkNames.split(',')] else None
+        try:
+            errors = quota_accounts.scanAccounts(accounts, roleName, plan, run_checks, account_usage_writer(sqliteSink), args.max_workers)
+        finally:
+            if sqliteSink:
+                sqliteSink.close()
+        for accountId, error in errors.items():
+            logger.error(f"Account {accountId} was not scanned: {error}")
+        sys.exit(1 if errors else 0)
+    counters = None
+    if args.counters:
+        # Replayed events may come from any region, so every region is served from its counters
+        counters = quota_counters.CounterEvaluator(counterStore, set(regions) | {currentRegion, quota_counters.GLOBAL_EVENT_REGION})
+    # Usages are written by a background thread while the checks run
+    try:
+        quota_sinks.install(quota_sinks.buildSink(sinkNames, {
+            'csv': lambda: quota_sinks.FunctionSink(updateQuotaUsage),
+            'stdout': quota_sinks.StdoutJsonSink,
+            'dynamodb': dynamodb_sink,
+            'eventbridge': lambda: quota_sinks.EventBridgeSink(
+                os.environ.get('EVENT_BUS', 'default'),
+                quota_alerts.JsonFileAlertStateStore(os.environ.get('ALERT_STATE_PATH', 'quota_alerts.json'))),
+            'sqlite': lambda: quota_sqlite.SqliteSink(accountId=quota_sqlite.localAccountId()),
+        }, scheduler.wrap if scheduler else None))
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        quota_planner.execute(plan, lambda stageChecks: run_checks(stageChecks, counters))
+    finally:
+        quota_sinks.close()
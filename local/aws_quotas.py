@@ -9,6 +9,12 @@ from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
 import inspect
 import os.path
+import rate_limiter
+import quota_stream
+import quota_specs
+import quota_collectors
+import quota_cache
+import quota_sinks
 
 
 # Setup logger
@@ -28,6 +34,12 @@ if not logger.handlers:
 # ec2 = boto3.client('ec2')
 # sq = boto3.client('service-quotas')
 
+# Throttle our own API calls client-side so checks never starve production workloads
+rate_limiter.install()
+
+# Quota usages go to the sink installed by the entry point (quota_sinks.install)
+updateQuotaUsage = quota_sinks.updateQuotaUsage
+
 
     
 def L_BB24F6E5(serviceCode, quotaCode, threshold, region):
@@ -130,62 +142,23 @@ def L_DFA99DE7(serviceCode, quotaCode, threshold, region):
     Checks the Private IP address quota per NAT gateway
     :param serviceCode: The service code (should be 'vpc' for NAT gateway)
     :param quotaCode: The quota code for private IP addresses per NAT gateway
-    :param threshold: The threshold value (e.g., 0.8 for 80%)
+    :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_private_ip_count = 0    
-    # Create boto3 clients
-    ec2_client = boto3.client('ec2', region_name=region)
     sq_client = boto3.client('service-quotas', region_name=region)
 
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-
     try:
-        # Get the service quota
-        serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
-        
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq_client, serviceCode, quotaCode)
         logger.info(f"Private IP addresses per NAT gateway quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename= f'tests/{inspect.stack()[0][3]}.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename,'r') as test_file_content:
-                nat_gateways = json.load(test_file_content)
-        else:
-            # Get all NAT gateways
-            paginator = ec2_client.get_paginator('describe_nat_gateways')
-            nat_gateways = []
-            for page in paginator.paginate():
-                nat_gateways.extend(page['NatGateways'])
-
-
-        for nat_gateway in nat_gateways:
-            nat_gateway_id = nat_gateway['NatGatewayId']
-            private_ip_count = float(len(nat_gateway['NatGatewayAddresses']))
-            
-            usage_percentage = (private_ip_count / serviceQuotaValue) * 100
-            
-            logger.info(f"NAT Gateway {nat_gateway_id}: {private_ip_count} private IPs used out of {serviceQuotaValue}")
-
-            if max_private_ip_count < private_ip_count:
-                    max_private_ip_count = private_ip_count
-                    logger.info(f"Max value={max_private_ip_count}")
+        maxPrivateIps = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for nat_gateway_id, nat_gateway in quota_collectors.ec2Snapshot(region).natGateways(quotaCode).items():
+            maxPrivateIps.observe(nat_gateway_id, nat_gateway['PrivateIps'])
+        logger.info(f"Max private IPs per NAT gateway: {maxPrivateIps.value} out of {serviceQuotaValue}")
 
-            if usage_percentage > float(threshold) * 100:
-                data = {
-                "resourceARN" : nat_gateway_id,
-                "usageValue" : private_ip_count
-                }
-                resourceListCrossingThreshold.append(data)
-                sendQuotaThresholdEvent = True
-                logger.warning(f"NAT Gateway {nat_gateway_id} private IP usage ({private_ip_count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
-            
         # Update quota usage
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_private_ip_count),json.dumps(resourceListCrossingThreshold),sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxPrivateIps.value),maxPrivateIps.resourceList(),bool(maxPrivateIps.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking NAT gateway private IP quota: {e}")
@@ -275,44 +248,7 @@ def L_DF5E4CA3(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numNetworkInterfacesPerRegion = 0
-    sendQuotaThresholdEvent = False
-    
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-    
-    try:
-        serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    except Exception as e:
-        logger.info(f"Error calling get_service_quota: {e}")
-        serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-    
-    if is_testing_enabled:
-        test_filename= f'tests/{inspect.stack()[0][3]}_describe_network_interfaces.json'
-        logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-        with open(test_filename,'r') as test_file_content:
-            page_iterator = json.load(test_file_content)
-    else:
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_network_interfaces')
-        # Create a PageIterator from the Paginator
-        page_iterator = paginator.paginate()
-
-    for response in page_iterator:
-        networkInterfacesListObject = response['NetworkInterfaces']
-        numNetworkInterfacesPerRegion += len(networkInterfacesListObject)
-    if numNetworkInterfacesPerRegion/serviceQuotaValue > float(threshold)/100:
-        logger.info(f"Exceeding Threshold for No of Network Interfaces={numNetworkInterfacesPerRegion}")
-        sendQuotaThresholdEvent = True
-
-        
-    updateQuotaUsage(region,quotaCode,serviceCode, str(serviceQuotaValue), str(numNetworkInterfacesPerRegion),"",sendQuotaThresholdEvent)
-
-
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_D18FCD1D(serviceCode, quotaCode, threshold,region):
@@ -323,51 +259,9 @@ def L_D18FCD1D(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    sendQuotaThresholdEvent = False
-    totalGeneralPurposeSSDGP2Storage = 0
-    
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-    
-    serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
-    if is_testing_enabled:
-        test_filename= f'tests/{inspect.stack()[0][3]}_describe_volumes.json'
-        logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-        with open(test_filename,'r') as test_file_content:
-            page_iterator = json.load(test_file_content)
-    else:
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_volumes')
-        
-        # Create a PageIterator from the Paginator
-        page_iterator = paginator.paginate(
-            Filters=[
-            {
-                'Name': 'volume-type',
-                'Values': [
-                    'gp2',
-                ],
-            },
-            ]
-        )
-    
-    for response in page_iterator:
-        volumesObject = response['Volumes']
-    # Compute EBS Total Usage
-        for item in volumesObject: 
-            totalGeneralPurposeSSDGP2Storage += item['Size']
-    if totalGeneralPurposeSSDGP2Storage/serviceQuotaValue > float(threshold)/100:
-        logger.info(f"Exceeding Threshold for total general purpose SSD gp2 storage={totalGeneralPurposeSSDGP2Storage}")
-        sendQuotaThresholdEvent = True
 
-    totalGeneralPurposeSSDGP2Storage /= 1024
-    logger.info(f"Total (TiB) of general purpose SSD gp2 storage = {totalGeneralPurposeSSDGP2Storage}")
-    updateQuotaUsage(region,quotaCode,serviceCode, str(serviceQuotaValue), str(totalGeneralPurposeSSDGP2Storage),"",sendQuotaThresholdEvent)
-    
 def L_CE3125E5(serviceCode, quotaCode, threshold, region):
     """
     Counts the number of instances behind each load balancer and gives the sum of all instances
@@ -493,73 +387,26 @@ def L_43872EB7(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxTransitGatewayRouteTablesPerTgw = 0
-    sendQuotaThresholdEvent = False
-    resourceListCrossingThreshold = []
-    
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
-    
+
     try:
-        serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
+        logger.info(f"Route tables per transit gateway quota: {serviceQuotaValue}")
+
+        ec2Snapshot = quota_collectors.ec2Snapshot(region)
+        routeTables = ec2Snapshot.transitGatewayRouteTables(quotaCode)
+        routeTablesPerTgw = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for transitGatewayId in ec2Snapshot.transitGateways(quotaCode):
+            logger.info(f"TGW_IF={transitGatewayId}. Number of Transit Gateway Route Tables={len(routeTables.get(transitGatewayId, []))}")
+            routeTablesPerTgw.observe(transitGatewayId, len(routeTables.get(transitGatewayId, [])))
+        logger.info(f"Route tables per transit gateway (max): {routeTablesPerTgw.value} out of {serviceQuotaValue}")
+
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(routeTablesPerTgw.value), routeTablesPerTgw.resourceList(), bool(routeTablesPerTgw.resourceListCrossingThreshold))
+
+    except ClientError as e:
+        logger.error(f"Error checking route tables per transit gateway quota: {e}")
     except Exception as e:
-        logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-        serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-    logger.info(serviceQuota['Quota']['Value'])
-    if is_testing_enabled:
-        test_filename= f'tests/{inspect.stack()[0][3]}_describe_transit_gateways.json'
-        logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-        with open(test_filename,'r') as test_file_content:
-            page_iterator = json.load(test_file_content)
-    else:
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_transit_gateways')
-        # Create a PageIterator from the Paginator
-        page_iterator = paginator.paginate()
-    for response in page_iterator:
-        tgwListObject = response['TransitGateways']
-        # Iterate through the JSON array 
-        # Compute TGW Route Tables Usage
-        for item in tgwListObject: 
-            transitGatewayId = item['TransitGatewayId']
-            if is_testing_enabled:
-                test_filename= f'tests/{inspect.stack()[0][3]}_describe_transit_gateway_route_tables.json'
-                logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-                with open(test_filename,'r') as test_file_content:
-                    response_rt = json.load(test_file_content)
-            else:
-                response_rt = ec2.describe_transit_gateway_route_tables(
-                    Filters=[
-                    {
-                        'Name': 'transit-gateway-id',
-                        'Values': [
-                            transitGatewayId,
-                        ],
-                    },
-                    ]
-                )
-            tgwRouteTablesListObject=response_rt['TransitGatewayRouteTables']
-            numTransitGatewayRouteTables = len(tgwRouteTablesListObject)
-            logger.info(f"TGW_IF={transitGatewayId}. Number of Transit Gateway Route Tables={numTransitGatewayRouteTables}")
-            
-            if maxTransitGatewayRouteTablesPerTgw < numTransitGatewayRouteTables:
-                maxTransitGatewayRouteTablesPerTgw = numTransitGatewayRouteTables
-                logger.info(f"Max value={maxTransitGatewayRouteTablesPerTgw}")
-                
-            if numTransitGatewayRouteTables/serviceQuotaValue > float(threshold)/100:
-                logger.info(f"Exceeding Threshold for this TWG_ID={transitGatewayId}")
-                sendQuotaThresholdEvent = True
-                data = {
-                    "resourceARN" : transitGatewayId,
-                    "usageValue" : numTransitGatewayRouteTables
-                    }
-                resourceListCrossingThreshold.append(data)
-        
-    updateQuotaUsage(region,quotaCode,serviceCode, str(serviceQuotaValue), str(maxTransitGatewayRouteTablesPerTgw), json.dumps(resourceListCrossingThreshold),sendQuotaThresholdEvent)
+        logger.error(f"Unexpected error: {e}")
 
 def L_1B52E74A(serviceCode, quotaCode, threshold,region):
     """
@@ -569,49 +416,25 @@ def L_1B52E74A(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numGatewayVPCEndpointsPerRegion = 0
-    sendQuotaThresholdEvent = False
-    
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
-    
+
     try:
-        serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
+        logger.info(f"Gateway VPC endpoints per Region quota: {serviceQuotaValue}")
+
+        numGatewayVPCEndpointsPerRegion = len(quota_collectors.ec2Snapshot(region).vpcEndpointsByType(quotaCode).get('Gateway', []))
+        logger.info(f"Total gateway VPC endpoints in {region}: {numGatewayVPCEndpointsPerRegion}")
+
+        sendQuotaThresholdEvent = quota_stream.isOverThreshold(numGatewayVPCEndpointsPerRegion, serviceQuotaValue, threshold)
+        if sendQuotaThresholdEvent:
+            logger.info(f"Exceeding Threshold for No of Gateway Endpoints Per Region={numGatewayVPCEndpointsPerRegion}")
+
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(numGatewayVPCEndpointsPerRegion), "", sendQuotaThresholdEvent)
+
+    except ClientError as e:
+        logger.error(f"Error checking gateway VPC endpoints quota: {e}")
     except Exception as e:
-        logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-        serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-    if is_testing_enabled:
-        test_filename= f'tests/{inspect.stack()[0][3]}_describe_vpc_endpoints.json'
-        logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-        with open(test_filename,'r') as test_file_content:
-            page_iterator = json.load(test_file_content)
-    else:
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_vpc_endpoints')
-        # Create a PageIterator from the Paginator
-        page_iterator = paginator.paginate(
-                Filters=[
-            {
-                'Name': 'vpc-endpoint-type',
-                'Values': [
-                    'Gateway',
-                ]
-            },
-        ])
-
-    for response in page_iterator:
-        gwEndpointListObject = response['VpcEndpoints']
-        numGatewayVPCEndpointsPerRegion += len(gwEndpointListObject)
-    if numGatewayVPCEndpointsPerRegion/serviceQuotaValue > float(threshold)/100:
-        logger.info(f"Exceeding Threshold for No of Gateway Endpoints Per Region={numGatewayVPCEndpointsPerRegion}")
-        sendQuotaThresholdEvent = True
-    else:
-        sendQuotaThresholdEvent = False
-        
-    updateQuotaUsage(region,quotaCode,serviceCode, str(serviceQuotaValue), str(numGatewayVPCEndpointsPerRegion),"",sendQuotaThresholdEvent)
+        logger.error(f"Unexpected error: {e}")
 
 def L_DC2B2D3D(serviceCode, quotaCode, region, threshold):
     # check for number of S3 buckets
@@ -759,15 +582,15 @@ def L_BF35879D(serviceCode, quotaCode, region, threshold):
         logger.info(f"Detected testing enabled. Using test payload from {list_server_certs_filename}")
         with open(list_server_certs_filename,'r') as test_file_content:
             paginator = json.load(test_file_content)
+        # Iterate through all pages and count certificates
+        for page in paginator:
+            certificate_count += len(page['ServerCertificateMetadataList'])
     else:
-        # Create paginator for listing server certificates
-        paginator = iam_client.get_paginator('list_server_certificates').paginate()
-        
-    # Iterate through all pages and count certificates
-    for page in paginator:
-        certificates = page['ServerCertificateMetadataList']
-        page_count = len(certificates)
-        certificate_count += page_count
+        # Count across all pages, reusing a recent count on warm invocations
+        certificate_count = quota_cache.cached(quotaCode, 'iam:server_certificates', lambda: sum(
+            len(page['ServerCertificateMetadataList'])
+            for page in iam_client.get_paginator('list_server_certificates').paginate()
+        ))
     
     logger.info(f"\nTotal number of IAM server certificates: {certificate_count}")
 
@@ -901,74 +724,32 @@ def L_CD17FD4B(serviceCode, quotaCode, threshold, region):
 
 def L_6408ABDE(serviceCode, quotaCode, threshold, region):
     """
-    Checks the Number of instances per Elasticsearch domain
-    :param serviceCode: The service code (should be 'vpc' for NAT gateway)
-    :param quotaCode: The quota code for private IP addresses per NAT gateway
-    :param threshold: The threshold value (e.g., 0.8 for 80%)
+    Checks the Number of instances per OpenSearch (Elasticsearch) domain
+    Data, UltraWarm and dedicated master nodes all count as instances of the domain.
+    :param serviceCode: The service code (es)
+    :param quotaCode: The quota code (L-6408ABDE)
+    :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_instance_count = 0    
-    # Create boto3 clients
-    es_client = boto3.client('es', region_name=region)
-    sq_client = boto3.client('service-quotas', region_name=region)
-
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
+    sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        # Get the service quota
-        serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
-        
-        logger.info(f"Instances per domain for Elasticsearch quota: {serviceQuotaValue}")
-
-        if is_testing_enabled:
-            test_filename= f'tests/{inspect.stack()[0][3]}.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename,'r') as test_file_content:
-                es_domains = json.load(test_file_content)
-        else:
-            # Get all Elasticsearch Domains
-            domain_names_response = es_client.list_domain_names()
-            es_domain_names = [domain['DomainName'] for domain in domain_names_response['DomainNames']]
-            
-            if es_domain_names:
-                es_domains_response = es_client.describe_elasticsearch_domains(DomainNames=es_domain_names)
-                es_domains = es_domains_response['DomainStatusList']
-            else:
-                es_domains = []
-
-
-        for es_domain in es_domains:
-            es_domain_id = es_domain['DomainId']
-            instance_count = es_domain['ElasticsearchClusterConfig']['InstanceCount']
-            
-            usage_percentage = (instance_count / serviceQuotaValue) * 100
-            
-            logger.info(f"Elastic Search Domain {es_domain_id}: {instance_count} instances used out of {serviceQuotaValue}")
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
+        logger.info(f"Instances per domain for OpenSearch quota: {serviceQuotaValue}")
 
-            if max_instance_count < instance_count:
-                    max_instance_count = instance_count
-                    logger.info(f"Max value={max_instance_count}")
+        instancesPerDomain = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for domain in quota_collectors.openSearchSnapshot(region).domains(quotaCode).values():
+            logger.info(f"OpenSearch domain {domain['DomainId']}: {domain['DataNodes']} data, {domain['WarmNodes']} warm and {domain['MasterNodes']} master nodes")
+            instancesPerDomain.observe(domain['DomainId'], domain['Nodes'])
+        logger.info(f"Instances per OpenSearch domain (max): {instancesPerDomain.value} out of {serviceQuotaValue}")
 
-            if usage_percentage > float(threshold) * 100:
-                data = {
-                "resourceARN" : es_domain_id,
-                "usageValue" : instance_count
-                }
-                resourceListCrossingThreshold.append(data)
-                sendQuotaThresholdEvent = True
-                logger.warning(f"ES Domain {es_domain_id} Instance count ({instance_count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
-            
-        # Update quota usage
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_instance_count),json.dumps(resourceListCrossingThreshold),sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(instancesPerDomain.value), instancesPerDomain.resourceList(), bool(instancesPerDomain.resourceListCrossingThreshold))
 
     except ClientError as e:
-        logger.error(f"Error checking ES Domain Instances quota: {e}")
+        logger.error(f"Error checking OpenSearch domain instances quota: {e}")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}") 
+        logger.error(f"Unexpected error: {e}")
 
 def L_7E9ECCDB(serviceCode, quotaCode, threshold,region):
     """
@@ -1069,78 +850,8 @@ def L_407747CB(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-
-    maxSubnetsPerVPC = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-
-    try:
-        # Get current quota
-
-        serviceQuotaValue = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)['Quota']['Value']
-
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_vpcs')    
-        
-        if is_testing_enabled:
-            test_filename_vpcs = f'tests/{inspect.stack()[0][3]}_describe_vpcs.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename_vpcs}")
-            with open(test_filename_vpcs,'r') as test_file_content:
-                test_vpcs = json.load(test_file_content)
-            test_filename_vpc_subnets = f'tests/{inspect.stack()[0][3]}_describe_subnets.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename_vpc_subnets}")
-            with open(test_filename_vpc_subnets,'r') as test_file_content:
-                vpc_subnets_test = json.load(test_file_content)
-            page_iterator = test_vpcs
-        else:
-            # Create a PageIterator from the Paginator
-            page_iterator = paginator.paginate()
-        for vpcs in page_iterator:
-            for vpc in vpcs['Vpcs']:
-                if is_testing_enabled:
-                    vpc_subnets = vpc_subnets_test
-                else:
-                    # Per each VPC found, call the describe API and sum the connections
-                    vpc_subnets = ec2.describe_subnets(
-                        Filters=[
-                            {
-                                'Name': 'vpc-id',
-                                'Values': [
-                                    vpc['VpcId'],
-                                ],
-                            },
-                            ]
-                    )['Subnets']
-
-                    
-
-                numVpcSubnets = len(vpc_subnets)
-                logger.info(f"VPC Id={vpc['VpcId']}. Number of Subnets={numVpcSubnets}")
-                
-                if numVpcSubnets/serviceQuotaValue > float(threshold)/100:
-                    logger.info(f"Exceeding Threshold for this VPC Id={vpc['VpcId']}")
-                    sendQuotaThresholdEvent = True
-                    data = {
-                        "resourceARN" : vpc['VpcId'],
-                        "usageValue" : numVpcSubnets
-                        }
-                    resourceListCrossingThreshold.append(data)
-                if maxSubnetsPerVPC < numVpcSubnets:
-                    maxSubnetsPerVPC = numVpcSubnets
-                    logger.info(f"Max Value: {maxSubnetsPerVPC}")
-        # Update quota usage
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxSubnetsPerVPC),json.dumps(resourceListCrossingThreshold),sendQuotaThresholdEvent)
- 
-    except ClientError as e:
-        logger.error(f"Error checking Subnets per VPC quota: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")   
 
 def L_45FE3B85(serviceCode, quotaCode, threshold,region):
     """
@@ -1150,41 +861,8 @@ def L_45FE3B85(serviceCode, quotaCode, threshold,region):
     :param threshold: The threshold value
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numEgressGatewaysPerRegion = 0
-    sendQuotaThresholdEvent = False
-    
-    # Create region-specific boto3 clients
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-    
-    try:
-        serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    except Exception as e:
-        logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-        serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-    if is_testing_enabled:
-        test_filename= f'tests/{inspect.stack()[0][3]}_describe_vpc_endpoints.json'
-        logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-        with open(test_filename,'r') as test_file_content:
-            page_iterator = json.load(test_file_content)
-    else:
-        # Create a reusable Paginator
-        paginator = ec2.get_paginator('describe_egress_only_internet_gateways')
-        # Create a PageIterator from the Paginator
-        page_iterator = paginator.paginate()
-
-    for response in page_iterator:
-        egressGatewayListObject = response['EgressOnlyInternetGateways']
-        numEgressGatewaysPerRegion += len(egressGatewayListObject)
-    if numEgressGatewaysPerRegion/serviceQuotaValue > float(threshold)/100:
-        logger.info(f"Exceeding Threshold for No of Egress Only Internet Gateway  Per Region={numEgressGatewaysPerRegion}")
-        sendQuotaThresholdEvent = True
-    else:
-        sendQuotaThresholdEvent = False
-        
-    updateQuotaUsage(region,quotaCode,serviceCode, str(serviceQuotaValue), str(numEgressGatewaysPerRegion),"",sendQuotaThresholdEvent)
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
+
 
 if __name__ == "__main__":
     """
@@ -1232,57 +910,19 @@ def L_FE5A380F(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxNatGatewaysPerAZ = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"NAT gateways per AZ quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_nat_gateways.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                nat_gateways = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_nat_gateways')
-            nat_gateways = []
-            for page in paginator.paginate(Filters=[{'Name': 'state', 'Values': ['available']}]):
-                nat_gateways.extend(page['NatGateways'])
-
-        # Count NAT gateways per AZ
-        az_counts = defaultdict(int)
-        for ngw in nat_gateways:
-            subnet_id = ngw['SubnetId']
-            if is_testing_enabled:
-                az = ngw.get('AvailabilityZone', 'unknown')
-            else:
-                subnet_info = ec2.describe_subnets(SubnetIds=[subnet_id])['Subnets']
-                az = subnet_info[0]['AvailabilityZone'] if subnet_info else 'unknown'
-            az_counts[az] += 1
-
-        for az, count in az_counts.items():
+        natGatewaysPerAZ = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for az, count in quota_collectors.ec2Snapshot(region).natGatewayCountsByAz(quotaCode).items():
             logger.info(f"AZ {az}: {count} NAT gateways out of {serviceQuotaValue}")
-            if maxNatGatewaysPerAZ < count:
-                maxNatGatewaysPerAZ = count
-                logger.info(f"Max value={maxNatGatewaysPerAZ}")
-            if count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                data = {"resourceARN": az, "usageValue": count}
-                resourceListCrossingThreshold.append(data)
-                logger.warning(f"AZ {az} NAT gateway count ({count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+            natGatewaysPerAZ.observe(az, count)
+        logger.info(f"NAT gateways per AZ (max): {natGatewaysPerAZ.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxNatGatewaysPerAZ), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(natGatewaysPerAZ.value), natGatewaysPerAZ.resourceList(), bool(natGatewaysPerAZ.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking NAT gateways per AZ quota: {e}")
@@ -1299,55 +939,7 @@ def L_83CA0A9D(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxCidrBlocksPerVPC = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-
-    try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
-        logger.info(f"IPv4 CIDR blocks per VPC quota: {serviceQuotaValue}")
-
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_vpcs.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                test_vpcs = json.load(test_file_content)
-            page_iterator = test_vpcs
-        else:
-            paginator = ec2.get_paginator('describe_vpcs')
-            page_iterator = paginator.paginate()
-
-        for vpcs in page_iterator:
-            for vpc in vpcs['Vpcs']:
-                vpc_id = vpc['VpcId']
-                # Count IPv4 CIDR block associations
-                cidr_count = len(vpc.get('CidrBlockAssociationSet', []))
-                logger.info(f"VPC {vpc_id}: {cidr_count} IPv4 CIDR blocks out of {serviceQuotaValue}")
-
-                if maxCidrBlocksPerVPC < cidr_count:
-                    maxCidrBlocksPerVPC = cidr_count
-                    logger.info(f"Max value={maxCidrBlocksPerVPC}")
-                if cidr_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": vpc_id, "usageValue": cidr_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"VPC {vpc_id} CIDR block count ({cidr_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxCidrBlocksPerVPC), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
-
-    except ClientError as e:
-        logger.error(f"Error checking IPv4 CIDR blocks per VPC quota: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_93826ACB(serviceCode, quotaCode, threshold, region):
@@ -1411,56 +1003,27 @@ def L_93826ACB(serviceCode, quotaCode, threshold, region):
 def L_0EA8095F(serviceCode, quotaCode, threshold, region):
     """
     Checks Inbound or outbound rules per security group
+    Rules are counted per direction and address family from the region's security group rule index.
     :param serviceCode: The service code (vpc)
     :param quotaCode: The quota code (L-0EA8095F)
     :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxRulesPerSG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Inbound or outbound rules per security group quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_security_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_security_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for sg in response['SecurityGroups']:
-                sg_id = sg['GroupId']
-                inbound_count = len(sg.get('IpPermissions', []))
-                outbound_count = len(sg.get('IpPermissionsEgress', []))
-                max_direction_count = max(inbound_count, outbound_count)
-                logger.info(f"Security Group {sg_id}: inbound={inbound_count}, outbound={outbound_count}")
-
-                if maxRulesPerSG < max_direction_count:
-                    maxRulesPerSG = max_direction_count
-                    logger.info(f"Max value={maxRulesPerSG}")
-                if max_direction_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": sg_id, "usageValue": max_direction_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"Security Group {sg_id} rule count ({max_direction_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Shared with L_E9D71017, describe_security_group_rules is paged once per region
+        ruleCounts = quota_collectors.ec2Snapshot(region).securityGroupRuleCounts(quotaCode)
+        rulesPerSG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for sg_id, counts in ruleCounts.items():
+            rulesPerSG.observe(sg_id, max(counts[quota_collectors.INBOUND], counts[quota_collectors.OUTBOUND]))
+        logger.info(f"Inbound or outbound rules per security group (max over {len(ruleCounts)} groups): {rulesPerSG.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxRulesPerSG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(rulesPerSG.value), rulesPerSG.resourceList(), bool(rulesPerSG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking rules per security group quota: {e}")
@@ -1605,78 +1168,23 @@ def L_C673935A(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxMulticastNIsPerTgw = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Multicast Network Interfaces per transit gateway quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_transit_gateways.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_transit_gateways')
-            page_iterator = paginator.paginate()
+        ec2Snapshot = quota_collectors.ec2Snapshot(region)
+        multicastDomains = ec2Snapshot.transitGatewayMulticastDomains(quotaCode)
+        multicastNIsPerTgw = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for tgw_id in ec2Snapshot.transitGateways(quotaCode):
+            # Count unique network interfaces across all multicast domains of the TGW
+            multicast_nis = set().union(*multicastDomains.get(tgw_id, {}).values())
+            logger.info(f"TGW {tgw_id}: {len(multicast_nis)} multicast network interfaces out of {serviceQuotaValue}")
+            multicastNIsPerTgw.observe(tgw_id, len(multicast_nis))
+        logger.info(f"Multicast Network Interfaces per transit gateway (max): {multicastNIsPerTgw.value} out of {serviceQuotaValue}")
 
-        for response in page_iterator:
-            for tgw in response['TransitGateways']:
-                tgw_id = tgw['TransitGatewayId']
-
-                if is_testing_enabled:
-                    test_filename_mc = f'tests/{inspect.stack()[0][3]}_describe_transit_gateway_multicast_domains.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_mc}")
-                    with open(test_filename_mc, 'r') as test_file_content:
-                        multicast_domains = json.load(test_file_content)
-                else:
-                    multicast_domains_response = ec2.describe_transit_gateway_multicast_domains(
-                        Filters=[{'Name': 'transit-gateway-id', 'Values': [tgw_id]}]
-                    )
-                    multicast_domains = multicast_domains_response['TransitGatewayMulticastDomains']
-
-                # Count unique network interfaces across all multicast domains for this TGW
-                multicast_nis = set()
-                for domain in multicast_domains:
-                    domain_id = domain['TransitGatewayMulticastDomainId']
-                    if is_testing_enabled:
-                        test_filename_members = f'tests/{inspect.stack()[0][3]}_search_transit_gateway_multicast_groups.json'
-                        logger.info(f"Detected testing enabled. Using test payload from {test_filename_members}")
-                        with open(test_filename_members, 'r') as test_file_content:
-                            members = json.load(test_file_content)
-                    else:
-                        members_response = ec2.search_transit_gateway_multicast_groups(
-                            TransitGatewayMulticastDomainId=domain_id
-                        )
-                        members = members_response.get('MulticastGroups', [])
-                    for member in members:
-                        if 'NetworkInterfaceId' in member:
-                            multicast_nis.add(member['NetworkInterfaceId'])
-
-                ni_count = len(multicast_nis)
-                logger.info(f"TGW {tgw_id}: {ni_count} multicast network interfaces out of {serviceQuotaValue}")
-
-                if maxMulticastNIsPerTgw < ni_count:
-                    maxMulticastNIsPerTgw = ni_count
-                    logger.info(f"Max value={maxMulticastNIsPerTgw}")
-                if ni_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": tgw_id, "usageValue": ni_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"TGW {tgw_id} multicast NI count ({ni_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxMulticastNIsPerTgw), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(multicastNIsPerTgw.value), multicastNIsPerTgw.resourceList(), bool(multicastNIsPerTgw.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Multicast Network Interfaces per TGW quota: {e}")
@@ -1753,48 +1261,20 @@ def L_F786B2E5(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxCLBsPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Classic Load Balancers per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-                clb_count = len(asg.get('LoadBalancerNames', []))
-                logger.info(f"ASG {asg_name}: {clb_count} Classic Load Balancers out of {serviceQuotaValue}")
-
-                if maxCLBsPerASG < clb_count:
-                    maxCLBsPerASG = clb_count
-                    logger.info(f"Max value={maxCLBsPerASG}")
-                if clb_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": clb_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} CLB count ({clb_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        clbsPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for asg in asgSnapshot.groups(quotaCode):
+            clbsPerASG.observe(asg['AutoScalingGroupARN'], len(asg['LoadBalancerNames']))
+        logger.info(f"Classic Load Balancers per ASG (max): {clbsPerASG.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxCLBsPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(clbsPerASG.value), clbsPerASG.resourceList(), bool(clbsPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Classic Load Balancers per ASG quota: {e}")
@@ -1811,58 +1291,21 @@ def L_F0B00D71(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxScheduledActionsPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Scheduled actions per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        scheduledActionsPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        scheduledActionCounts = asgSnapshot.scheduledActionCounts(quotaCode)
+        for asg in asgSnapshot.groups(quotaCode):
+            scheduledActionsPerASG.observe(asg['AutoScalingGroupARN'], scheduledActionCounts.get(asg['AutoScalingGroupName'], 0))
+        logger.info(f"Scheduled actions per ASG (max): {scheduledActionsPerASG.value} out of {serviceQuotaValue}")
 
-                if is_testing_enabled:
-                    test_filename_sa = f'tests/{inspect.stack()[0][3]}_describe_scheduled_actions.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_sa}")
-                    with open(test_filename_sa, 'r') as test_file_content:
-                        scheduled_actions = json.load(test_file_content).get('ScheduledUpdateGroupActions', [])
-                else:
-                    sa_response = asg_client.describe_scheduled_actions(AutoScalingGroupName=asg_name)
-                    scheduled_actions = sa_response.get('ScheduledUpdateGroupActions', [])
-
-                sa_count = len(scheduled_actions)
-                logger.info(f"ASG {asg_name}: {sa_count} scheduled actions out of {serviceQuotaValue}")
-
-                if maxScheduledActionsPerASG < sa_count:
-                    maxScheduledActionsPerASG = sa_count
-                    logger.info(f"Max value={maxScheduledActionsPerASG}")
-                if sa_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": sa_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} scheduled action count ({sa_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxScheduledActionsPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(scheduledActionsPerASG.value), scheduledActionsPerASG.resourceList(), bool(scheduledActionsPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Scheduled actions per ASG quota: {e}")
@@ -1879,58 +1322,21 @@ def L_72753F6F(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxScalingPoliciesPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Scaling policies per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-
-                if is_testing_enabled:
-                    test_filename_pol = f'tests/{inspect.stack()[0][3]}_describe_policies.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_pol}")
-                    with open(test_filename_pol, 'r') as test_file_content:
-                        policies = json.load(test_file_content).get('ScalingPolicies', [])
-                else:
-                    pol_response = asg_client.describe_policies(AutoScalingGroupName=asg_name)
-                    policies = pol_response.get('ScalingPolicies', [])
-
-                pol_count = len(policies)
-                logger.info(f"ASG {asg_name}: {pol_count} scaling policies out of {serviceQuotaValue}")
-
-                if maxScalingPoliciesPerASG < pol_count:
-                    maxScalingPoliciesPerASG = pol_count
-                    logger.info(f"Max value={maxScalingPoliciesPerASG}")
-                if pol_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": pol_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} scaling policy count ({pol_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        scalingPoliciesPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        policies = asgSnapshot.policies(quotaCode)
+        for asg in asgSnapshot.groups(quotaCode):
+            scalingPoliciesPerASG.observe(asg['AutoScalingGroupARN'], len(policies.get(asg['AutoScalingGroupName'], [])))
+        logger.info(f"Scaling policies per ASG (max): {scalingPoliciesPerASG.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxScalingPoliciesPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(scalingPoliciesPerASG.value), scalingPoliciesPerASG.resourceList(), bool(scalingPoliciesPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Scaling policies per ASG quota: {e}")
@@ -1947,64 +1353,21 @@ def L_CEE5E714(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxSNSTopicsPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"SNS topics per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-
-                if is_testing_enabled:
-                    test_filename_nc = f'tests/{inspect.stack()[0][3]}_describe_notification_configurations.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_nc}")
-                    with open(test_filename_nc, 'r') as test_file_content:
-                        notifications = json.load(test_file_content).get('NotificationConfigurations', [])
-                else:
-                    nc_response = asg_client.describe_notification_configurations(
-                        AutoScalingGroupNames=[asg_name]
-                    )
-                    notifications = nc_response.get('NotificationConfigurations', [])
-
-                # Count unique SNS topic ARNs
-                unique_topics = set()
-                for notif in notifications:
-                    unique_topics.add(notif['TopicARN'])
-                topic_count = len(unique_topics)
-                logger.info(f"ASG {asg_name}: {topic_count} SNS topics out of {serviceQuotaValue}")
-
-                if maxSNSTopicsPerASG < topic_count:
-                    maxSNSTopicsPerASG = topic_count
-                    logger.info(f"Max value={maxSNSTopicsPerASG}")
-                if topic_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": topic_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} SNS topic count ({topic_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        snsTopicsPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        notificationTopics = asgSnapshot.notificationTopics(quotaCode)
+        for asg in asgSnapshot.groups(quotaCode):
+            snsTopicsPerASG.observe(asg['AutoScalingGroupARN'], len(notificationTopics.get(asg['AutoScalingGroupName'], ())))
+        logger.info(f"SNS topics per ASG (max): {snsTopicsPerASG.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxSNSTopicsPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(snsTopicsPerASG.value), snsTopicsPerASG.resourceList(), bool(snsTopicsPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking SNS topics per ASG quota: {e}")
@@ -2021,58 +1384,21 @@ def L_1312BBBF(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxLifecycleHooksPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Lifecycle hooks per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-
-                if is_testing_enabled:
-                    test_filename_lh = f'tests/{inspect.stack()[0][3]}_describe_lifecycle_hooks.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_lh}")
-                    with open(test_filename_lh, 'r') as test_file_content:
-                        hooks = json.load(test_file_content).get('LifecycleHooks', [])
-                else:
-                    lh_response = asg_client.describe_lifecycle_hooks(AutoScalingGroupName=asg_name)
-                    hooks = lh_response.get('LifecycleHooks', [])
-
-                hook_count = len(hooks)
-                logger.info(f"ASG {asg_name}: {hook_count} lifecycle hooks out of {serviceQuotaValue}")
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        lifecycleHooksPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        lifecycleHookCounts = asgSnapshot.lifecycleHookCounts(quotaCode)
+        for asg in asgSnapshot.groups(quotaCode):
+            lifecycleHooksPerASG.observe(asg['AutoScalingGroupARN'], lifecycleHookCounts.get(asg['AutoScalingGroupName'], 0))
+        logger.info(f"Lifecycle hooks per ASG (max): {lifecycleHooksPerASG.value} out of {serviceQuotaValue}")
 
-                if maxLifecycleHooksPerASG < hook_count:
-                    maxLifecycleHooksPerASG = hook_count
-                    logger.info(f"Max value={maxLifecycleHooksPerASG}")
-                if hook_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": hook_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} lifecycle hook count ({hook_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxLifecycleHooksPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(lifecycleHooksPerASG.value), lifecycleHooksPerASG.resourceList(), bool(lifecycleHooksPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Lifecycle hooks per ASG quota: {e}")
@@ -2089,48 +1415,20 @@ def L_05CB8B12(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxTargetGroupsPerASG = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Target groups per ASG quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        targetGroupsPerASG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for asg in asgSnapshot.groups(quotaCode):
+            targetGroupsPerASG.observe(asg['AutoScalingGroupARN'], len(asg['TargetGroupARNs']))
+        logger.info(f"Target groups per ASG (max): {targetGroupsPerASG.value} out of {serviceQuotaValue}")
 
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-                tg_count = len(asg.get('TargetGroupARNs', []))
-                logger.info(f"ASG {asg_name}: {tg_count} target groups out of {serviceQuotaValue}")
-
-                if maxTargetGroupsPerASG < tg_count:
-                    maxTargetGroupsPerASG = tg_count
-                    logger.info(f"Max value={maxTargetGroupsPerASG}")
-                if tg_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": asg['AutoScalingGroupARN'], "usageValue": tg_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"ASG {asg_name} target group count ({tg_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxTargetGroupsPerASG), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(targetGroupsPerASG.value), targetGroupsPerASG.resourceList(), bool(targetGroupsPerASG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Target groups per ASG quota: {e}")
@@ -2147,61 +1445,23 @@ def L_6C2A2F6E(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxStepAdjustmentsPerPolicy = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    asg_client = boto3.client('autoscaling', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Step adjustments per step scaling policy quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_auto_scaling_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                page_iterator = json.load(test_file_content)
-        else:
-            paginator = asg_client.get_paginator('describe_auto_scaling_groups')
-            page_iterator = paginator.paginate()
+        # Shared with the other per-ASG quotas of the region, each describe call is issued once
+        asgSnapshot = quota_collectors.autoScalingSnapshot(region)
+        stepAdjustmentsPerPolicy = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        policies = asgSnapshot.policies(quotaCode)
+        for asg in asgSnapshot.groups(quotaCode):
+            for policy in policies.get(asg['AutoScalingGroupName'], []):
+                if policy['PolicyType'] == 'StepScaling':
+                    stepAdjustmentsPerPolicy.observe(policy['PolicyARN'], policy['StepAdjustments'])
+        logger.info(f"Step adjustments per step scaling policy (max): {stepAdjustmentsPerPolicy.value} out of {serviceQuotaValue}")
 
-        for response in page_iterator:
-            for asg in response['AutoScalingGroups']:
-                asg_name = asg['AutoScalingGroupName']
-
-                if is_testing_enabled:
-                    test_filename_pol = f'tests/{inspect.stack()[0][3]}_describe_policies.json'
-                    logger.info(f"Detected testing enabled. Using test payload from {test_filename_pol}")
-                    with open(test_filename_pol, 'r') as test_file_content:
-                        policies = json.load(test_file_content).get('ScalingPolicies', [])
-                else:
-                    pol_response = asg_client.describe_policies(AutoScalingGroupName=asg_name)
-                    policies = pol_response.get('ScalingPolicies', [])
-
-                for policy in policies:
-                    if policy.get('PolicyType') == 'StepScaling':
-                        policy_name = policy['PolicyName']
-                        step_count = len(policy.get('StepAdjustments', []))
-                        logger.info(f"ASG {asg_name} Policy {policy_name}: {step_count} step adjustments out of {serviceQuotaValue}")
-
-                        if maxStepAdjustmentsPerPolicy < step_count:
-                            maxStepAdjustmentsPerPolicy = step_count
-                            logger.info(f"Max value={maxStepAdjustmentsPerPolicy}")
-                        if step_count / serviceQuotaValue > float(threshold) / 100:
-                            sendQuotaThresholdEvent = True
-                            data = {"resourceARN": policy.get('PolicyARN', policy_name), "usageValue": step_count}
-                            resourceListCrossingThreshold.append(data)
-                            logger.warning(f"Policy {policy_name} step adjustment count ({step_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxStepAdjustmentsPerPolicy), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(stepAdjustmentsPerPolicy.value), stepAdjustmentsPerPolicy.resourceList(), bool(stepAdjustmentsPerPolicy.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Step adjustments per step scaling policy quota: {e}")
@@ -2218,11 +1478,6 @@ def _ebs_concurrent_snapshots_by_volume_type(serviceCode, quotaCode, threshold,
     Helper: Checks concurrent snapshots per volume type.
     Counts in-progress (pending) snapshots for volumes of the given type.
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxConcurrentSnapshots = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
     ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
@@ -2235,50 +1490,29 @@ def _ebs_concurrent_snapshots_by_volume_type(serviceCode, quotaCode, threshold,
         serviceQuotaValue = serviceQuota['Quota']['Value']
         logger.info(f"{quota_name} quota: {serviceQuotaValue}")
 
-        # Get all volumes of the specified type
-        if is_testing_enabled:
-            test_filename = f'tests/{quotaCode}_describe_volumes.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                volumes = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_volumes')
-            volumes = []
-            for page in paginator.paginate(Filters=[{'Name': 'volume-type', 'Values': [volume_type]}]):
-                volumes.extend(page['Volumes'])
-
-        # For each volume, count pending snapshots
-        for vol in volumes:
-            vol_id = vol['VolumeId']
-            if is_testing_enabled:
-                test_filename = f'tests/{quotaCode}_describe_snapshots.json'
-                logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-                with open(test_filename, 'r') as test_file_content:
-                    snapshots = json.load(test_file_content)
-            else:
-                snap_response = ec2.describe_snapshots(
-                    Filters=[
-                        {'Name': 'volume-id', 'Values': [vol_id]},
-                        {'Name': 'status', 'Values': ['pending']}
-                    ],
-                    OwnerIds=['self']
-                )
-                snapshots = snap_response['Snapshots']
-
-            pending_count = len(snapshots)
-            logger.info(f"Volume {vol_id} ({volume_type}): {pending_count} pending snapshots")
-
-            if maxConcurrentSnapshots < pending_count:
-                maxConcurrentSnapshots = pending_count
-                logger.info(f"Max value={maxConcurrentSnapshots}")
-
-            if pending_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                data = {"resourceARN": vol_id, "usageValue": pending_count}
-                resourceListCrossingThreshold.append(data)
-                logger.warning(f"Volume {vol_id} pending snapshot count ({pending_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Only the ids of volumes of the requested type are kept, not the full volume descriptions
+        volume_ids = set()
+        for vol in quota_stream.streamItems(
+            ec2, 'describe_volumes', 'Volumes',
+            testFilename=f"tests/{quotaCode.replace('-', '_')}_describe_volumes.json",
+            Filters=[{'Name': 'volume-type', 'Values': [volume_type]}]
+        ):
+            volume_ids.add(vol['VolumeId'])
+
+        # One paginated pass over the pending snapshots instead of one call per volume
+        snapshots = quota_stream.streamItems(
+            ec2, 'describe_snapshots', 'Snapshots',
+            testFilename=f"tests/{quotaCode.replace('-', '_')}_describe_snapshots.json",
+            OwnerIds=['self'], Filters=[{'Name': 'status', 'Values': ['pending']}]
+        )
+        pendingPerVolume = quota_stream.GroupCountReducer(
+            lambda snapshot: snapshot.get('VolumeId') if snapshot.get('VolumeId') in volume_ids else None,
+            serviceQuotaValue, threshold
+        )
+        quota_stream.reduceItems(snapshots, pendingPerVolume)
+        logger.info(f"Max pending snapshots per {volume_type} volume: {pendingPerVolume.value}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxConcurrentSnapshots), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(pendingPerVolume.value), pendingPerVolume.resourceList(), bool(pendingPerVolume.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking {quota_name}: {e}")
@@ -2339,7 +1573,6 @@ def L_8656991D(serviceCode, quotaCode, threshold, region):
     """
     Concurrent snapshot copies per destination Region
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
     sendQuotaThresholdEvent = False
 
     ec2 = boto3.client('ec2', region_name=region)
@@ -2354,19 +1587,16 @@ def L_8656991D(serviceCode, quotaCode, threshold, region):
         serviceQuotaValue = serviceQuota['Quota']['Value']
         logger.info(f"Concurrent snapshot copies per destination Region quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_snapshots.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                snapshots = json.load(test_file_content)
-        else:
-            # Count all pending snapshots in this region (destination region for copies)
-            paginator = ec2.get_paginator('describe_snapshots')
-            snapshots = []
-            for page in paginator.paginate(OwnerIds=['self'], Filters=[{'Name': 'status', 'Values': ['pending']}]):
-                snapshots.extend(page['Snapshots'])
+        # Count all pending snapshots in this region (destination region for copies) page by page
+        snapshots = quota_stream.streamItems(
+            ec2, 'describe_snapshots', 'Snapshots',
+            testFilename=f'tests/{inspect.stack()[0][3]}_describe_snapshots.json',
+            OwnerIds=['self'], Filters=[{'Name': 'status', 'Values': ['pending']}]
+        )
+        pendingSnapshots = quota_stream.CountReducer()
+        quota_stream.reduceItems(snapshots, pendingSnapshots)
 
-        pendingCount = len(snapshots)
+        pendingCount = pendingSnapshots.value
         logger.info(f"Concurrent pending snapshot copies in region {region}: {pendingCount}")
 
         if pendingCount / serviceQuotaValue > float(threshold) / 100:
@@ -2381,78 +1611,30 @@ def L_8656991D(serviceCode, quotaCode, threshold, region):
         logger.error(f"Unexpected error: {e}")
 
 
-# ============================================================
-# EC2 Quotas
-# ============================================================
-
-def L_350B2172(serviceCode, quotaCode, threshold, region):
-    """
-    Direct Connect gateways per transit gateway
-    """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxDxGwPerTgw = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    ec2 = boto3.client('ec2', region_name=region)
-    dx = boto3.client('directconnect', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-
-    try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
-        logger.info(f"Direct Connect gateways per transit gateway quota: {serviceQuotaValue}")
-
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_transit_gateways.json'
-            with open(test_filename, 'r') as f:
-                page_iterator = json.load(f)
-        else:
-            paginator = ec2.get_paginator('describe_transit_gateways')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            for tgw in response['TransitGateways']:
-                tgw_id = tgw['TransitGatewayId']
-
-                if is_testing_enabled:
-                    test_filename = f'tests/{inspect.stack()[0][3]}_describe_direct_connect_gateway_attachments.json'
-                    with open(test_filename, 'r') as f:
-                        attachments = json.load(f)
-                else:
-                    attachments = dx.describe_direct_connect_gateway_attachments(
-                        virtualInterfaceId=None
-                    ).get('directConnectGatewayAttachments', [])
-                    # Filter to attachments for this TGW
-                    attachments = [a for a in attachments if a.get('virtualInterfaceOwnerAccount') and a.get('stateChangeError') is None]
-
-                    # Use EC2 TGW attachments to find DX gateway associations
-                    dx_attach_response = ec2.describe_transit_gateway_attachments(
-                        Filters=[
-                            {'Name': 'transit-gateway-id', 'Values': [tgw_id]},
-                            {'Name': 'resource-type', 'Values': ['direct-connect-gateway']}
-                        ]
-                    )
-                    attachments = dx_attach_response.get('TransitGatewayAttachments', [])
+# ============================================================
+# EC2 Quotas
+# ============================================================
 
-                dx_gw_count = len(attachments)
-                logger.info(f"TGW {tgw_id}: {dx_gw_count} Direct Connect gateway attachments")
+def L_350B2172(serviceCode, quotaCode, threshold, region):
+    """
+    Direct Connect gateways per transit gateway
+    """
+    sq = boto3.client('service-quotas', region_name=region)
 
-                if maxDxGwPerTgw < dx_gw_count:
-                    maxDxGwPerTgw = dx_gw_count
-                    logger.info(f"Max value={maxDxGwPerTgw}")
+    try:
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
+        logger.info(f"Direct Connect gateways per transit gateway quota: {serviceQuotaValue}")
 
-                if dx_gw_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": tgw_id, "usageValue": dx_gw_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"TGW {tgw_id} DX gateway count ({dx_gw_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        ec2Snapshot = quota_collectors.ec2Snapshot(region)
+        attachments = ec2Snapshot.transitGatewayAttachments(quotaCode)
+        dxGwPerTgw = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for tgw_id in ec2Snapshot.transitGateways(quotaCode):
+            dx_gw_count = sum(1 for attachment in attachments.get(tgw_id, []) if attachment['ResourceType'] == 'direct-connect-gateway')
+            logger.info(f"TGW {tgw_id}: {dx_gw_count} Direct Connect gateway attachments")
+            dxGwPerTgw.observe(tgw_id, dx_gw_count)
+        logger.info(f"Direct Connect gateways per transit gateway (max): {dxGwPerTgw.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxDxGwPerTgw), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(dxGwPerTgw.value), dxGwPerTgw.resourceList(), bool(dxGwPerTgw.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Direct Connect gateways per TGW quota: {e}")
@@ -2816,33 +1998,20 @@ def L_D92B9F5B(serviceCode, quotaCode, threshold, region):
     VPC Attachment Bandwidth (per transit gateway VPC attachment)
     This is a per-attachment bandwidth limit. We count TGW VPC attachments.
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
     sendQuotaThresholdEvent = False
 
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"VPC Attachment Bandwidth quota: {serviceQuotaValue}")
 
-        totalVpcAttachments = 0
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_transit_gateway_vpc_attachments.json'
-            with open(test_filename, 'r') as f:
-                page_iterator = json.load(f)
-        else:
-            paginator = ec2.get_paginator('describe_transit_gateway_vpc_attachments')
-            page_iterator = paginator.paginate()
-
-        for response in page_iterator:
-            totalVpcAttachments += len(response.get('TransitGatewayVpcAttachments', []))
-
+        totalVpcAttachments = sum(
+            1
+            for attachments in quota_collectors.ec2Snapshot(region).transitGatewayAttachments(quotaCode).values()
+            for attachment in attachments
+            if attachment['ResourceType'] == 'vpc'
+        )
         logger.info(f"Total TGW VPC attachments: {totalVpcAttachments}")
 
         # This quota is bandwidth per attachment, so we report the count of attachments
@@ -3089,42 +2258,21 @@ def L_D060B150(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxShardsPerCluster = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Shards per cluster (Redis cluster mode disabled) quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_replication_groups')
-        for page in paginator.paginate():
-            for rg in page['ReplicationGroups']:
-                # Cluster mode disabled means ClusterEnabled is False
-                if not rg.get('ClusterEnabled', False):
-                    rg_id = rg['ReplicationGroupId']
-                    shard_count = len(rg.get('NodeGroups', []))
-                    logger.info(f"Replication Group {rg_id} (cluster mode disabled): {shard_count} shards")
-
-                    if maxShardsPerCluster < shard_count:
-                        maxShardsPerCluster = shard_count
-                        logger.info(f"Max value={maxShardsPerCluster}")
-                    if shard_count / serviceQuotaValue > float(threshold) / 100:
-                        sendQuotaThresholdEvent = True
-                        data = {"resourceARN": rg_id, "usageValue": shard_count}
-                        resourceListCrossingThreshold.append(data)
-                        logger.warning(f"Replication Group {rg_id} shard count ({shard_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        # Shared with the other ElastiCache quotas of the region, each listing is read once
+        cacheSnapshot = quota_collectors.elastiCacheSnapshot(region)
+        shardsPerCluster = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for rg_id, rg in cacheSnapshot.replicationGroups(quotaCode).items():
+            if not rg['ClusterEnabled']:
+                shardsPerCluster.observe(rg_id, len(rg['Shards']))
+        logger.info(f"Shards per cluster (Redis cluster mode disabled) (max): {shardsPerCluster.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxShardsPerCluster), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(shardsPerCluster.value), shardsPerCluster.resourceList(), bool(shardsPerCluster.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking shards per cluster (cluster mode disabled) quota: {e}")
@@ -3135,50 +2283,27 @@ def L_D060B150(serviceCode, quotaCode, threshold, region):
 def L_7D6587E6(serviceCode, quotaCode, threshold, region):
     """
     Checks Nodes per shard (Redis)
-    Iterates replication groups, then node groups (shards), counting members per shard.
+    Reads the node count of every shard from the shards by replication group index.
     :param serviceCode: The service code (elasticache)
     :param quotaCode: The quota code (L-7D6587E6)
     :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxNodesPerShard = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Nodes per shard (Redis) quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_replication_groups')
-        for page in paginator.paginate():
-            for rg in page['ReplicationGroups']:
-                rg_id = rg['ReplicationGroupId']
-                for ng in rg.get('NodeGroups', []):
-                    ng_id = ng['NodeGroupId']
-                    node_count = len(ng.get('NodeGroupMembers', []))
-                    resource_id = f"{rg_id}/{ng_id}"
-                    logger.info(f"Replication Group {rg_id}, Shard {ng_id}: {node_count} nodes")
-
-                    if maxNodesPerShard < node_count:
-                        maxNodesPerShard = node_count
-                        logger.info(f"Max value={maxNodesPerShard}")
-                    if node_count / serviceQuotaValue > float(threshold) / 100:
-                        sendQuotaThresholdEvent = True
-                        data = {"resourceARN": resource_id, "usageValue": node_count}
-                        resourceListCrossingThreshold.append(data)
-                        logger.warning(f"Shard {resource_id} node count ({node_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        cacheSnapshot = quota_collectors.elastiCacheSnapshot(region)
+        nodesPerShard = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for rg_id, rg in cacheSnapshot.replicationGroups(quotaCode).items():
+            for ng_id, node_count in rg['Shards'].items():
+                nodesPerShard.observe(f"{rg_id}/{ng_id}", node_count)
+        logger.info(f"Nodes per shard (Redis) (max): {nodesPerShard.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxNodesPerShard), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(nodesPerShard.value), nodesPerShard.resourceList(), bool(nodesPerShard.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking nodes per shard quota: {e}")
@@ -3195,30 +2320,17 @@ def L_3E7F7726(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numSubnetGroups = 0
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Subnet groups per Region quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_cache_subnet_groups')
-        for page in paginator.paginate():
-            numSubnetGroups += len(page['CacheSubnetGroups'])
-
+        numSubnetGroups = len(quota_collectors.elastiCacheSnapshot(region).subnetGroups(quotaCode))
         logger.info(f"Total ElastiCache subnet groups in {region}: {numSubnetGroups}")
 
-        if numSubnetGroups / serviceQuotaValue > float(threshold) / 100:
-            sendQuotaThresholdEvent = True
+        sendQuotaThresholdEvent = quota_stream.isOverThreshold(numSubnetGroups, serviceQuotaValue, threshold)
+        if sendQuotaThresholdEvent:
             logger.warning(f"Subnet group count ({numSubnetGroups}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
 
         updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(numSubnetGroups), "", sendQuotaThresholdEvent)
@@ -3232,50 +2344,29 @@ def L_3E7F7726(serviceCode, quotaCode, threshold, region):
 def L_AF354865(serviceCode, quotaCode, threshold, region):
     """
     Checks Nodes per cluster per instance type (Redis cluster mode enabled)
-    For cluster mode enabled replication groups, counts total nodes (across all shards).
+    For cluster mode enabled replication groups, counts the nodes of each instance type
+    (a replication group can mix types while it is being scaled vertically).
     :param serviceCode: The service code (elasticache)
     :param quotaCode: The quota code (L-AF354865)
     :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxNodesPerCluster = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Nodes per cluster per instance type (Redis cluster mode enabled) quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_replication_groups')
-        for page in paginator.paginate():
-            for rg in page['ReplicationGroups']:
-                if rg.get('ClusterEnabled', False):
-                    rg_id = rg['ReplicationGroupId']
-                    total_nodes = 0
-                    for ng in rg.get('NodeGroups', []):
-                        total_nodes += len(ng.get('NodeGroupMembers', []))
-                    logger.info(f"Replication Group {rg_id} (cluster mode enabled): {total_nodes} total nodes")
-
-                    if maxNodesPerCluster < total_nodes:
-                        maxNodesPerCluster = total_nodes
-                        logger.info(f"Max value={maxNodesPerCluster}")
-                    if total_nodes / serviceQuotaValue > float(threshold) / 100:
-                        sendQuotaThresholdEvent = True
-                        data = {"resourceARN": rg_id, "usageValue": total_nodes}
-                        resourceListCrossingThreshold.append(data)
-                        logger.warning(f"Replication Group {rg_id} node count ({total_nodes}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        cacheSnapshot = quota_collectors.elastiCacheSnapshot(region)
+        replicationGroups = cacheSnapshot.replicationGroups(quotaCode)
+        nodesPerCluster = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for (rg_id, node_type), node_count in cacheSnapshot.nodesByInstanceType(quotaCode).items():
+            if replicationGroups.get(rg_id, {}).get('ClusterEnabled', False):
+                nodesPerCluster.observe(f"{rg_id}/{node_type}", node_count)
+        logger.info(f"Nodes per cluster per instance type (Redis cluster mode enabled) (max): {nodesPerCluster.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxNodesPerCluster), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(nodesPerCluster.value), nodesPerCluster.resourceList(), bool(nodesPerCluster.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking nodes per cluster (cluster mode enabled) quota: {e}")
@@ -3292,30 +2383,17 @@ def L_3F15A733(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numParameterGroups = 0
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Parameter groups per Region quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_cache_parameter_groups')
-        for page in paginator.paginate():
-            numParameterGroups += len(page['CacheParameterGroups'])
-
+        numParameterGroups = quota_collectors.elastiCacheSnapshot(region).parameterGroupCount(quotaCode)
         logger.info(f"Total ElastiCache parameter groups in {region}: {numParameterGroups}")
 
-        if numParameterGroups / serviceQuotaValue > float(threshold) / 100:
-            sendQuotaThresholdEvent = True
+        sendQuotaThresholdEvent = quota_stream.isOverThreshold(numParameterGroups, serviceQuotaValue, threshold)
+        if sendQuotaThresholdEvent:
             logger.warning(f"Parameter group count ({numParameterGroups}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
 
         updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(numParameterGroups), "", sendQuotaThresholdEvent)
@@ -3329,37 +2407,25 @@ def L_3F15A733(serviceCode, quotaCode, threshold, region):
 def L_DFE45DF3(serviceCode, quotaCode, threshold, region):
     """
     Checks Nodes per Region (ElastiCache)
-    Counts all cache cluster nodes in the region.
+    Sums the nodes of every cache cluster in the region (a Memcached cluster holds several nodes).
     :param serviceCode: The service code (elasticache)
     :param quotaCode: The quota code (L-DFE45DF3)
     :param threshold: The threshold value
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numNodesPerRegion = 0
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Nodes per Region quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_cache_clusters')
-        for page in paginator.paginate():
-            numNodesPerRegion += len(page['CacheClusters'])
-
+        cacheClusters = quota_collectors.elastiCacheSnapshot(region).cacheClusters(quotaCode)
+        numNodesPerRegion = sum(cluster['NumCacheNodes'] for cluster in cacheClusters.values())
         logger.info(f"Total ElastiCache nodes in {region}: {numNodesPerRegion}")
 
-        if numNodesPerRegion / serviceQuotaValue > float(threshold) / 100:
-            sendQuotaThresholdEvent = True
+        sendQuotaThresholdEvent = quota_stream.isOverThreshold(numNodesPerRegion, serviceQuotaValue, threshold)
+        if sendQuotaThresholdEvent:
             logger.warning(f"Node count ({numNodesPerRegion}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
 
         updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(numNodesPerRegion), "", sendQuotaThresholdEvent)
@@ -3379,40 +2445,19 @@ def L_A87EE522(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxSubnetsPerGroup = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Subnets per subnet group quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_cache_subnet_groups')
-        for page in paginator.paginate():
-            for sg in page['CacheSubnetGroups']:
-                sg_name = sg['CacheSubnetGroupName']
-                subnet_count = len(sg.get('Subnets', []))
-                logger.info(f"Subnet Group {sg_name}: {subnet_count} subnets")
-
-                if maxSubnetsPerGroup < subnet_count:
-                    maxSubnetsPerGroup = subnet_count
-                    logger.info(f"Max value={maxSubnetsPerGroup}")
-                if subnet_count / serviceQuotaValue > float(threshold) / 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": sg_name, "usageValue": subnet_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"Subnet Group {sg_name} subnet count ({subnet_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        cacheSnapshot = quota_collectors.elastiCacheSnapshot(region)
+        subnetsPerGroup = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for sg_name, subnet_count in cacheSnapshot.subnetGroups(quotaCode).items():
+            subnetsPerGroup.observe(sg_name, subnet_count)
+        logger.info(f"Subnets per subnet group (max): {subnetsPerGroup.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxSubnetsPerGroup), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(subnetsPerGroup.value), subnetsPerGroup.resourceList(), bool(subnetsPerGroup.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking ElastiCache subnets per subnet group quota: {e}")
@@ -3430,41 +2475,20 @@ def L_8C334AD1(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    maxNodesPerCluster = 0
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Nodes per cluster (Memcached) quota: {serviceQuotaValue}")
 
-        paginator = elasticache.get_paginator('describe_cache_clusters')
-        for page in paginator.paginate(ShowCacheNodeInfo=True):
-            for cluster in page['CacheClusters']:
-                if cluster.get('Engine', '').lower() == 'memcached':
-                    cluster_id = cluster['CacheClusterId']
-                    node_count = cluster.get('NumCacheNodes', 0)
-                    logger.info(f"Memcached Cluster {cluster_id}: {node_count} nodes")
-
-                    if maxNodesPerCluster < node_count:
-                        maxNodesPerCluster = node_count
-                        logger.info(f"Max value={maxNodesPerCluster}")
-                    if node_count / serviceQuotaValue > float(threshold) / 100:
-                        sendQuotaThresholdEvent = True
-                        data = {"resourceARN": cluster_id, "usageValue": node_count}
-                        resourceListCrossingThreshold.append(data)
-                        logger.warning(f"Memcached Cluster {cluster_id} node count ({node_count}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
+        cacheSnapshot = quota_collectors.elastiCacheSnapshot(region)
+        nodesPerCluster = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for cluster_id, cluster in cacheSnapshot.cacheClusters(quotaCode).items():
+            if cluster['Engine'] == 'memcached':
+                nodesPerCluster.observe(cluster_id, cluster['NumCacheNodes'])
+        logger.info(f"Nodes per cluster (Memcached) (max): {nodesPerCluster.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxNodesPerCluster), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(nodesPerCluster.value), nodesPerCluster.resourceList(), bool(nodesPerCluster.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Memcached nodes per cluster quota: {e}")
@@ -3484,38 +2508,17 @@ def L_D2FEF667(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    numSecurityGroups = 0
-    sendQuotaThresholdEvent = False
-
-    elasticache = boto3.client('elasticache', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = serviceQuota['Quota']['Value']
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Security groups per Region (ElastiCache) quota: {serviceQuotaValue}")
 
-        try:
-            paginator = elasticache.get_paginator('describe_cache_security_groups')
-            for page in paginator.paginate():
-                numSecurityGroups += len(page['CacheSecurityGroups'])
-        except ClientError as e:
-            # describe_cache_security_groups is not supported in VPC-only regions
-            if 'InvalidParameterValue' in str(e) or 'Default' in str(e):
-                logger.info(f"Cache security groups not applicable in this region (VPC-only): {e}")
-                numSecurityGroups = 0
-            else:
-                raise
-
+        numSecurityGroups = quota_collectors.elastiCacheSnapshot(region).securityGroupCount(quotaCode)
         logger.info(f"Total ElastiCache security groups in {region}: {numSecurityGroups}")
 
-        if serviceQuotaValue > 0 and numSecurityGroups / serviceQuotaValue > float(threshold) / 100:
-            sendQuotaThresholdEvent = True
+        sendQuotaThresholdEvent = quota_stream.isOverThreshold(numSecurityGroups, serviceQuotaValue, threshold)
+        if sendQuotaThresholdEvent:
             logger.warning(f"Security group count ({numSecurityGroups}) exceeds {float(threshold)}% of the quota ({serviceQuotaValue})")
 
         updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(numSecurityGroups), "", sendQuotaThresholdEvent)
@@ -3535,52 +2538,20 @@ def L_36B04611(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_sg_count = 0
-
-    rds_client = boto3.client('rds', region_name=region)
     sq_client = boto3.client('service-quotas', region_name=region)
 
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-
     try:
-        serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = float(quota_specs.getServiceQuotaValue(sq_client, serviceCode, quotaCode))
         logger.info(f"RDS VPC Security Groups quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_db_instances.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                db_instances = json.load(test_file_content)
-        else:
-            paginator = rds_client.get_paginator('describe_db_instances')
-            db_instances = []
-            for page in paginator.paginate():
-                db_instances.extend(page['DBInstances'])
-
-        for db_instance in db_instances:
-            db_id = db_instance['DBInstanceIdentifier']
-            sg_count = len(db_instance.get('VpcSecurityGroups', []))
-
-            usage_percentage = (sg_count / serviceQuotaValue) * 100
-            logger.info(f"RDS Instance {db_id}: {sg_count} VPC security groups out of {serviceQuotaValue}")
+        # Shared with the other RDS quotas of the region, describe_db_instances is paged once
+        rdsSnapshot = quota_collectors.rdsSnapshot(region)
+        sgPerInstance = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for db_instance in rdsSnapshot.instances(quotaCode):
+            sgPerInstance.observe(db_instance['DBInstanceArn'], len(db_instance['VpcSecurityGroupIds']))
+        logger.info(f"RDS VPC Security Groups per instance (max): {sgPerInstance.value} out of {serviceQuotaValue}")
 
-            if max_sg_count < sg_count:
-                max_sg_count = sg_count
-                logger.info(f"Max value={max_sg_count}")
-
-            if usage_percentage > float(threshold):
-                data = {
-                    "resourceARN": db_instance.get('DBInstanceArn', db_id),
-                    "usageValue": sg_count
-                }
-                resourceListCrossingThreshold.append(data)
-                sendQuotaThresholdEvent = True
-                logger.warning(f"RDS Instance {db_id} SG count ({sg_count}) exceeds {threshold}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_sg_count), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(sgPerInstance.value), sgPerInstance.resourceList(), bool(sgPerInstance.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking RDS VPC Security Groups quota: {e}")
@@ -3590,69 +2561,27 @@ def L_36B04611(serviceCode, quotaCode, threshold, region):
 
 def L_85E66A03(serviceCode, quotaCode, threshold, region):
     """
-    Checks the Tags per RDS resource quota usage
+    Checks the Tags per RDS resource quota usage across DB instances, clusters, snapshots and parameter groups
     :param serviceCode: The service code (rds)
     :param quotaCode: The quota code for Tags per resource
     :param threshold: The threshold value (e.g., 80)
     :param region: The AWS region to check
     :return: None
     """
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_tag_count = 0
-
-    rds_client = boto3.client('rds', region_name=region)
     sq_client = boto3.client('service-quotas', region_name=region)
 
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-
     try:
-        serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = float(quota_specs.getServiceQuotaValue(sq_client, serviceCode, quotaCode))
         logger.info(f"RDS Tags per resource quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_db_instances.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                db_instances = json.load(test_file_content)
-        else:
-            paginator = rds_client.get_paginator('describe_db_instances')
-            db_instances = []
-            for page in paginator.paginate():
-                db_instances.extend(page['DBInstances'])
-
-        for db_instance in db_instances:
-            db_id = db_instance['DBInstanceIdentifier']
-            db_arn = db_instance.get('DBInstanceArn', db_id)
-
-            if is_testing_enabled:
-                tag_test_filename = f'tests/{inspect.stack()[0][3]}_list_tags.json'
-                logger.info(f"Detected testing enabled. Using test payload from {tag_test_filename}")
-                with open(tag_test_filename, 'r') as test_file_content:
-                    tags_response = json.load(test_file_content)
-            else:
-                tags_response = rds_client.list_tags_for_resource(ResourceName=db_arn)
-
-            tag_count = len(tags_response.get('TagList', []))
-
-            usage_percentage = (tag_count / serviceQuotaValue) * 100
-            logger.info(f"RDS Instance {db_id}: {tag_count} tags out of {serviceQuotaValue}")
-
-            if max_tag_count < tag_count:
-                max_tag_count = tag_count
-                logger.info(f"Max value={max_tag_count}")
-
-            if usage_percentage > float(threshold):
-                data = {
-                    "resourceARN": db_arn,
-                    "usageValue": tag_count
-                }
-                resourceListCrossingThreshold.append(data)
-                sendQuotaThresholdEvent = True
-                logger.warning(f"RDS Instance {db_id} tag count ({tag_count}) exceeds {threshold}% of the quota ({serviceQuotaValue})")
+        # Tags are read from the TagList embedded in the describe responses, not per resource
+        tagCounts = quota_collectors.rdsSnapshot(region).tagCounts(quotaCode)
+        tagsPerResource = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for resource_arn, tag_count in tagCounts.items():
+            tagsPerResource.observe(resource_arn, tag_count)
+        logger.info(f"RDS Tags per resource (max over {len(tagCounts)} resources): {tagsPerResource.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_tag_count), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(tagsPerResource.value), tagsPerResource.resourceList(), bool(tagsPerResource.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking RDS Tags per resource quota: {e}")
@@ -3669,78 +2598,31 @@ def L_E9D71017(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_rule_count = 0
-
-    rds_client = boto3.client('rds', region_name=region)
-    ec2_client = boto3.client('ec2', region_name=region)
     sq_client = boto3.client('service-quotas', region_name=region)
 
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-
     try:
-        serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = float(quota_specs.getServiceQuotaValue(sq_client, serviceCode, quotaCode))
         logger.info(f"RDS Rules per security group quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_db_instances.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                db_instances = json.load(test_file_content)
-        else:
-            paginator = rds_client.get_paginator('describe_db_instances')
-            db_instances = []
-            for page in paginator.paginate():
-                db_instances.extend(page['DBInstances'])
-
-        # Collect unique VPC security group IDs across all RDS instances
+        # Collect unique VPC security group IDs across all RDS instances of the shared snapshot
         sg_ids = set()
-        for db_instance in db_instances:
-            for sg in db_instance.get('VpcSecurityGroups', []):
-                sg_ids.add(sg['VpcSecurityGroupId'])
+        for db_instance in quota_collectors.rdsSnapshot(region).instances(quotaCode):
+            sg_ids.update(db_instance['VpcSecurityGroupIds'])
 
         if not sg_ids:
             logger.info("No VPC security groups found for RDS instances")
             updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), "0", "[]", False)
             return
 
-        if is_testing_enabled:
-            sg_test_filename = f'tests/{inspect.stack()[0][3]}_describe_security_groups.json'
-            logger.info(f"Detected testing enabled. Using test payload from {sg_test_filename}")
-            with open(sg_test_filename, 'r') as test_file_content:
-                security_groups = json.load(test_file_content)
-        else:
-            # Describe security groups in batches (API supports up to 200 IDs)
-            security_groups = []
-            sg_id_list = list(sg_ids)
-            for i in range(0, len(sg_id_list), 200):
-                batch = sg_id_list[i:i+200]
-                response = ec2_client.describe_security_groups(GroupIds=batch)
-                security_groups.extend(response['SecurityGroups'])
-
-        for sg in security_groups:
-            sg_id = sg['GroupId']
-            rule_count = len(sg.get('IpPermissions', [])) + len(sg.get('IpPermissionsEgress', []))
-
-            usage_percentage = (rule_count / serviceQuotaValue) * 100
-            logger.info(f"Security Group {sg_id}: {rule_count} rules out of {serviceQuotaValue}")
-
-            if max_rule_count < rule_count:
-                max_rule_count = rule_count
-                logger.info(f"Max value={max_rule_count}")
-
-            if usage_percentage > float(threshold):
-                data = {
-                    "resourceARN": sg_id,
-                    "usageValue": rule_count
-                }
-                resourceListCrossingThreshold.append(data)
-                sendQuotaThresholdEvent = True
-                logger.warning(f"Security Group {sg_id} rule count ({rule_count}) exceeds {threshold}% of the quota ({serviceQuotaValue})")
+        # Inbound plus outbound rules, read from the region's security group rule index
+        ruleCounts = quota_collectors.ec2Snapshot(region).securityGroupRuleCounts(quotaCode)
+        rulesPerSG = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for sg_id in sorted(sg_ids):
+            counts = ruleCounts.get(sg_id, {})
+            rulesPerSG.observe(sg_id, counts.get(quota_collectors.INBOUND, 0) + counts.get(quota_collectors.OUTBOUND, 0))
+        logger.info(f"RDS Rules per security group (max over {len(sg_ids)} groups): {rulesPerSG.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_rule_count), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(rulesPerSG.value), rulesPerSG.resourceList(), bool(rulesPerSG.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking RDS Rules per security group quota: {e}")
@@ -3776,12 +2658,16 @@ def L_A399AC0B(serviceCode, quotaCode, threshold, region):
             with open(test_filename, 'r') as test_file_content:
                 engine_versions = json.load(test_file_content)
         else:
-            paginator = rds_client.get_paginator('describe_db_engine_versions')
-            engine_versions = []
-            for page in paginator.paginate():
-                for version in page['DBEngineVersions']:
-                    if version.get('DatabaseInstallationFilesS3BucketName'):
-                        engine_versions.append(version)
+            def fetch():
+                paginator = rds_client.get_paginator('describe_db_engine_versions')
+                custom_versions = []
+                for page in paginator.paginate():
+                    for version in page['DBEngineVersions']:
+                        if version.get('DatabaseInstallationFilesS3BucketName'):
+                            custom_versions.append(version['Engine'] + ':' + version['EngineVersion'])
+                return custom_versions
+            # Reuse a recent enumeration on warm invocations when the quota has a CacheTTLMinutes
+            engine_versions = quota_cache.cached(quotaCode, f'rds:custom_engine_versions:{region}', fetch)
 
         custom_engine_count = len(engine_versions)
         logger.info(f"RDS Custom engine versions count: {custom_engine_count} out of {serviceQuotaValue}")
@@ -4367,52 +3253,19 @@ def L_5F53652F(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_eip_count = 0
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Elastic IP addresses per NAT gateway quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_nat_gateways.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                nat_gateways = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_nat_gateways')
-            nat_gateways = []
-            for page in paginator.paginate(Filters=[{'Name': 'state', 'Values': ['available']}]):
-                nat_gateways.extend(page['NatGateways'])
-
-        for ngw in nat_gateways:
-            ngw_id = ngw['NatGatewayId']
-            # Count EIPs associated with this NAT gateway
-            eip_count = sum(1 for addr in ngw.get('NatGatewayAddresses', []) if addr.get('AllocationId'))
-            logger.info(f"NAT Gateway {ngw_id}: {eip_count} Elastic IPs out of {serviceQuotaValue}")
-
-            if max_eip_count < eip_count:
-                max_eip_count = eip_count
-                logger.info(f"Max value={max_eip_count}")
-
-            usage_percentage = (eip_count / serviceQuotaValue) * 100
-            if usage_percentage > float(threshold) * 100:
-                sendQuotaThresholdEvent = True
-                data = {"resourceARN": ngw_id, "usageValue": eip_count}
-                resourceListCrossingThreshold.append(data)
-                logger.warning(f"NAT Gateway {ngw_id} EIP count ({eip_count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
+        eipsPerNatGateway = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for ngw_id, ngw in quota_collectors.ec2Snapshot(region).natGateways(quotaCode).items():
+            if ngw['State'] == 'available':
+                eipsPerNatGateway.observe(ngw_id, ngw['ElasticIps'])
+        logger.info(f"Elastic IP addresses per NAT gateway (max): {eipsPerNatGateway.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_eip_count), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(eipsPerNatGateway.value), eipsPerNatGateway.resourceList(), bool(eipsPerNatGateway.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Elastic IP per NAT gateway quota: {e}")
@@ -4429,58 +3282,7 @@ def L_085A6257(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_ipv6_cidrs = 0
-
-    ec2 = boto3.client('ec2', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-
-    try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
-        logger.info(f"IPv6 CIDR blocks per VPC quota: {serviceQuotaValue}")
-
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_vpcs.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                vpcs_pages = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_vpcs')
-            vpcs_pages = paginator.paginate()
-
-        for page in vpcs_pages:
-            for vpc in page['Vpcs']:
-                vpc_id = vpc['VpcId']
-                # Count IPv6 CIDR block associations
-                ipv6_cidrs = [assoc for assoc in vpc.get('Ipv6CidrBlockAssociationSet', [])
-                              if assoc.get('Ipv6CidrBlockState', {}).get('State') == 'associated']
-                ipv6_count = len(ipv6_cidrs)
-                logger.info(f"VPC {vpc_id}: {ipv6_count} IPv6 CIDR blocks out of {serviceQuotaValue}")
-
-                if max_ipv6_cidrs < ipv6_count:
-                    max_ipv6_cidrs = ipv6_count
-                    logger.info(f"Max value={max_ipv6_cidrs}")
-
-                usage_percentage = (ipv6_count / serviceQuotaValue) * 100
-                if usage_percentage > float(threshold) * 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": vpc_id, "usageValue": ipv6_count}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"VPC {vpc_id} IPv6 CIDR count ({ipv6_count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_ipv6_cidrs), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
-
-    except ClientError as e:
-        logger.error(f"Error checking IPv6 CIDR blocks per VPC quota: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_3248932A(serviceCode, quotaCode, threshold, region):
@@ -4492,51 +3294,18 @@ def L_3248932A(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    max_policy_length = 0
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Characters per VPC endpoint policy quota: {serviceQuotaValue}")
 
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_vpc_endpoints.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                endpoints_pages = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_vpc_endpoints')
-            endpoints_pages = paginator.paginate()
-
-        for page in endpoints_pages:
-            for endpoint in page['VpcEndpoints']:
-                endpoint_id = endpoint['VpcEndpointId']
-                policy_doc = endpoint.get('PolicyDocument', '')
-                policy_length = len(policy_doc)
-                logger.info(f"VPC Endpoint {endpoint_id}: policy length {policy_length} chars out of {serviceQuotaValue}")
-
-                if max_policy_length < policy_length:
-                    max_policy_length = policy_length
-                    logger.info(f"Max value={max_policy_length}")
-
-                usage_percentage = (policy_length / serviceQuotaValue) * 100
-                if usage_percentage > float(threshold) * 100:
-                    sendQuotaThresholdEvent = True
-                    data = {"resourceARN": endpoint_id, "usageValue": policy_length}
-                    resourceListCrossingThreshold.append(data)
-                    logger.warning(f"VPC Endpoint {endpoint_id} policy length ({policy_length}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
+        policyLength = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for endpointId, endpoint in quota_collectors.ec2Snapshot(region).vpcEndpoints(quotaCode).items():
+            policyLength.observe(endpointId, endpoint['PolicyLength'])
+        logger.info(f"Characters per VPC endpoint policy (max): {policyLength.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(max_policy_length), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(policyLength.value), policyLength.resourceList(), bool(policyLength.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Characters per VPC endpoint policy quota: {e}")
@@ -4553,57 +3322,19 @@ def L_29B6F2EB(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    resourceListCrossingThreshold = []
-    sendQuotaThresholdEvent = False
-    maxInterfaceEndpointsPerVPC = 0
-
-    ec2 = boto3.client('ec2', region_name=region)
     sq = boto3.client('service-quotas', region_name=region)
 
     try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
         logger.info(f"Interface VPC Endpoints per VPC quota: {serviceQuotaValue}")
 
-        # Build a map of VPC -> count of Interface endpoints
-        vpc_endpoint_counts = defaultdict(int)
-
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_vpc_endpoints.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                endpoints_pages = json.load(test_file_content)
-        else:
-            paginator = ec2.get_paginator('describe_vpc_endpoints')
-            endpoints_pages = paginator.paginate(
-                Filters=[{'Name': 'vpc-endpoint-type', 'Values': ['Interface']}]
-            )
-
-        for page in endpoints_pages:
-            for endpoint in page['VpcEndpoints']:
-                vpc_id = endpoint['VpcId']
-                vpc_endpoint_counts[vpc_id] += 1
-
-        for vpc_id, count in vpc_endpoint_counts.items():
-            logger.info(f"VPC {vpc_id}: {count} Interface endpoints out of {serviceQuotaValue}")
-
-            if maxInterfaceEndpointsPerVPC < count:
-                maxInterfaceEndpointsPerVPC = count
-                logger.info(f"Max value={maxInterfaceEndpointsPerVPC}")
-
-            usage_percentage = (count / serviceQuotaValue) * 100
-            if usage_percentage > float(threshold) * 100:
-                sendQuotaThresholdEvent = True
-                data = {"resourceARN": vpc_id, "usageValue": count}
-                resourceListCrossingThreshold.append(data)
-                logger.warning(f"VPC {vpc_id} Interface endpoint count ({count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
+        interfaceEndpointsPerVPC = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for vpc_id, counts in quota_collectors.ec2Snapshot(region).vpcEndpointCountsByVpc(quotaCode).items():
+            if counts.get('Interface'):
+                interfaceEndpointsPerVPC.observe(vpc_id, counts['Interface'])
+        logger.info(f"Interface VPC Endpoints per VPC (max): {interfaceEndpointsPerVPC.value} out of {serviceQuotaValue}")
 
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxInterfaceEndpointsPerVPC), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(interfaceEndpointsPerVPC.value), interfaceEndpointsPerVPC.resourceList(), bool(interfaceEndpointsPerVPC.resourceListCrossingThreshold))
 
     except ClientError as e:
         logger.error(f"Error checking Interface VPC Endpoints per VPC quota: {e}")
@@ -4643,9 +3374,11 @@ def L_6E386A05(serviceCode, quotaCode, threshold, region):
                 servers_response = json.load(test_file_content)
                 server_count = len(servers_response.get('Servers', []))
         else:
-            paginator = transfer_client.get_paginator('list_servers')
-            for page in paginator.paginate():
-                server_count += len(page.get('Servers', []))
+            # Reuse a recent count on warm invocations when the quota has a CacheTTLMinutes
+            server_count = quota_cache.cached(quotaCode, f'transfer:servers:{region}', lambda: sum(
+                len(page.get('Servers', []))
+                for page in transfer_client.get_paginator('list_servers').paginate()
+            ))
 
         logger.info(f"Transfer Family server count: {server_count} out of {serviceQuotaValue}")
 
@@ -4750,46 +3483,7 @@ def L_6B80B8FA(serviceCode, quotaCode, threshold, region):
     :param region: The AWS region to check
     :return: None
     """
-    is_testing_enabled = 'IS_TESTING_ENABLED' in os.environ.keys()
-    sendQuotaThresholdEvent = False
-    launch_config_count = 0
-
-    autoscaling_client = boto3.client('autoscaling', region_name=region)
-    sq = boto3.client('service-quotas', region_name=region)
-
-    try:
-        try:
-            serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        except Exception as e:
-            logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
-            serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-        serviceQuotaValue = float(serviceQuota['Quota']['Value'])
-        logger.info(f"Launch configurations per region quota: {serviceQuotaValue}")
-
-        if is_testing_enabled:
-            test_filename = f'tests/{inspect.stack()[0][3]}_describe_launch_configurations.json'
-            logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
-            with open(test_filename, 'r') as test_file_content:
-                response = json.load(test_file_content)
-                launch_config_count = len(response.get('LaunchConfigurations', []))
-        else:
-            paginator = autoscaling_client.get_paginator('describe_launch_configurations')
-            for page in paginator.paginate():
-                launch_config_count += len(page.get('LaunchConfigurations', []))
-
-        logger.info(f"Launch configuration count: {launch_config_count} out of {serviceQuotaValue}")
-
-        usage_percentage = (launch_config_count / serviceQuotaValue) * 100
-        if usage_percentage > float(threshold) * 100:
-            sendQuotaThresholdEvent = True
-            logger.warning(f"Launch configuration count ({launch_config_count}) exceeds {float(threshold) * 100}% of the quota ({serviceQuotaValue})")
-
-        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(launch_config_count), "", sendQuotaThresholdEvent)
-
-    except ClientError as e:
-        logger.error(f"Error checking Launch configurations per region quota: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_349AD9CA(serviceCode, quotaCode, threshold, region):
@@ -5406,82 +4100,43 @@ def L_F55AF5E4(serviceCode, quotaCode, region, threshold):
     """
     Checks Users per account
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    user_count = 0
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        user_count += len(page['Users'])
-
-    logger.info(f"Total IAM users: {user_count}")
-    if user_count / serviceQuotaValue > float(threshold) / 100:
-        sendQuotaThresholdEvent = True
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(user_count), "", sendQuotaThresholdEvent)
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_FC9EC213(serviceCode, quotaCode, region, threshold):
     """
     Checks Tags per user (max tags across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxTags = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            tags_response = iam_client.list_user_tags(UserName=user['UserName'])
-            tag_count = len(tags_response['Tags'])
-            if tag_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": tag_count
-                })
-            if tag_count > maxTags:
-                maxTags = tag_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxTags), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'Tags per user', 'tags')
 
 
 def L_C07B4B0D(serviceCode, quotaCode, region, threshold):
     """
     Checks Role trust policy length (max across all roles)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxPolicyLen = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_roles').paginate()
-    for page in paginator:
-        for role in page['Roles']:
-            # AssumeRolePolicyDocument is already included in list_roles response
-            policy_doc = json.dumps(role.get('AssumeRolePolicyDocument', {}))
-            policy_len = len(policy_doc)
-            if policy_len / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": role['Arn'],
-                    "usageValue": policy_len
-                })
-            if policy_len > maxPolicyLen:
-                maxPolicyLen = policy_len
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxPolicyLen), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
 
+def _saml_providers(quotaCode):
+    """
+    SAML providers with the descriptor counts of their metadata, cached across warm invocations
+    when the quota has a CacheTTLMinutes
+    :param quotaCode: The quota asking, whose TTL applies
+    :return: List of dicts with Arn, IdpDescriptors, KeyDescriptors and HasMetadata
+    """
+    def fetch():
+        iam_client = boto3.client('iam')
+        providers = []
+        for provider in iam_client.list_saml_providers()['SAMLProviderList']:
+            saml_metadata = iam_client.get_saml_provider(SAMLProviderArn=provider['Arn']).get('SAMLMetadataDocument', '')
+            providers.append({
+                "Arn": provider['Arn'],
+                "IdpDescriptors": saml_metadata.count('<IDPSSODescriptor') + saml_metadata.count('<md:IDPSSODescriptor'),
+                "KeyDescriptors": saml_metadata.count('<KeyDescriptor') + saml_metadata.count('<md:KeyDescriptor'),
+                "HasMetadata": bool(saml_metadata),
+            })
+        return providers
+    return quota_cache.cached(quotaCode, 'iam:saml_providers', fetch)
 
 
 def L_3AD47CAE(serviceCode, quotaCode, region, threshold):
@@ -5489,20 +4144,16 @@ def L_3AD47CAE(serviceCode, quotaCode, region, threshold):
     Checks Identity providers per IAM SAML provider object
     """
     sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
     sq_client = boto3.client('service-quotas')
     serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
     serviceQuotaValue = serviceQuota['Quota']['Value']
 
     maxIdpCount = 0
     resourceListCrossingThreshold = []
-    saml_providers = iam_client.list_saml_providers()['SAMLProviderList']
-    for provider in saml_providers:
+    for provider in _saml_providers(quotaCode):
         provider_arn = provider['Arn']
-        metadata = iam_client.get_saml_provider(SAMLProviderArn=provider_arn)
-        # Parse the SAML metadata XML to count IDPSSODescriptor elements
-        saml_metadata = metadata.get('SAMLMetadataDocument', '')
-        idp_count = saml_metadata.count('<IDPSSODescriptor') + saml_metadata.count('<md:IDPSSODescriptor')
+        # IDPSSODescriptor elements of the SAML metadata XML
+        idp_count = provider['IdpDescriptors']
         if idp_count == 0:
             idp_count = 1  # At least 1 identity provider per SAML provider object
         if idp_count / serviceQuotaValue > float(threshold) / 100:
@@ -5521,22 +4172,7 @@ def L_F4A5425F(serviceCode, quotaCode, region, threshold):
     """
     Checks Groups per account
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    group_count = 0
-    paginator = iam_client.get_paginator('list_groups').paginate()
-    for page in paginator:
-        group_count += len(page['Groups'])
-
-    logger.info(f"Total IAM groups: {group_count}")
-    if group_count / serviceQuotaValue > float(threshold) / 100:
-        sendQuotaThresholdEvent = True
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(group_count), "", sendQuotaThresholdEvent)
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_8E23FFD8(serviceCode, quotaCode, region, threshold):
@@ -5608,51 +4244,14 @@ def L_6E65F664(serviceCode, quotaCode, region, threshold):
     """
     Checks Instance profiles per account
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    profile_count = 0
-    paginator = iam_client.get_paginator('list_instance_profiles').paginate()
-    for page in paginator:
-        profile_count += len(page['InstanceProfiles'])
-
-    logger.info(f"Total instance profiles: {profile_count}")
-    if profile_count / serviceQuotaValue > float(threshold) / 100:
-        sendQuotaThresholdEvent = True
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(profile_count), "", sendQuotaThresholdEvent)
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_4019AD8B(serviceCode, quotaCode, region, threshold):
     """
     Checks Managed policies per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxPolicies = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            attached = iam_client.list_attached_user_policies(UserName=user['UserName'])['AttachedPolicies']
-            policy_count = len(attached)
-            if policy_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": policy_count
-                })
-            if policy_count > maxPolicies:
-                maxPolicies = policy_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxPolicies), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'Managed policies per user', 'managed policies')
 
 
 def L_B39FB15B(serviceCode, quotaCode, region, threshold):
@@ -5688,52 +4287,38 @@ def L_FE177D64(serviceCode, quotaCode, region, threshold):
     """
     Checks Roles per account
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
+
+
+def _iam_per_user_quota(serviceCode, quotaCode, region, threshold, quota_name, item_name):
+    """
+    Helper: Checks a per-user IAM quota (max across all users).
+    The per-user listings of all planned per-user quotas are issued in one parallel sweep.
+    """
     sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
 
-    role_count = 0
-    paginator = iam_client.get_paginator('list_roles').paginate()
-    for page in paginator:
-        role_count += len(page['Roles'])
+    try:
+        serviceQuotaValue = quota_specs.getServiceQuotaValue(sq_client, serviceCode, quotaCode)
+        logger.info(f"{quota_name} quota: {serviceQuotaValue}")
 
-    logger.info(f"Total IAM roles: {role_count}")
-    if role_count / serviceQuotaValue > float(threshold) / 100:
-        sendQuotaThresholdEvent = True
+        perUser = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+        for user_arn, count in quota_collectors.iamSnapshot(region).perUserCounts(quotaCode).items():
+            perUser.observe(user_arn, count)
+        logger.info(f"Max {item_name} per user: {perUser.value} out of {serviceQuotaValue}")
 
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(role_count), "", sendQuotaThresholdEvent)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(perUser.value), perUser.resourceList(), bool(perUser.resourceListCrossingThreshold))
 
+    except ClientError as e:
+        logger.error(f"Error checking {quota_name} quota: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
 
 
 def L_F1176D35(serviceCode, quotaCode, region, threshold):
     """
     Checks SSH Public keys per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxKeys = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            ssh_keys = iam_client.list_ssh_public_keys(UserName=user['UserName'])['SSHPublicKeys']
-            key_count = len(ssh_keys)
-            if key_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": key_count
-                })
-            if key_count > maxKeys:
-                maxKeys = key_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxKeys), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'SSH Public keys per user', 'SSH public keys')
 
 
 def L_C4DF001E(serviceCode, quotaCode, region, threshold):
@@ -5741,21 +4326,17 @@ def L_C4DF001E(serviceCode, quotaCode, region, threshold):
     Checks Keys per SAML provider (max across all SAML providers)
     """
     sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
     sq_client = boto3.client('service-quotas')
     serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
     serviceQuotaValue = serviceQuota['Quota']['Value']
 
     maxKeys = 0
     resourceListCrossingThreshold = []
-    saml_providers = iam_client.list_saml_providers()['SAMLProviderList']
-    for provider in saml_providers:
+    for provider in _saml_providers(quotaCode):
         provider_arn = provider['Arn']
-        metadata = iam_client.get_saml_provider(SAMLProviderArn=provider_arn)
-        saml_metadata = metadata.get('SAMLMetadataDocument', '')
         # Count signing keys (KeyDescriptor elements) in the SAML metadata
-        key_count = saml_metadata.count('<KeyDescriptor') + saml_metadata.count('<md:KeyDescriptor')
-        if key_count == 0 and saml_metadata:
+        key_count = provider['KeyDescriptors']
+        if key_count == 0 and provider['HasMetadata']:
             key_count = 1  # At least 1 key if metadata exists
         if key_count / serviceQuotaValue > float(threshold) / 100:
             sendQuotaThresholdEvent = True
@@ -5773,22 +4354,7 @@ def L_E95E4862(serviceCode, quotaCode, region, threshold):
     """
     Checks Customer managed policies per account
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    policy_count = 0
-    paginator = iam_client.get_paginator('list_policies').paginate(Scope='Local')
-    for page in paginator:
-        policy_count += len(page['Policies'])
-
-    logger.info(f"Total customer managed policies: {policy_count}")
-    if policy_count / serviceQuotaValue > float(threshold) / 100:
-        sendQuotaThresholdEvent = True
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(policy_count), "", sendQuotaThresholdEvent)
+    quota_specs.evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage)
 
 
 def L_DB618D39(serviceCode, quotaCode, region, threshold):
@@ -5796,13 +4362,11 @@ def L_DB618D39(serviceCode, quotaCode, region, threshold):
     Checks SAML providers per account
     """
     sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
     sq_client = boto3.client('service-quotas')
     serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
     serviceQuotaValue = serviceQuota['Quota']['Value']
 
-    saml_providers = iam_client.list_saml_providers()['SAMLProviderList']
-    provider_count = len(saml_providers)
+    provider_count = len(_saml_providers(quotaCode))
 
     logger.info(f"Total SAML providers: {provider_count}")
     if provider_count / serviceQuotaValue > float(threshold) / 100:
@@ -5845,58 +4409,14 @@ def L_8758042E(serviceCode, quotaCode, region, threshold):
     """
     Checks Access keys per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxKeys = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            access_keys = iam_client.list_access_keys(UserName=user['UserName'])['AccessKeyMetadata']
-            key_count = len(access_keys)
-            if key_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": key_count
-                })
-            if key_count > maxKeys:
-                maxKeys = key_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxKeys), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'Access keys per user', 'access keys')
 
 
 def L_7A1621EC(serviceCode, quotaCode, region, threshold):
     """
     Checks IAM groups per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxGroups = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            groups = iam_client.list_groups_for_user(UserName=user['UserName'])['Groups']
-            group_count = len(groups)
-            if group_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": group_count
-                })
-            if group_count > maxGroups:
-                maxGroups = group_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxGroups), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'IAM groups per user', 'groups')
 
 
 def L_858F3967(serviceCode, quotaCode, region, threshold):
@@ -5909,7 +4429,8 @@ def L_858F3967(serviceCode, quotaCode, region, threshold):
     serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
     serviceQuotaValue = serviceQuota['Quota']['Value']
 
-    oidc_providers = iam_client.list_open_id_connect_providers()['OpenIDConnectProviderList']
+    oidc_providers = quota_cache.cached(quotaCode, 'iam:oidc_providers',
+                                        lambda: iam_client.list_open_id_connect_providers()['OpenIDConnectProviderList'])
     provider_count = len(oidc_providers)
 
     logger.info(f"Total OIDC providers: {provider_count}")
@@ -5923,55 +4444,11 @@ def L_19F2CF71(serviceCode, quotaCode, region, threshold):
     """
     Checks MFA devices per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxMfa = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            mfa_devices = iam_client.list_mfa_devices(UserName=user['UserName'])['MFADevices']
-            mfa_count = len(mfa_devices)
-            if mfa_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": mfa_count
-                })
-            if mfa_count > maxMfa:
-                maxMfa = mfa_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxMfa), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'MFA devices per user', 'MFA devices')
 
 
 def L_76C48054(serviceCode, quotaCode, region, threshold):
     """
     Checks Signing certificates per user (max across all users)
     """
-    sendQuotaThresholdEvent = False
-    iam_client = boto3.client('iam')
-    sq_client = boto3.client('service-quotas')
-    serviceQuota = sq_client.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
-    serviceQuotaValue = serviceQuota['Quota']['Value']
-
-    maxCerts = 0
-    resourceListCrossingThreshold = []
-    paginator = iam_client.get_paginator('list_users').paginate()
-    for page in paginator:
-        for user in page['Users']:
-            certs = iam_client.list_signing_certificates(UserName=user['UserName'])['Certificates']
-            cert_count = len(certs)
-            if cert_count / serviceQuotaValue > float(threshold) / 100:
-                sendQuotaThresholdEvent = True
-                resourceListCrossingThreshold.append({
-                    "resourceARN": user['Arn'],
-                    "usageValue": cert_count
-                })
-            if cert_count > maxCerts:
-                maxCerts = cert_count
-
-    updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(maxCerts), json.dumps(resourceListCrossingThreshold), sendQuotaThresholdEvent)
+    _iam_per_user_quota(serviceCode, quotaCode, region, threshold, 'Signing certificates per user', 'signing certificates')
@@ -0,0 +1,233 @@
+import os
+import boto3
+import botocore.session
+import logging
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+import rate_limiter
+import quota_cache
+import quota_collectors
+import quota_planner
+import quota_sinks
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+ROLE_SESSION_NAME = 'QuotaGuardScanner'
+ROLE_DURATION_SECONDS = int(os.environ.get('SCAN_ROLE_DURATION_SECONDS', '3600'))
+PARTITION = os.environ.get('AWS_PARTITION', 'aws')
+
+
+class LocalSts:
+    """
+    Stand-in for the STS client used in test mode (IS_TESTING_ENABLED): returns fake credentials
+    expiring after the requested duration and records the assumed roles
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def assume_role(self, RoleArn, RoleSessionName, DurationSeconds=3600, **kwargs):
+        with self.lock:
+            self.calls.append(RoleArn)
+            serial = len(self.calls)
+        accountId = RoleArn.split(':')[4]
+        return {'Credentials': {
+            'AccessKeyId': f'ASIALOCAL{accountId}',
+            'SecretAccessKey': f'local-secret-{serial}',
+            'SessionToken': f'local-token-{accountId}-{serial}',
+            'Expiration': datetime.now(timezone.utc) + timedelta(seconds=DurationSeconds),
+        }}
+
+
+# Shared by the refreshes of this process in test mode
+localSts = LocalSts()
+
+
+def _stsClient():
+    if 'IS_TESTING_ENABLED' in os.environ.keys():
+        return localSts
+    # A fresh session, so the base credentials are used even after the default session was switched to an account
+    return boto3.Session().client('sts')
+
+
+def roleArn(accountId, roleName):
+    return f"arn:{PARTITION}:iam::{accountId}:role/{roleName}"
+
+
+def assumeRole(accountId, roleName):
+    """
+    Assume the scan role of an account
+    :return: Credential metadata in the format of botocore's RefreshableCredentials
+    """
+    credentials = _stsClient().assume_role(RoleArn=roleArn(accountId, roleName), RoleSessionName=ROLE_SESSION_NAME,
+                                           DurationSeconds=ROLE_DURATION_SECONDS)['Credentials']
+    expiration = credentials['Expiration']
+    return {
+        'access_key': credentials['AccessKeyId'],
+        'secret_key': credentials['SecretAccessKey'],
+        'token': credentials['SessionToken'],
+        'expiry_time': expiration.isoformat() if isinstance(expiration, datetime) else expiration,
+    }
+
+
+def refreshableCredentials(accountId, roleName, metadata=None):
+    """
+    Credentials of an account that assume the role again before they expire
+    :param metadata: Credentials already assumed, assumed now when None
+    :return: botocore RefreshableCredentials
+    """
+    refresh = partial(assumeRole, accountId, roleName)
+    return RefreshableCredentials.create_from_metadata(metadata=metadata or refresh(), refresh_using=refresh,
+                                                       method='sts-assume-role')
+
+
+class CredentialCache:
+    """
+    Assumed-role credentials per account, refreshed automatically before they expire
+    """
+
+    def __init__(self, roleName):
+        """
+        :param roleName: The role assumed in every account
+        """
+        self.roleName = roleName
+        self.credentials = {}
+        # Latest metadata assumed per account, updated on every refresh
+        self.assumed = {}
+        self.lock = threading.Lock()
+
+    def _assume(self, accountId):
+        metadata = assumeRole(accountId, self.roleName)
+        with self.lock:
+            self.assumed[accountId] = metadata
+        return metadata
+
+    def get(self, accountId):
+        """
+        :return: The RefreshableCredentials of an account, assuming the role on first use
+        """
+        with self.lock:
+            credentials = self.credentials.get(accountId)
+        if credentials is None:
+            refresh = partial(self._assume, accountId)
+            credentials = RefreshableCredentials.create_from_metadata(metadata=refresh(), refresh_using=refresh,
+                                                                      method='sts-assume-role')
+            with self.lock:
+                credentials = self.credentials.setdefault(accountId, credentials)
+        return credentials
+
+    def prefetch(self, accountIds, maxWorkers=8):
+        """
+        Assume the role of every account concurrently
+        :return: Dict of account id to the error of the accounts whose role could not be assumed
+        """
+        errors = {}
+        with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+            futures = {pool.submit(self.get, accountId): accountId for accountId in accountIds}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+                    logger.error(f"Error assuming {roleArn(futures[future], self.roleName)}: {e}")
+        return errors
+
+    def metadata(self, accountId):
+        """
+        Current credentials of an account, in a form that can be sent to a worker process
+        """
+        # Refreshes the credentials first when they are about to expire
+        self.get(accountId).get_frozen_credentials()
+        with self.lock:
+            return dict(self.assumed[accountId])
+
+
+class _AccountCredentialProvider(CredentialProvider):
+    METHOD = 'quota-guard-account'
+    CANONICAL_NAME = 'QuotaGuardAccount'
+
+    def __init__(self, credentials):
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+def useCredentials(credentials):
+    """
+    Make every client created with boto3.client() in this process use the credentials of an account
+    :param credentials: botocore credentials
+    :return: None
+    """
+    botocoreSession = botocore.session.get_session()
+    botocoreSession.get_component('credential_provider').insert_before('env', _AccountCredentialProvider(credentials))
+    boto3.setup_default_session(botocore_session=botocoreSession)
+    # Handlers are registered per session
+    rate_limiter.install()
+
+
+def _scanAccount(accountId, roleName, metadata, plan, evaluate):
+    """
+    Run the plan in one account, in a worker process
+    :return: List of the updateQuotaUsage arguments of every check
+    """
+    useCredentials(refreshableCredentials(accountId, roleName, metadata))
+    # Worker processes are reused across accounts, never serve the previous account's enumerations or snapshots
+    quota_cache.clear()
+    quota_collectors.reset()
+    sink = quota_sinks.install(quota_sinks.ListSink())
+    logger.info(f"Scanning account {accountId}")
+    quota_planner.execute(plan, evaluate)
+    return [record.arguments() for record in sink.records]
+
+
+def scanAccounts(accountIds, roleName, plan, evaluate, writeAccountUsage, maxWorkers=None):
+    """
+    Run the plan in every account, one worker process per account at a time. Processes rather than
+    threads, because the quota functions create their clients from the process wide default session.
+    :param accountIds: The account ids
+    :param roleName: The role assumed in every account
+    :param plan: The quota_planner.Plan, the same for every account
+    :param evaluate: The evaluation function of the plan stages (must be picklable)
+    :param writeAccountUsage: Called in this process with (accountId, records) for every scanned account
+    :param maxWorkers: Worker processes (default: one per account up to the CPU count)
+    :return: Dict of account id to the error of the accounts that could not be scanned
+    """
+    cache = CredentialCache(roleName)
+    errors = cache.prefetch(accountIds)
+    accountIds = [accountId for accountId in accountIds if accountId not in errors]
+    if not accountIds:
+        return errors
+    maxWorkers = maxWorkers or min(len(accountIds), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=maxWorkers) as pool:
+        futures = {pool.submit(_scanAccount, accountId, roleName, cache.metadata(accountId), plan, evaluate): accountId
+                   for accountId in accountIds}
+        for future in as_completed(futures):
+            accountId = futures[future]
+            try:
+                records = future.result()
+            except Exception as e:
+                errors[accountId] = e
+                logger.error(f"Error scanning account {accountId}: {e}")
+                continue
+            logger.info(f"Account {accountId}: {len(records)} quota usages")
+            writeAccountUsage(accountId, records)
+    return errors
@@ -0,0 +1,370 @@
+import json
+import os
+import boto3
+import logging
+import sys
+import threading
+import time
+import quota_resources
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# PutEvents accepts at most 10 entries and 256KB per call
+MAX_ENTRIES_PER_CALL = 10
+MAX_BYTES_PER_CALL = 256 * 1024
+
+# Re-alert an ongoing breach only when utilization grew by this many percentage points since the last alert
+ESCALATION_STEP_PERCENT = float(os.environ.get('ALERT_ESCALATION_STEP_PERCENT', '10'))
+# Consecutive runs below the threshold before a breach is reported as recovered
+RECOVERY_RUNS = int(os.environ.get('ALERT_RECOVERY_RUNS', '2'))
+
+NEW_BREACH = 'NEW_BREACH'
+ESCALATION = 'ESCALATION'
+RECOVERY = 'RECOVERY'
+
+# Resource id used for breaches reported at quota level (no per-resource list)
+QUOTA_LEVEL_RESOURCE = '*'
+
+
+def entrySize(entry):
+    """
+    Approximate the PutEvents size of an entry as computed by EventBridge
+    :param entry: The PutEvents entry
+    :return: The size in bytes
+    """
+    size = 14 if 'Time' in entry else 0
+    for field in ('Source', 'DetailType', 'Detail', 'EventBusName'):
+        size += len(entry.get(field, '').encode('utf-8'))
+    for resource in entry.get('Resources', []):
+        size += len(resource.encode('utf-8'))
+    return size
+
+
+class DynamoAlertStateStore:
+    """
+    Last alert state kept in a DynamoDB table with one item per (StateKey "QuotaCode|Region", Resource),
+    so quotas with thousands of breaching resources stay far below the item size limit. Only the
+    resources whose state changed are written.
+    """
+
+    # Attempts of a batch with unprocessed items, backing off exponentially between them
+    MAX_ATTEMPTS = 8
+
+    def __init__(self, table_name):
+        """
+        :param table_name: The DynamoDB table name
+        """
+        self.table_name = table_name
+        self.ddb = boto3.client('dynamodb')
+        # State as last loaded or saved, to write only the differences
+        self.saved = {}
+
+    def load(self):
+        """
+        Load all alert states with a single paginated scan
+        :return: Dict of "QuotaCode|Region" to {resource: {"Utilization": pct, "ClearRuns": n}}
+        """
+        states = {}
+        paginator = self.ddb.get_paginator('scan')
+        for page in paginator.paginate(TableName=self.table_name):
+            for item in page['Items']:
+                states.setdefault(item['StateKey']['S'], {})[item['Resource']['S']] = {
+                    'Utilization': float(item['Utilization']['N']),
+                    'ClearRuns': int(item['ClearRuns']['N']),
+                }
+        self.saved = {key: {resource: dict(entry) for resource, entry in state.items()} for key, state in states.items()}
+        return states
+
+    def save(self, key, state):
+        """
+        Persist the alert state of one (QuotaCode, Region), writing the changed resources and deleting the cleared ones
+        :return: None
+        """
+        saved = self.saved.get(key, {})
+        requests = [{'DeleteRequest': {'Key': {'StateKey': {'S': key}, 'Resource': {'S': resource}}}}
+                    for resource in saved if resource not in state]
+        for resource, entry in state.items():
+            if saved.get(resource) != entry:
+                requests.append({'PutRequest': {'Item': {
+                    'StateKey': {'S': key},
+                    'Resource': {'S': resource},
+                    'Utilization': {'N': str(entry['Utilization'])},
+                    'ClearRuns': {'N': str(entry['ClearRuns'])},
+                }}})
+        for i in range(0, len(requests), 25):
+            self._batchWrite(requests[i:i + 25])
+        self.saved[key] = {resource: dict(entry) for resource, entry in state.items()}
+
+    def _batchWrite(self, requests):
+        pending = {self.table_name: requests}
+        for attempt in range(self.MAX_ATTEMPTS):
+            pending = self.ddb.batch_write_item(RequestItems=pending).get('UnprocessedItems') or None
+            if not pending:
+                return
+            time.sleep(min(0.05 * 2 ** attempt, 5))
+        raise RuntimeError(f"{len(pending[self.table_name])} alert state items still unprocessed after {self.MAX_ATTEMPTS} attempts")
+
+
+class JsonFileAlertStateStore:
+    """
+    Last alert state per (QuotaCode, Region) kept in a local JSON file
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path to the JSON state file
+        """
+        self.path = path
+        self.states = {}
+
+    def load(self):
+        """
+        Load all alert states
+        :return: Dict of "QuotaCode|Region" to {resource: {"Utilization": pct, "ClearRuns": n}}
+        """
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.states = json.load(f)
+        return dict(self.states)
+
+    def save(self, key, state):
+        """
+        Persist the alert state of one (QuotaCode, Region)
+        :return: None
+        """
+        self.states[key] = state
+        with open(self.path, 'w') as f:
+            json.dump(self.states, f)
+
+
+class AlertPipeline:
+    """
+    Turns quota observations into batched EventBridge alerts, emitting only on new breaches,
+    escalations and recoveries
+    """
+
+    def __init__(self, eventbridge, eventBus, store=None):
+        """
+        :param eventbridge: The EventBridge client
+        :param eventBus: The event bus name or ARN
+        :param store: A DynamoAlertStateStore or JsonFileAlertStateStore (no suppression when None)
+        """
+        self.eventbridge = eventbridge
+        self.eventBus = eventBus
+        self.store = store
+        self.states = None
+        self.dirty = set()
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def _loadStates(self):
+        if self.states is None:
+            self.states = {}
+            if self.store:
+                try:
+                    self.states = self.store.load()
+                except Exception as e:
+                    logger.error(f"Error loading alert state, every breach will be treated as new: {e}")
+        return self.states
+
+    def submit(self, region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", breaching=False, forecast=None, resourceListUri=""):
+        """
+        Record one quota observation and queue the alerts it causes
+        :param region: The AWS region
+        :param quotaCode: The quota code
+        :param serviceCode: The service code
+        :param serviceQuotaValue: The service quota value
+        :param usageValue: The usage value
+        :param resourceListCrossingThreshold: JSON list of {"resourceARN", "usageValue"} over the threshold
+        :param breaching: Whether the quota is over its threshold (or forecast to be exhausted)
+        :param forecast: The time-to-exhaustion forecast, if any
+        :param resourceListUri: Where the complete resource list was written when it is longer than the top K
+        :return: List of alert types queued
+        """
+        limit = float(serviceQuotaValue) if serviceQuotaValue else 0.0
+
+        def utilization(value):
+            try:
+                return float(value) / limit * 100 if limit > 0 else 0.0
+            except (TypeError, ValueError):
+                return 0.0
+
+        current = {}
+        if breaching:
+            try:
+                if isinstance(resourceListCrossingThreshold, quota_resources.ResourceList) and resourceListCrossingThreshold.complete:
+                    # The state follows every resource, not only the top K sent in the event
+                    resources = resourceListCrossingThreshold.complete
+                else:
+                    resources = json.loads(resourceListCrossingThreshold) if resourceListCrossingThreshold else []
+            except ValueError:
+                resources = []
+            for resource in resources:
+                if isinstance(resource, dict):
+                    current[resource.get('resourceARN', QUOTA_LEVEL_RESOURCE)] = resource.get('usageValue', usageValue)
+            if not current:
+                current[QUOTA_LEVEL_RESOURCE] = usageValue
+
+        key = f"{quotaCode}|{region}"
+        transitions = {NEW_BREACH: [], ESCALATION: [], RECOVERY: []}
+        # State changes of an alert, applied only once EventBridge accepted it so a failed alert is sent again
+        updates = {NEW_BREACH: [], ESCALATION: [], RECOVERY: []}
+        with self.lock:
+            state = self._loadStates().setdefault(key, {})
+            for resource, value in current.items():
+                pct = utilization(value)
+                previous = state.get(resource)
+                if previous is None:
+                    transitions[NEW_BREACH].append({'resourceARN': resource, 'usageValue': value})
+                    updates[NEW_BREACH].append((resource, {'Utilization': pct, 'ClearRuns': 0}))
+                else:
+                    previous['ClearRuns'] = 0
+                    if pct - previous['Utilization'] >= ESCALATION_STEP_PERCENT:
+                        transitions[ESCALATION].append({'resourceARN': resource, 'usageValue': value})
+                        updates[ESCALATION].append((resource, {'Utilization': pct, 'ClearRuns': 0}))
+            for resource in [r for r in state if r not in current]:
+                state[resource]['ClearRuns'] += 1
+                if state[resource]['ClearRuns'] >= RECOVERY_RUNS:
+                    transitions[RECOVERY].append({'resourceARN': resource})
+                    updates[RECOVERY].append((resource, None))
+            self.dirty.add(key)
+
+        queued = []
+        for alertType, resources in transitions.items():
+            if not resources:
+                continue
+            logger.info(f"Queueing {alertType} alert for {serviceCode}:{quotaCode} in {region} ({len(resources)} resources)")
+            self.enqueue(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, json.dumps(resources), forecast, alertType, resourceListUri,
+                         (key, updates[alertType]))
+            queued.append(alertType)
+        if breaching and not queued:
+            logger.info(f"Suppressing repeated alert for {serviceCode}:{quotaCode} in {region}")
+        return queued
+
+    def enqueue(self, region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", forecast=None, alertType=NEW_BREACH, resourceListUri="", stateUpdate=None):
+        """
+        Queue one quota-threshold-event entry, sending a batch as soon as one is full. Only the top K
+        resources are sent, with their total count and the URI of the complete list.
+        :param stateUpdate: ("QuotaCode|Region", [(resource, state or None to remove)]) applied when the entry is accepted
+        :return: None
+        """
+        resourceList, resourceCount, _ = quota_resources.boundResourceList(resourceListCrossingThreshold, f"{quotaCode}/{region}")
+        data = {
+            "QuotaCode" : quotaCode,
+            "LimitValue" : serviceQuotaValue,
+            "Region" : region,
+            "ResourceList" : resourceList,
+            "ServiceCode" : serviceCode,
+            "UsageValue" : usageValue,
+            "AlertType" : alertType
+            }
+        if forecast:
+            data["Forecast"] = forecast
+        if resourceCount:
+            data["ResourceCount"] = resourceCount
+        if resourceListUri:
+            data["ResourceListUri"] = resourceListUri
+        entry = {
+            'Source':'quota-guard',
+            'DetailType':'quota-threshold-event',
+            'Detail': json.dumps(data),
+            'EventBusName': self.eventBus
+        }
+        if entrySize(entry) > MAX_BYTES_PER_CALL:
+            logger.warning(f"Alert for {serviceCode}:{quotaCode} in {region} exceeds {MAX_BYTES_PER_CALL} bytes, dropping its resource list")
+            data["ResourceList"] = ""
+            data["ResourceListTruncated"] = True
+            entry['Detail'] = json.dumps(data)
+        with self.lock:
+            self.pending.append((entry, stateUpdate))
+            full = len(self.pending) >= MAX_ENTRIES_PER_CALL
+        if full:
+            self.flushEvents()
+
+    def flushEvents(self):
+        """
+        Send all queued entries in batches of at most 10 entries and 256KB
+        :return: The number of entries that failed
+        """
+        with self.lock:
+            pending, self.pending = self.pending, []
+        failed = 0
+        batch, batchSize = [], 0
+        for item in pending + [None]:
+            size = entrySize(item[0]) if item else 0
+            if batch and (item is None or len(batch) >= MAX_ENTRIES_PER_CALL or batchSize + size > MAX_BYTES_PER_CALL):
+                accepted = self._putEvents([entry for entry, _ in batch])
+                failed += len(batch) - len(accepted)
+                self._commit([batch[i][1] for i in accepted])
+                batch, batchSize = [], 0
+            if item:
+                batch.append(item)
+                batchSize += size
+        return failed
+
+    def _putEvents(self, batch):
+        """
+        :return: Indexes of the entries EventBridge accepted
+        """
+        try:
+            response = self.eventbridge.put_events(Entries=batch)
+        except Exception as e:
+            logger.error(f"Error sending {len(batch)} quota events, their alerts are sent again on the next run: {e}")
+            return []
+        logger.info(f"Sent {len(batch)} quota events, {response.get('FailedEntryCount', 0)} failed")
+        results = response.get('Entries', [])
+        accepted = []
+        for i, entry in enumerate(batch):
+            result = results[i] if i < len(results) else {'ErrorCode': 'Missing'}
+            if 'ErrorCode' in result:
+                logger.error(f"Quota event rejected, its alert is sent again on the next run: {result['ErrorCode']} {result.get('ErrorMessage', '')}")
+            else:
+                accepted.append(i)
+        return accepted
+
+    def _commit(self, stateUpdates):
+        """
+        Apply the state changes of accepted alerts
+        :param stateUpdates: List of the stateUpdate of enqueue() (None for alerts without state)
+        :return: None
+        """
+        with self.lock:
+            for stateUpdate in stateUpdates:
+                if not stateUpdate:
+                    continue
+                key, updates = stateUpdate
+                state = self._loadStates().setdefault(key, {})
+                for resource, resourceState in updates:
+                    if resourceState is None:
+                        state.pop(resource, None)
+                    else:
+                        state[resource] = resourceState
+                self.dirty.add(key)
+
+    def flush(self):
+        """
+        Send queued alerts and persist the alert state of every (quota, region) seen. Alerts that failed
+        leave their resources at the previous state, so the next run sends them again.
+        :return: None
+        """
+        self.flushEvents()
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            if self.store:
+                for key in dirty:
+                    try:
+                        self.store.save(key, self.states[key])
+                    except Exception as e:
+                        logger.error(f"Error saving alert state for {key}: {e}")
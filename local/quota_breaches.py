@@ -0,0 +1,154 @@
+import argparse
+import os
+import boto3
+import logging
+import sys
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Sparse index of the quota usage table: only items over their threshold carry BreachStatus,
+# sorted by UsagePercent
+BREACH_INDEX = 'BreachIndex'
+BREACHING = 'BREACHING'
+# Every item of an account, sorted by UsagePercent
+UTILIZATION_INDEX = 'UtilizationIndex'
+
+
+def usagePercent(serviceQuotaValue, usageValue):
+    """
+    :return: The usage in percent of the quota, None when the quota is 0 or not a number
+    """
+    try:
+        limit = float(serviceQuotaValue)
+        return round(float(usageValue) / limit * 100, 2) if limit > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+def breachAttributes(accountId, serviceQuotaValue, usageValue, breaching):
+    """
+    The attributes added to a quota usage item for the breach and utilization indexes
+    :param accountId: The account the usage was collected in
+    :param serviceQuotaValue: The service quota value
+    :param usageValue: The usage value
+    :param breaching: Whether the quota is over its threshold
+    :return: Dict of DynamoDB attribute values
+    """
+    attributes = {}
+    if accountId:
+        attributes['AccountId'] = {'S': accountId}
+    percent = usagePercent(serviceQuotaValue, usageValue)
+    if percent is not None:
+        attributes['UsagePercent'] = {'N': str(percent)}
+    if breaching:
+        # Left out otherwise, which keeps the item out of the breach index
+        attributes['BreachStatus'] = {'S': BREACHING}
+    return attributes
+
+
+def _item(item):
+    return {
+        'AccountId': item.get('AccountId', {}).get('S', ''),
+        'QuotaCode': item['QuotaCode']['S'],
+        'ServiceCode': item.get('ServiceCode', {}).get('S', ''),
+        'Region': item['Region']['S'],
+        'LimitValue': float(item['LimitValue']['N']),
+        'UsageValue': float(item['UsageValue']['N']),
+        'UsagePercent': float(item['UsagePercent']['N']) if 'UsagePercent' in item else None,
+        'ResourceList': item.get('ResourceList', {}).get('S', ''),
+        'ResourceCount': int(item['ResourceCount']['N']) if 'ResourceCount' in item else None,
+        'ResourceListUri': item.get('ResourceListUri', {}).get('S', ''),
+    }
+
+
+def _query(ddb, limit, **kwargs):
+    items = []
+    paginator = ddb.get_paginator('query')
+    pagination = {'PageSize': limit} if limit else {}
+    for page in paginator.paginate(ScanIndexForward=False, PaginationConfig=pagination, **kwargs):
+        for item in page['Items']:
+            items.append(_item(item))
+            if limit and len(items) >= limit:
+                return items
+    return items
+
+
+def breachingQuotas(tableName, limit=None, accountId=None, ddb=None):
+    """
+    Fetch the quotas over their threshold, highest utilization first
+    :param tableName: The quota usage table
+    :param limit: Only the first N
+    :param accountId: Only the quotas of this account
+    :param ddb: The DynamoDB client
+    :return: List of quota usage dicts
+    """
+    kwargs = {}
+    if accountId:
+        kwargs = {'FilterExpression': 'AccountId = :account', 'ExpressionAttributeValues': {':account': {'S': accountId}}}
+    kwargs.setdefault('ExpressionAttributeValues', {})[':breaching'] = {'S': BREACHING}
+    return _query(ddb or boto3.client('dynamodb'), limit, TableName=tableName, IndexName=BREACH_INDEX,
+                  KeyConditionExpression='BreachStatus = :breaching', **kwargs)
+
+
+def topUtilization(tableName, accountId, limit=10, ddb=None):
+    """
+    Fetch the quotas of an account with the highest utilization, breaching or not
+    :param tableName: The quota usage table
+    :param accountId: The account
+    :param limit: The number of quotas
+    :param ddb: The DynamoDB client
+    :return: List of quota usage dicts
+    """
+    return _query(ddb or boto3.client('dynamodb'), limit, TableName=tableName, IndexName=UTILIZATION_INDEX,
+                  KeyConditionExpression='AccountId = :account',
+                  ExpressionAttributeValues={':account': {'S': accountId}})
+
+
+def formatQuotas(quotas):
+    """
+    :return: The quotas as a text table
+    """
+    lines = [f"{'Account':<14}{'Quota':<14}{'Service':<22}{'Region':<16}{'Usage':>10}{'Limit':>10}{'Percent':>9}"]
+    for quota in quotas:
+        percent = '' if quota['UsagePercent'] is None else f"{quota['UsagePercent']:.1f}"
+        lines.append(f"{quota['AccountId']:<14}{quota['QuotaCode']:<14}{quota['ServiceCode']:<22}{quota['Region']:<16}"
+                     f"{quota['UsageValue']:>10g}{quota['LimitValue']:>10g}{percent:>9}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description='Query breaching and most utilized quotas')
+    parser.add_argument('--table', default=os.environ.get('DDB_TABLE', ''),
+                        help='Quota usage table (default: DDB_TABLE env var)')
+    parser.add_argument('--top', type=int,
+                        help='Only the N most utilized quotas')
+    parser.add_argument('--account',
+                        help='Only the quotas of this account')
+    parser.add_argument('--all', action='store_true',
+                        help='Rank every quota of --account, not only the breaching ones')
+    args = parser.parse_args()
+    if not args.table:
+        parser.error('--table or DDB_TABLE is required')
+    if args.all and not args.account:
+        parser.error('--all requires --account')
+
+    if args.all:
+        quotas = topUtilization(args.table, args.account, args.top or 10)
+    else:
+        quotas = breachingQuotas(args.table, args.top, args.account)
+    print(formatQuotas(quotas))
@@ -0,0 +1,121 @@
+import os
+import boto3
+import logging
+import sys
+import threading
+import time
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Enumerations of slow-changing resources, kept at module level so they survive warm Lambda
+# invocations: key -> (fetched at, value). Only quotas with a CacheTTLMinutes in QuotaList.json use it.
+_entries = {}
+_ttls = {}
+_lock = threading.Lock()
+# Entries fetched before this time are stale (set by a force refresh)
+_notBefore = 0
+# Account of each access key seen, so an enumeration is never served to another account's credentials
+_accounts = {}
+
+
+def configure(quotaList, forceRefresh=False):
+    """
+    Read the per-quota TTLs of the invocation and drop the expired entries
+    :param quotaList: The QuotaList.json entries; "CacheTTLMinutes" enables the cache for a quota
+    :param forceRefresh: Refetch the cached enumerations once during this invocation
+    :return: None
+    """
+    global _notBefore
+    ttls = {}
+    for quotaObject in quotaList:
+        try:
+            minutes = float(quotaObject.get('CacheTTLMinutes', 0))
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid CacheTTLMinutes for {quotaObject.get('QuotaCode')}: {quotaObject.get('CacheTTLMinutes')}")
+            continue
+        if minutes > 0:
+            ttls[quotaObject['QuotaCode']] = minutes * 60
+    with _lock:
+        _ttls.clear()
+        _ttls.update(ttls)
+        longest = max(_ttls.values(), default=0)
+        now = time.monotonic()
+        if forceRefresh:
+            _notBefore = now
+        for key in [key for key, (fetchedAt, _) in _entries.items() if now - fetchedAt >= longest]:
+            del _entries[key]
+    if forceRefresh:
+        logger.info("Force refresh requested, cached enumerations are refetched")
+
+
+def callerAccount():
+    """
+    Account of the credentials boto3.client() currently uses, looked up with STS once per access key.
+    Falls back to the access key itself when STS is unavailable (test mode, no permission).
+    :return: The account id, the access key, or '' without credentials
+    """
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    credentials = boto3.DEFAULT_SESSION.get_credentials()
+    if credentials is None:
+        return ''
+    accessKey = credentials.access_key
+    with _lock:
+        account = _accounts.get(accessKey)
+    if account is not None:
+        return account
+    account = accessKey
+    if 'IS_TESTING_ENABLED' not in os.environ.keys():
+        try:
+            account = boto3.client('sts').get_caller_identity()['Account']
+        except Exception as e:
+            logger.warning(f"Unable to look up the account of the current credentials, caching by access key: {e}")
+    with _lock:
+        _accounts[accessKey] = account
+    return account
+
+
+def cached(quotaCode, key, fetch):
+    """
+    Return a recent enumeration or fetch it. Quotas reading the same enumeration share the entry,
+    each applying its own TTL to it.
+    :param quotaCode: The quota asking, whose TTL applies
+    :param key: The enumeration key, including the region when it is regional; the caller account is added to it
+    :param fetch: Called without arguments to enumerate the resources
+    :return: The enumeration
+    """
+    ttl = _ttls.get(quotaCode, 0)
+    if ttl <= 0:
+        return fetch()
+    key = f"{callerAccount()}:{key}"
+    with _lock:
+        entry = _entries.get(key)
+    if entry is not None and entry[0] >= _notBefore and time.monotonic() - entry[0] < ttl:
+        logger.info(f"Using cached {key} for {quotaCode} ({int(time.monotonic() - entry[0])}s old)")
+        return entry[1]
+    value = fetch()
+    with _lock:
+        _entries[key] = (time.monotonic(), value)
+    return value
+
+
+def clear():
+    """
+    Drop every cached enumeration
+    :return: None
+    """
+    with _lock:
+        _entries.clear()
+        _accounts.clear()
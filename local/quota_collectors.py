@@ -0,0 +1,938 @@
+import json
+import os
+import boto3
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+import quota_stream
+import quota_iam_digests
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Run scoped snapshots keyed by (name, region); names are listed as dependencies in quota_dependencies.json
+_snapshots = {}
+_locks = defaultdict(threading.Lock)
+_lock = threading.Lock()
+# Quota codes of the running plan by (name, region), so a snapshot can fetch for every planned consumer at once
+_planned = defaultdict(set)
+
+
+def snapshot(name, region, build):
+    """
+    Get the snapshot of a region, building it on first use
+    :param name: The snapshot name (e.g. 'autoscaling:snapshot')
+    :param region: The AWS region
+    :param build: Called with the region to build the snapshot
+    :return: The snapshot
+    """
+    key = (name, region)
+    with _lock:
+        lock = _locks[key]
+    with lock:
+        if key not in _snapshots:
+            logger.info(f"Building {name} for region {region}")
+            _snapshots[key] = build(region)
+        return _snapshots[key]
+
+
+def release(name):
+    """
+    Drop the snapshots of a name in every region
+    :param name: The snapshot name
+    :return: None
+    """
+    with _lock:
+        for key in [key for key in _snapshots if key[0] == name]:
+            del _snapshots[key]
+
+
+def expect(name, region, quotaCode):
+    """
+    Register a quota of the running plan as a consumer of a snapshot
+    :param name: The snapshot name
+    :param region: The AWS region
+    :param quotaCode: The consuming quota
+    :return: None
+    """
+    with _lock:
+        _planned[(name, region)].add(quotaCode)
+
+
+def planned(name, region):
+    """
+    :return: Set of the quota codes of the running plan consuming a snapshot
+    """
+    with _lock:
+        return set(_planned.get((name, region), ()))
+
+
+def reset():
+    """
+    Drop all snapshots, called at the end of every run so a warm container never reuses them
+    :return: None
+    """
+    with _lock:
+        _snapshots.clear()
+        _locks.clear()
+        _planned.clear()
+
+
+def _testFilename(quotaCode, operation):
+    return f"tests/{quotaCode.replace('-', '_')}_{operation}.json"
+
+
+AUTOSCALING_SNAPSHOT = 'autoscaling:snapshot'
+
+
+class AutoScalingSnapshot:
+    """
+    Auto Scaling groups of a region with their scheduled actions, policies, notification topics and
+    lifecycle hooks grouped by AutoScalingGroupName. Every index is read with one unfiltered paginated
+    pass the first time a quota needs it.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The AWS region
+        """
+        self.region = region
+        self.client = boto3.client('autoscaling', region_name=region)
+        self.indexes = {}
+        # Reentrant: the lifecycle hooks index reads the groups index
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def groups(self, quotaCode):
+        """
+        The Auto Scaling groups, keeping only the fields the quotas use
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: List of dicts with AutoScalingGroupName, AutoScalingGroupARN, LoadBalancerNames and TargetGroupARNs
+        """
+        def build():
+            return [
+                {
+                    'AutoScalingGroupName': asg['AutoScalingGroupName'],
+                    'AutoScalingGroupARN': asg.get('AutoScalingGroupARN', asg['AutoScalingGroupName']),
+                    'LoadBalancerNames': asg.get('LoadBalancerNames', []),
+                    'TargetGroupARNs': asg.get('TargetGroupARNs', []),
+                }
+                for asg in quota_stream.streamItems(self.client, 'describe_auto_scaling_groups', 'AutoScalingGroups',
+                                                    testFilename=_testFilename(quotaCode, 'describe_auto_scaling_groups'))
+            ]
+        return self._index('groups', build)
+
+    def scheduledActionCounts(self, quotaCode):
+        """
+        :return: Dict of AutoScalingGroupName to its number of scheduled actions
+        """
+        def build():
+            counts = defaultdict(int)
+            for action in quota_stream.streamItems(self.client, 'describe_scheduled_actions', 'ScheduledUpdateGroupActions',
+                                                   testFilename=_testFilename(quotaCode, 'describe_scheduled_actions')):
+                counts[action.get('AutoScalingGroupName')] += 1
+            return counts
+        return self._index('scheduledActions', build)
+
+    def policies(self, quotaCode):
+        """
+        :return: Dict of AutoScalingGroupName to its scaling policies (name, ARN, type and step adjustment count)
+        """
+        def build():
+            policies = defaultdict(list)
+            for policy in quota_stream.streamItems(self.client, 'describe_policies', 'ScalingPolicies',
+                                                   testFilename=_testFilename(quotaCode, 'describe_policies')):
+                policies[policy.get('AutoScalingGroupName')].append({
+                    'PolicyName': policy.get('PolicyName'),
+                    'PolicyARN': policy.get('PolicyARN', policy.get('PolicyName')),
+                    'PolicyType': policy.get('PolicyType'),
+                    'StepAdjustments': len(policy.get('StepAdjustments', [])),
+                })
+            return policies
+        return self._index('policies', build)
+
+    def notificationTopics(self, quotaCode):
+        """
+        :return: Dict of AutoScalingGroupName to the set of SNS topic ARNs it notifies
+        """
+        def build():
+            topics = defaultdict(set)
+            for notification in quota_stream.streamItems(self.client, 'describe_notification_configurations', 'NotificationConfigurations',
+                                                         testFilename=_testFilename(quotaCode, 'describe_notification_configurations')):
+                topics[notification.get('AutoScalingGroupName')].add(notification['TopicARN'])
+            return topics
+        return self._index('notificationTopics', build)
+
+    def lifecycleHookCounts(self, quotaCode):
+        """
+        DescribeLifecycleHooks requires a group name and is not paginated, so this index still
+        costs one call per group
+        :return: Dict of AutoScalingGroupName to its number of lifecycle hooks
+        """
+        def build():
+            counts = defaultdict(int)
+            if 'IS_TESTING_ENABLED' in os.environ.keys():
+                test_filename = _testFilename(quotaCode, 'describe_lifecycle_hooks')
+                logger.info(f"Detected testing enabled. Using test payload from {test_filename}")
+                with open(test_filename, 'r') as test_file_content:
+                    for hook in json.load(test_file_content).get('LifecycleHooks', []):
+                        counts[hook.get('AutoScalingGroupName')] += 1
+                return counts
+            for asg in self.groups(quotaCode):
+                name = asg['AutoScalingGroupName']
+                counts[name] = len(self.client.describe_lifecycle_hooks(AutoScalingGroupName=name).get('LifecycleHooks', []))
+            return counts
+        return self._index('lifecycleHooks', build)
+
+
+def autoScalingSnapshot(region):
+    """
+    Get the run scoped Auto Scaling snapshot of a region
+    :param region: The AWS region
+    :return: An AutoScalingSnapshot
+    """
+    return snapshot(AUTOSCALING_SNAPSHOT, region, AutoScalingSnapshot)
+
+
+ELASTICACHE_SNAPSHOT = 'elasticache:snapshot'
+
+
+class ElastiCacheSnapshot:
+    """
+    ElastiCache inventory of a region: shards by replication group, nodes by cluster and by
+    (replication group, instance type), subnets by subnet group, and the parameter and security
+    group counts. Every listing is read once, the first time a quota needs it.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The AWS region
+        """
+        self.region = region
+        self.client = boto3.client('elasticache', region_name=region)
+        self.indexes = {}
+        # Reentrant: the instance type index reads the cache cluster index
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def replicationGroups(self, quotaCode):
+        """
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: Dict of ReplicationGroupId to {"ClusterEnabled": bool, "Shards": {NodeGroupId: node count}}
+        """
+        def build():
+            groups = {}
+            for rg in quota_stream.streamItems(self.client, 'describe_replication_groups', 'ReplicationGroups',
+                                               testFilename=_testFilename(quotaCode, 'describe_replication_groups')):
+                groups[rg['ReplicationGroupId']] = {
+                    'ClusterEnabled': rg.get('ClusterEnabled', False),
+                    'Shards': {ng['NodeGroupId']: len(ng.get('NodeGroupMembers', [])) for ng in rg.get('NodeGroups', [])},
+                }
+            return groups
+        return self._index('replicationGroups', build)
+
+    def cacheClusters(self, quotaCode):
+        """
+        :return: Dict of CacheClusterId to {"Engine", "NumCacheNodes", "CacheNodeType", "ReplicationGroupId"}
+        """
+        def build():
+            clusters = {}
+            for cluster in quota_stream.streamItems(self.client, 'describe_cache_clusters', 'CacheClusters',
+                                                    testFilename=_testFilename(quotaCode, 'describe_cache_clusters'),
+                                                    ShowCacheNodeInfo=True):
+                clusters[cluster['CacheClusterId']] = {
+                    'Engine': cluster.get('Engine', '').lower(),
+                    'NumCacheNodes': cluster.get('NumCacheNodes', 0),
+                    'CacheNodeType': cluster.get('CacheNodeType'),
+                    'ReplicationGroupId': cluster.get('ReplicationGroupId'),
+                }
+            return clusters
+        return self._index('cacheClusters', build)
+
+    def nodesByInstanceType(self, quotaCode):
+        """
+        :return: Dict of (ReplicationGroupId, CacheNodeType) to the number of nodes
+        """
+        def build():
+            nodes = defaultdict(int)
+            for cluster in self.cacheClusters(quotaCode).values():
+                if cluster['ReplicationGroupId']:
+                    nodes[(cluster['ReplicationGroupId'], cluster['CacheNodeType'])] += cluster['NumCacheNodes']
+            return nodes
+        return self._index('nodesByInstanceType', build)
+
+    def subnetGroups(self, quotaCode):
+        """
+        :return: Dict of CacheSubnetGroupName to its number of subnets
+        """
+        def build():
+            return {
+                group['CacheSubnetGroupName']: len(group.get('Subnets', []))
+                for group in quota_stream.streamItems(self.client, 'describe_cache_subnet_groups', 'CacheSubnetGroups',
+                                                      testFilename=_testFilename(quotaCode, 'describe_cache_subnet_groups'))
+            }
+        return self._index('subnetGroups', build)
+
+    def parameterGroupCount(self, quotaCode):
+        """
+        :return: The number of cache parameter groups
+        """
+        def build():
+            return quota_stream.reduceItems(
+                quota_stream.streamItems(self.client, 'describe_cache_parameter_groups', 'CacheParameterGroups',
+                                         testFilename=_testFilename(quotaCode, 'describe_cache_parameter_groups')),
+                quota_stream.CountReducer()
+            )[0].value
+        return self._index('parameterGroupCount', build)
+
+    def securityGroupCount(self, quotaCode):
+        """
+        Cache security groups only exist outside VPCs; VPC-only regions reject the call and count 0
+        :return: The number of cache security groups
+        """
+        def build():
+            try:
+                return quota_stream.reduceItems(
+                    quota_stream.streamItems(self.client, 'describe_cache_security_groups', 'CacheSecurityGroups',
+                                             testFilename=_testFilename(quotaCode, 'describe_cache_security_groups')),
+                    quota_stream.CountReducer()
+                )[0].value
+            except ClientError as e:
+                if 'InvalidParameterValue' in str(e) or 'Default' in str(e):
+                    logger.info(f"Cache security groups not applicable in this region (VPC-only): {e}")
+                    return 0
+                raise
+        return self._index('securityGroupCount', build)
+
+
+def elastiCacheSnapshot(region):
+    """
+    Get the run scoped ElastiCache snapshot of a region
+    :param region: The AWS region
+    :return: An ElastiCacheSnapshot
+    """
+    return snapshot(ELASTICACHE_SNAPSHOT, region, ElastiCacheSnapshot)
+
+
+RDS_SNAPSHOT = 'rds:snapshot'
+
+# Parameter groups are the only taggable RDS resources whose describe call does not embed TagList
+RDS_PARAMETER_GROUP_TYPES = ['rds:pg', 'rds:cluster-pg']
+
+
+class RdsSnapshot:
+    """
+    RDS inventory of a region. DB instances keep their VPC security groups and tag count from the
+    embedded TagList; clusters, instance and cluster snapshots are read the same way, and parameter
+    groups through one paginated Resource Groups Tagging API pass, so tags never cost a call per resource.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The AWS region
+        """
+        self.region = region
+        self.client = boto3.client('rds', region_name=region)
+        self.indexes = {}
+        # Reentrant: the tag index reads the instance index
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def instances(self, quotaCode):
+        """
+        The DB instances, keeping only the fields the quotas use
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: List of dicts with DBInstanceIdentifier, DBInstanceArn, VpcSecurityGroupIds and TagCount
+        """
+        def build():
+            return [
+                {
+                    'DBInstanceIdentifier': db['DBInstanceIdentifier'],
+                    'DBInstanceArn': db.get('DBInstanceArn', db['DBInstanceIdentifier']),
+                    'VpcSecurityGroupIds': [sg['VpcSecurityGroupId'] for sg in db.get('VpcSecurityGroups', [])],
+                    'TagCount': len(db.get('TagList', [])),
+                }
+                for db in quota_stream.streamItems(self.client, 'describe_db_instances', 'DBInstances',
+                                                   testFilename=_testFilename(quotaCode, 'describe_db_instances'))
+            ]
+        return self._index('instances', build)
+
+    def _embeddedTagCounts(self, quotaCode, operation, resultKey, arnKey):
+        return {
+            resource[arnKey]: len(resource.get('TagList', []))
+            for resource in quota_stream.streamItems(self.client, operation, resultKey,
+                                                     testFilename=_testFilename(quotaCode, operation))
+        }
+
+    def tagCounts(self, quotaCode):
+        """
+        Tag count of every taggable RDS resource: instances, clusters, snapshots and parameter groups
+        :return: Dict of resource ARN to its number of tags
+        """
+        def build():
+            counts = {db['DBInstanceArn']: db['TagCount'] for db in self.instances(quotaCode)}
+            counts.update(self._embeddedTagCounts(quotaCode, 'describe_db_clusters', 'DBClusters', 'DBClusterArn'))
+            counts.update(self._embeddedTagCounts(quotaCode, 'describe_db_snapshots', 'DBSnapshots', 'DBSnapshotArn'))
+            counts.update(self._embeddedTagCounts(quotaCode, 'describe_db_cluster_snapshots', 'DBClusterSnapshots', 'DBClusterSnapshotArn'))
+            tagging = boto3.client('resourcegroupstaggingapi', region_name=self.region)
+            for resource in quota_stream.streamItems(tagging, 'get_resources', 'ResourceTagMappingList',
+                                                     testFilename=_testFilename(quotaCode, 'get_resources'),
+                                                     ResourceTypeFilters=RDS_PARAMETER_GROUP_TYPES):
+                counts[resource['ResourceARN']] = len(resource.get('Tags', []))
+            return counts
+        return self._index('tagCounts', build)
+
+
+def rdsSnapshot(region):
+    """
+    Get the run scoped RDS snapshot of a region
+    :param region: The AWS region
+    :return: An RdsSnapshot
+    """
+    return snapshot(RDS_SNAPSHOT, region, RdsSnapshot)
+
+
+EC2_SNAPSHOT = 'ec2:snapshot'
+
+INBOUND = 'Inbound'
+OUTBOUND = 'Outbound'
+
+
+class Ec2Snapshot:
+    """
+    EC2 inventory of a region, one lazily built index per resource family. Security group rules
+    are read with one describe_security_group_rules pass instead of per-group IpPermissions, VPC
+    endpoints with one unfiltered pass indexed by type and by VPC, NAT gateways with their address
+    counts and per-AZ counts (subnets resolved with one describe_subnets pass), and the transit
+    gateway topology (route tables, attachments, multicast domains) with one unfiltered pass per
+    family keyed by transit gateway.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The AWS region
+        """
+        self.region = region
+        self.client = boto3.client('ec2', region_name=region)
+        self.indexes = {}
+        # Reentrant: derived indexes read the base ones (e.g. rules -> prefix lists, NAT gateways per AZ -> subnets)
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def prefixLists(self, quotaCode):
+        """
+        :return: Dict of PrefixListId to (MaxEntries, AddressFamily)
+        """
+        def build():
+            return {
+                prefixList['PrefixListId']: (prefixList.get('MaxEntries', 1), prefixList.get('AddressFamily'))
+                for prefixList in quota_stream.streamItems(self.client, 'describe_managed_prefix_lists', 'PrefixLists',
+                                                           testFilename=_testFilename(quotaCode, 'describe_managed_prefix_lists'))
+            }
+        return self._index('prefixLists', build)
+
+    def securityGroupRuleCounts(self, quotaCode):
+        """
+        Rules per security group and direction, following the AWS counting rules: the quota applies
+        to IPv4 and IPv6 rules separately, a referenced security group counts once for each family
+        and a prefix list counts as its maximum number of entries
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: Dict of GroupId to {INBOUND: count, OUTBOUND: count}, the count being the larger address family
+        """
+        def build():
+            counts = defaultdict(lambda: defaultdict(int))
+            prefixListRules = []
+            for rule in quota_stream.streamItems(self.client, 'describe_security_group_rules', 'SecurityGroupRules',
+                                                 testFilename=_testFilename(quotaCode, 'describe_security_group_rules')):
+                direction = OUTBOUND if rule.get('IsEgress') else INBOUND
+                groupCounts = counts[rule['GroupId']]
+                if rule.get('CidrIpv4'):
+                    groupCounts[(direction, 'IPv4')] += 1
+                elif rule.get('CidrIpv6'):
+                    groupCounts[(direction, 'IPv6')] += 1
+                elif rule.get('PrefixListId'):
+                    prefixListRules.append((rule['GroupId'], direction, rule['PrefixListId']))
+                else:
+                    groupCounts[(direction, 'IPv4')] += 1
+                    groupCounts[(direction, 'IPv6')] += 1
+
+            # Only read the prefix lists when a rule references one
+            prefixLists = self.prefixLists(quotaCode) if prefixListRules else {}
+            for groupId, direction, prefixListId in prefixListRules:
+                maxEntries, addressFamily = prefixLists.get(prefixListId, (1, None))
+                for family in ([addressFamily] if addressFamily else ['IPv4', 'IPv6']):
+                    counts[groupId][(direction, family)] += maxEntries
+
+            return {
+                groupId: {direction: max(groupCounts[(direction, 'IPv4')], groupCounts[(direction, 'IPv6')])
+                          for direction in (INBOUND, OUTBOUND)}
+                for groupId, groupCounts in counts.items()
+            }
+        return self._index('securityGroupRuleCounts', build)
+
+    def vpcEndpoints(self, quotaCode):
+        """
+        Every VPC endpoint of the region from one unfiltered describe_vpc_endpoints pass
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: Dict of VpcEndpointId to {"Type", "VpcId", "PolicyLength"}
+        """
+        def build():
+            return {
+                endpoint['VpcEndpointId']: {
+                    'Type': endpoint.get('VpcEndpointType'),
+                    'VpcId': endpoint.get('VpcId'),
+                    'PolicyLength': len(endpoint.get('PolicyDocument') or ''),
+                }
+                for endpoint in quota_stream.streamItems(self.client, 'describe_vpc_endpoints', 'VpcEndpoints',
+                                                         testFilename=_testFilename(quotaCode, 'describe_vpc_endpoints'))
+            }
+        return self._index('vpcEndpoints', build)
+
+    def vpcEndpointsByType(self, quotaCode):
+        """
+        :return: Dict of VpcEndpointType (Gateway, Interface, GatewayLoadBalancer, ...) to the list of VpcEndpointId
+        """
+        def build():
+            endpointsByType = defaultdict(list)
+            for endpointId, endpoint in self.vpcEndpoints(quotaCode).items():
+                endpointsByType[endpoint['Type']].append(endpointId)
+            return endpointsByType
+        return self._index('vpcEndpointsByType', build)
+
+    def vpcEndpointCountsByVpc(self, quotaCode):
+        """
+        :return: Dict of VpcId to {VpcEndpointType: number of endpoints}
+        """
+        def build():
+            counts = defaultdict(lambda: defaultdict(int))
+            for endpoint in self.vpcEndpoints(quotaCode).values():
+                counts[endpoint['VpcId']][endpoint['Type']] += 1
+            return counts
+        return self._index('vpcEndpointCountsByVpc', build)
+
+    def subnetAvailabilityZones(self, quotaCode):
+        """
+        :return: Dict of SubnetId to its AvailabilityZone, from one describe_subnets pass
+        """
+        def build():
+            return {
+                subnet['SubnetId']: subnet['AvailabilityZone']
+                for subnet in quota_stream.streamItems(self.client, 'describe_subnets', 'Subnets',
+                                                       testFilename=_testFilename(quotaCode, 'describe_subnets'))
+            }
+        return self._index('subnetAvailabilityZones', build)
+
+    def natGateways(self, quotaCode):
+        """
+        Every NAT gateway of the region from one unfiltered describe_nat_gateways pass, with its
+        address counts by type
+        :return: Dict of NatGatewayId to {"State", "SubnetId", "PrivateIps", "ElasticIps"}
+        """
+        def build():
+            return {
+                natGateway['NatGatewayId']: {
+                    'State': natGateway.get('State'),
+                    'SubnetId': natGateway.get('SubnetId'),
+                    'PrivateIps': len(natGateway.get('NatGatewayAddresses', [])),
+                    'ElasticIps': sum(1 for address in natGateway.get('NatGatewayAddresses', []) if address.get('AllocationId')),
+                }
+                for natGateway in quota_stream.streamItems(self.client, 'describe_nat_gateways', 'NatGateways',
+                                                           testFilename=_testFilename(quotaCode, 'describe_nat_gateways'))
+            }
+        return self._index('natGateways', build)
+
+    def natGatewayCountsByAz(self, quotaCode):
+        """
+        :return: Dict of AvailabilityZone to the number of available NAT gateways
+        """
+        def build():
+            available = [natGateway for natGateway in self.natGateways(quotaCode).values() if natGateway['State'] == 'available']
+            # Only read the subnets when there is a gateway to place
+            zones = self.subnetAvailabilityZones(quotaCode) if available else {}
+            counts = defaultdict(int)
+            for natGateway in available:
+                counts[zones.get(natGateway['SubnetId'], 'unknown')] += 1
+            return counts
+        return self._index('natGatewayCountsByAz', build)
+
+    # Transit gateway topology: every family below is read with one unfiltered pass and keyed by
+    # TransitGatewayId, instead of one filtered call per transit gateway
+
+    def transitGateways(self, quotaCode):
+        """
+        :return: List of the TransitGatewayId of the region
+        """
+        def build():
+            return [
+                tgw['TransitGatewayId']
+                for tgw in quota_stream.streamItems(self.client, 'describe_transit_gateways', 'TransitGateways',
+                                                    testFilename=_testFilename(quotaCode, 'describe_transit_gateways'))
+            ]
+        return self._index('transitGateways', build)
+
+    def transitGatewayRouteTables(self, quotaCode):
+        """
+        :return: Dict of TransitGatewayId to the list of its TransitGatewayRouteTableId
+        """
+        def build():
+            routeTables = defaultdict(list)
+            for routeTable in quota_stream.streamItems(self.client, 'describe_transit_gateway_route_tables', 'TransitGatewayRouteTables',
+                                                       testFilename=_testFilename(quotaCode, 'describe_transit_gateway_route_tables')):
+                routeTables[routeTable.get('TransitGatewayId')].append(routeTable['TransitGatewayRouteTableId'])
+            return routeTables
+        return self._index('transitGatewayRouteTables', build)
+
+    def transitGatewayAttachments(self, quotaCode):
+        """
+        :return: Dict of TransitGatewayId to the list of its attachments {"TransitGatewayAttachmentId", "ResourceType", "ResourceId", "State"}
+        """
+        def build():
+            attachments = defaultdict(list)
+            for attachment in quota_stream.streamItems(self.client, 'describe_transit_gateway_attachments', 'TransitGatewayAttachments',
+                                                       testFilename=_testFilename(quotaCode, 'describe_transit_gateway_attachments')):
+                attachments[attachment.get('TransitGatewayId')].append({
+                    'TransitGatewayAttachmentId': attachment['TransitGatewayAttachmentId'],
+                    'ResourceType': attachment.get('ResourceType'),
+                    'ResourceId': attachment.get('ResourceId'),
+                    'State': attachment.get('State'),
+                })
+            return attachments
+        return self._index('transitGatewayAttachments', build)
+
+    def transitGatewayMulticastDomains(self, quotaCode):
+        """
+        Multicast group members are listed per domain, the only per-resource call of the topology
+        :return: Dict of TransitGatewayId to {TransitGatewayMulticastDomainId: set of member NetworkInterfaceId}
+        """
+        def build():
+            domains = defaultdict(dict)
+            for domain in quota_stream.streamItems(self.client, 'describe_transit_gateway_multicast_domains', 'TransitGatewayMulticastDomains',
+                                                   testFilename=_testFilename(quotaCode, 'describe_transit_gateway_multicast_domains')):
+                domainId = domain['TransitGatewayMulticastDomainId']
+                domains[domain.get('TransitGatewayId')][domainId] = {
+                    group['NetworkInterfaceId']
+                    for group in quota_stream.streamItems(self.client, 'search_transit_gateway_multicast_groups', 'MulticastGroups',
+                                                          testFilename=_testFilename(quotaCode, 'search_transit_gateway_multicast_groups'),
+                                                          TransitGatewayMulticastDomainId=domainId)
+                    if 'NetworkInterfaceId' in group
+                }
+            return domains
+        return self._index('transitGatewayMulticastDomains', build)
+
+
+def ec2Snapshot(region):
+    """
+    Get the run scoped EC2 snapshot of a region
+    :param region: The AWS region
+    :return: An Ec2Snapshot
+    """
+    return snapshot(EC2_SNAPSHOT, region, Ec2Snapshot)
+
+
+OPENSEARCH_SNAPSHOT = 'opensearch:snapshot'
+
+# describe_domains accepts at most 5 domain names per call
+OPENSEARCH_DESCRIBE_CHUNK = 5
+OPENSEARCH_DESCRIBE_WORKERS = int(os.environ.get('OPENSEARCH_DESCRIBE_WORKERS', '4'))
+
+
+class OpenSearchSnapshot:
+    """
+    OpenSearch Service domains of a region (OpenSearch and legacy Elasticsearch engines) with their
+    data, warm and dedicated master node counts. The domain names are described in chunks of 5, the
+    chunks concurrently; the calls still go through the shared rate limiter.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The AWS region
+        """
+        self.region = region
+        self.client = boto3.client('opensearch', region_name=region)
+        self.indexes = {}
+        # Reentrant: the domain index reads the domain name index
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def domainNames(self, quotaCode):
+        """
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: List of the domain names
+        """
+        def build():
+            if 'IS_TESTING_ENABLED' in os.environ.keys():
+                return list(self.domains(quotaCode))
+            return [domain['DomainName'] for domain in self.client.list_domain_names().get('DomainNames', [])]
+        return self._index('domainNames', build)
+
+    def _describe(self, domainNames):
+        return self.client.describe_domains(DomainNames=domainNames)['DomainStatusList']
+
+    def domains(self, quotaCode):
+        """
+        :return: Dict of DomainName to {"DomainId", "DataNodes", "WarmNodes", "MasterNodes", "Nodes"}
+        """
+        def build():
+            if 'IS_TESTING_ENABLED' in os.environ.keys():
+                statuses = list(quota_stream.streamItems(self.client, 'describe_domains', 'DomainStatusList',
+                                                         testFilename=_testFilename(quotaCode, 'describe_domains')))
+            else:
+                names = self.domainNames(quotaCode)
+                chunks = [names[i:i + OPENSEARCH_DESCRIBE_CHUNK] for i in range(0, len(names), OPENSEARCH_DESCRIBE_CHUNK)]
+                statuses = []
+                if chunks:
+                    with ThreadPoolExecutor(max_workers=min(len(chunks), OPENSEARCH_DESCRIBE_WORKERS)) as pool:
+                        for chunk in pool.map(self._describe, chunks):
+                            statuses.extend(chunk)
+            domains = {}
+            for status in statuses:
+                if status.get('Deleted'):
+                    continue
+                config = status.get('ClusterConfig', {})
+                dataNodes = config.get('InstanceCount', 0)
+                warmNodes = config.get('WarmCount', 0) if config.get('WarmEnabled') else 0
+                masterNodes = config.get('DedicatedMasterCount', 0) if config.get('DedicatedMasterEnabled') else 0
+                domains[status['DomainName']] = {
+                    'DomainId': status['DomainId'],
+                    'DataNodes': dataNodes,
+                    'WarmNodes': warmNodes,
+                    'MasterNodes': masterNodes,
+                    'Nodes': dataNodes + warmNodes + masterNodes,
+                }
+            return domains
+        return self._index('domains', build)
+
+
+def openSearchSnapshot(region):
+    """
+    Get the run scoped OpenSearch snapshot of a region
+    :param region: The AWS region
+    :return: An OpenSearchSnapshot
+    """
+    return snapshot(OPENSEARCH_SNAPSHOT, region, OpenSearchSnapshot)
+
+
+IAM_SNAPSHOT = 'iam:snapshot'
+
+IAM_FANOUT_WORKERS = int(os.environ.get('IAM_FANOUT_WORKERS', '8'))
+
+# Per-user quotas without a bulk API: quota code -> (per-user listing, result key)
+IAM_PER_USER_OPERATIONS = {
+    'L-F1176D35': ('list_ssh_public_keys', 'SSHPublicKeys'),
+    'L-8758042E': ('list_access_keys', 'AccessKeyMetadata'),
+    'L-7A1621EC': ('list_groups_for_user', 'Groups'),
+    'L-19F2CF71': ('list_mfa_devices', 'MFADevices'),
+    'L-76C48054': ('list_signing_certificates', 'Certificates'),
+    'L-4019AD8B': ('list_attached_user_policies', 'AttachedPolicies'),
+    'L-FC9EC213': ('list_user_tags', 'Tags'),
+}
+
+
+class IamSnapshot:
+    """
+    IAM users with their per-user counts. The users are listed once; the first per-user quota
+    asking starts one sweep that issues the listings of every per-user quota of the running plan
+    for each user, on a thread pool whose calls go through the shared rate limiter.
+    In incremental mode (quota_iam_digests configured) only the users whose digest changed since
+    the previous run are swept for the quotas the digest covers, the others keep their stored counts.
+    """
+
+    def __init__(self, region):
+        """
+        :param region: The region of the run (IAM is global)
+        """
+        self.region = region
+        self.client = boto3.client('iam')
+        self.indexes = {}
+        # Quota code -> {user Arn: count}
+        self.counts = {}
+        # Quota code -> error of its per-user listing; a failed quota is reported as failed and never swept again
+        self.errors = {}
+        # Separate from self.lock, which the thread starting the sweep holds while the workers run
+        self.errorLock = threading.Lock()
+        # Reentrant: the sweep reads the user index
+        self.lock = threading.RLock()
+
+    def _index(self, name, build):
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = build()
+            return self.indexes[name]
+
+    def users(self, quotaCode):
+        """
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: Dict of UserName to Arn
+        """
+        def build():
+            return {
+                user['UserName']: user['Arn']
+                for user in quota_stream.streamItems(self.client, 'list_users', 'Users',
+                                                     testFilename=_testFilename(quotaCode, 'list_users'))
+            }
+        return self._index('users', build)
+
+    def userDigests(self, quotaCode):
+        """
+        :param quotaCode: The quota asking, used to name the test payload
+        :return: Dict of user Arn to (UserName, digest), from one pass of the authorization details
+        """
+        def build():
+            return {
+                user['Arn']: (user['UserName'], quota_iam_digests.userDigest(user))
+                for user in quota_stream.streamItems(self.client, 'get_account_authorization_details', 'UserDetailList',
+                                                     testFilename=_testFilename(quotaCode, 'get_account_authorization_details'),
+                                                     Filter=['User'])
+            }
+        return self._index('userDigests', build)
+
+    def _userCounts(self, userName, quotaCodes):
+        """
+        :return: Dict of quota code to count, without the quotas whose listing failed; None when the user is gone
+        """
+        counts = {}
+        for quotaCode in quotaCodes:
+            # A failure (e.g. AccessDenied) repeats for every user, so the remaining users skip the quota
+            with self.errorLock:
+                if quotaCode in self.errors:
+                    continue
+            operation, resultKey = IAM_PER_USER_OPERATIONS[quotaCode]
+            try:
+                counts[quotaCode] = sum(1 for _ in quota_stream.streamItems(self.client, operation, resultKey,
+                                                                           testFilename=_testFilename(quotaCode, operation),
+                                                                           UserName=userName))
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') == 'NoSuchEntity':
+                    # Deleted since the users were listed
+                    logger.info(f"IAM user {userName} no longer exists, skipping it")
+                    return None
+                self._fail(quotaCode, operation, e)
+            except Exception as e:
+                self._fail(quotaCode, operation, e)
+        return counts
+
+    def _fail(self, quotaCode, operation, error):
+        with self.errorLock:
+            if quotaCode not in self.errors:
+                logger.error(f"{operation} failed, {quotaCode} is not evaluated in this run: {error}")
+                self.errors[quotaCode] = error
+
+    def _sweep(self, users, quotaCodes):
+        """
+        :param users: Dict of UserName to Arn
+        :return: Dict of user Arn to {quota code: count}, without the users deleted meanwhile
+        """
+        logger.info(f"Listing {', '.join(IAM_PER_USER_OPERATIONS[code][0] for code in quotaCodes)} for {len(users)} IAM users")
+        with ThreadPoolExecutor(max_workers=IAM_FANOUT_WORKERS) as pool:
+            results = list(pool.map(lambda userName: self._userCounts(userName, quotaCodes), users))
+        return {arn: userCounts for arn, userCounts in zip(users.values(), results) if userCounts is not None}
+
+    def _incrementalCounts(self, quotaCode, quotaCodes, store):
+        """
+        Sweep the users whose digest changed, or every user when a full scan is due, for the quotas the
+        digest covers, and store the result. The other per-user quotas are swept for every user.
+        :return: Dict of user Arn to {quota code: count} of every user
+        """
+        covered = [code for code in quotaCodes if code in quota_iam_digests.DIGEST_COVERED_CODES]
+        uncovered = [code for code in quotaCodes if code not in quota_iam_digests.DIGEST_COVERED_CODES]
+        digests = self.userDigests(quotaCode)
+        userCounts = {}
+        if uncovered:
+            # Access keys, MFA devices, SSH keys and certificates change without changing the digest
+            userCounts = self._sweep({userName: arn for arn, (userName, _) in digests.items()}, uncovered)
+        if not covered:
+            return userCounts
+        fullScanAt, cached = store.load()
+        full, stale = quota_iam_digests.staleUsers({arn: digest for arn, (_, digest) in digests.items()}, cached, fullScanAt, covered)
+        logger.info(f"{'Full IAM scan' if full else 'Incremental IAM scan'}: {len(stale)} of {len(digests)} users changed")
+        swept = self._sweep({digests[arn][0]: arn for arn in stale}, covered)
+        changed = {}
+        for arn, sweptCounts in swept.items():
+            digest = digests[arn][1]
+            entry = cached.get(arn)
+            # Counts of other covered quotas remain valid while the digest is unchanged
+            counts = {code: count for code, count in entry['Counts'].items() if code in quota_iam_digests.DIGEST_COVERED_CODES} \
+                if entry and entry['Digest'] == digest and not full else {}
+            counts.update(sweptCounts)
+            # Stored counts of a failed quota would hide the failure from the next run
+            for code in self.errors:
+                counts.pop(code, None)
+            changed[arn] = {'Digest': digest, 'Counts': counts}
+        removed = [arn for arn in cached if arn not in digests or (arn in stale and arn not in swept)]
+        store.save(changed, removed, time.time() if full else fullScanAt)
+        principals = {arn: entry for arn, entry in cached.items() if arn in digests and arn not in removed}
+        principals.update(changed)
+        for arn, entry in principals.items():
+            userCounts.setdefault(arn, {}).update({code: count for code, count in entry['Counts'].items() if code in covered})
+        return userCounts
+
+    def perUserCounts(self, quotaCode):
+        """
+        :param quotaCode: One of IAM_PER_USER_OPERATIONS
+        :return: Dict of user Arn to the number of items its per-user listing returns
+        :raises: The error of the quota's listing when it failed during the sweep
+        """
+        with self.lock:
+            if quotaCode not in self.counts and quotaCode not in self.errors:
+                quotaCodes = sorted(({quotaCode} | planned(IAM_SNAPSHOT, self.region)) & set(IAM_PER_USER_OPERATIONS)
+                                    - set(self.counts) - set(self.errors))
+                store = quota_iam_digests.activeStore()
+                if store is None:
+                    userCounts = self._sweep(self.users(quotaCode), quotaCodes)
+                else:
+                    userCounts = self._incrementalCounts(quotaCode, quotaCodes, store)
+                for code in quotaCodes:
+                    if code not in self.errors:
+                        self.counts[code] = {arn: counts[code] for arn, counts in userCounts.items() if code in counts}
+            if quotaCode in self.errors:
+                raise self.errors[quotaCode]
+            return self.counts[quotaCode]
+
+
+def iamSnapshot(region):
+    """
+    Get the run scoped IAM snapshot
+    :param region: The region of the run
+    :return: An IamSnapshot
+    """
+    return snapshot(IAM_SNAPSHOT, region, IamSnapshot)
@@ -0,0 +1,502 @@
+import json
+import os
+import re
+import time
+import boto3
+import logging
+import sys
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+from botocore.exceptions import ClientError
+import quota_stream
+import quota_specs
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Counters older than this are rebuilt with a full scan before they are reported
+RECONCILE_INTERVAL_MINUTES = float(os.environ.get('COUNTER_RECONCILE_MINUTES', '360'))
+
+# CloudTrail delivers the events of global services (IAM) in us-east-1
+GLOBAL_EVENT_REGION = 'us-east-1'
+
+CLOUDTRAIL_DETAIL_TYPE = 'AWS API Call via CloudTrail'
+
+# Group of the counters that are not grouped (a region or account wide count)
+NO_GROUP = ''
+
+
+def _idsIn(section, pattern):
+    """
+    Extractor of the resource ids matching a pattern anywhere in a section of a CloudTrail event.
+    EC2 request and response elements differ between API versions, so the ids are matched
+    rather than read from a fixed path; the membership check makes extra matches harmless.
+    :param section: 'requestParameters' or 'responseElements'
+    :param pattern: Regex of the resource id, e.g. r'vpce-[0-9a-f]+'
+    :return: A function of the event detail returning the list of ids
+    """
+    regex = re.compile(rf'\b{pattern}\b')
+
+    def extract(detail):
+        return sorted(set(regex.findall(json.dumps(detail.get(section) or {}))))
+    return extract
+
+
+def _path(section, *keys):
+    """
+    Extractor of a single value at a fixed path of a CloudTrail event section
+    :return: A function of the event detail returning a list with the value, or an empty list
+    """
+    def extract(detail):
+        value = detail.get(section) or {}
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        return [value] if value else []
+    return extract
+
+
+@dataclass
+class CounterSpec:
+    """
+    An incrementally maintained count: the CloudTrail events creating and deleting the resources
+    and the full scan used to reconcile the counter
+    """
+    quotaCode: str
+    eventSource: str
+    createEvents: tuple
+    deleteEvents: tuple
+    # Resource ids created / deleted by an event detail
+    created: Callable
+    deleted: Callable
+    # Full scan of a region: dict of resource id to group
+    scan: Callable
+    # Group of a created resource, e.g. its Availability Zone (grouped counters report the max group)
+    groupOf: Optional[Callable] = None
+    # Filter on create events, e.g. only Gateway endpoints
+    where: Optional[Callable] = None
+    scope: str = quota_specs.REGIONAL
+    description: str = ''
+
+    @property
+    def functionName(self):
+        return self.quotaCode.replace('-', '_')
+
+    def testFilename(self, operation):
+        return f'tests/{self.functionName}_{operation}.json'
+
+    def counterRegion(self, region):
+        """
+        Region part of the counter key; global quotas share one counter
+        """
+        return quota_specs.GLOBAL if self.scope == quota_specs.GLOBAL else region
+
+    def eventRegion(self, region):
+        """
+        Region whose event bus receives the events of this counter
+        """
+        return GLOBAL_EVENT_REGION if self.scope == quota_specs.GLOBAL else region
+
+
+def _scanGatewayEndpoints(spec, region):
+    ec2 = boto3.client('ec2', region_name=region)
+    return {endpoint['VpcEndpointId']: NO_GROUP for endpoint in quota_stream.streamItems(
+        ec2, 'describe_vpc_endpoints', 'VpcEndpoints', testFilename=spec.testFilename('describe_vpc_endpoints'),
+        Filters=[{'Name': 'vpc-endpoint-type', 'Values': ['Gateway']}])}
+
+
+def _subnetZones(ec2, subnetIds):
+    if not subnetIds:
+        return {}
+    return {subnet['SubnetId']: subnet['AvailabilityZone'] for subnet in ec2.describe_subnets(SubnetIds=sorted(subnetIds))['Subnets']}
+
+
+def _scanNatGateways(spec, region):
+    ec2 = boto3.client('ec2', region_name=region)
+    natGateways = list(quota_stream.streamItems(
+        ec2, 'describe_nat_gateways', 'NatGateways', testFilename=spec.testFilename('describe_nat_gateways'),
+        Filters=[{'Name': 'state', 'Values': ['available']}]))
+    if 'IS_TESTING_ENABLED' in os.environ.keys():
+        zones = {ngw['SubnetId']: ngw.get('AvailabilityZone', 'unknown') for ngw in natGateways}
+    else:
+        zones = _subnetZones(ec2, {ngw['SubnetId'] for ngw in natGateways})
+    return {ngw['NatGatewayId']: zones.get(ngw['SubnetId'], 'unknown') for ngw in natGateways}
+
+
+def _natGatewayZone(detail, region):
+    subnetIds = _idsIn('responseElements', r'subnet-[0-9a-f]+')(detail)
+    if not subnetIds:
+        return 'unknown'
+    return _subnetZones(boto3.client('ec2', region_name=region), subnetIds[:1]).get(subnetIds[0], 'unknown')
+
+
+def _scanUsers(spec, region):
+    return {user['UserName']: NO_GROUP for user in quota_stream.streamItems(
+        boto3.client('iam'), 'list_users', 'Users', testFilename=spec.testFilename('list_users'))}
+
+
+# Network interfaces (L-DF5E4CA3) are not counted: the primary interfaces of instances are created by
+# RunInstances and removed on termination without CreateNetworkInterface / DeleteNetworkInterface
+# events, and TerminateInstances does not name them
+SPECS = [
+    CounterSpec('L-1B52E74A', 'ec2.amazonaws.com', ('CreateVpcEndpoint',), ('DeleteVpcEndpoints',),
+                created=_idsIn('responseElements', r'vpce-[0-9a-f]+'),
+                deleted=_idsIn('requestParameters', r'vpce-[0-9a-f]+'),
+                scan=_scanGatewayEndpoints,
+                where=lambda detail: re.search(r'"vpcEndpointType"\s*:\s*"Gateway"', json.dumps(detail.get('responseElements') or {}), re.I) is not None,
+                description='Gateway VPC endpoints per region'),
+    CounterSpec('L-FE5A380F', 'ec2.amazonaws.com', ('CreateNatGateway',), ('DeleteNatGateway',),
+                created=_idsIn('responseElements', r'nat-[0-9a-f]+'),
+                deleted=_idsIn('requestParameters', r'nat-[0-9a-f]+'),
+                scan=_scanNatGateways,
+                groupOf=_natGatewayZone,
+                description='NAT gateways per Availability Zone'),
+    CounterSpec('L-F55AF5E4', 'iam.amazonaws.com', ('CreateUser',), ('DeleteUser',),
+                created=_path('responseElements', 'user', 'userName'),
+                deleted=_path('requestParameters', 'userName'),
+                scan=_scanUsers,
+                scope=quota_specs.GLOBAL,
+                description='Users per account'),
+]
+
+SPECS_BY_CODE = {spec.quotaCode: spec for spec in SPECS}
+
+
+def covers(quotaCode):
+    """
+    Check whether a quota can be evaluated from an incremental counter
+    :param quotaCode: The quota code
+    :return: True when a counter spec exists
+    """
+    return quotaCode in SPECS_BY_CODE
+
+
+def counterKey(quotaCode, region):
+    return f"{quotaCode}|{region}"
+
+
+class JsonFileCounterStore:
+    """
+    Counters kept in memory and optionally in a local JSON file (used by app.py and to replay events)
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: The JSON file, None keeps the counters in memory only
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.counters = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.counters = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading counters from {path}, starting empty: {e}")
+
+    def _save(self):
+        if self.path:
+            with open(self.path, 'w') as f:
+                json.dump(self.counters, f, indent=2)
+
+    def add(self, key, resourceId, group):
+        """
+        Count a created resource once, however often its event is delivered
+        :return: True when the resource was not counted yet
+        """
+        with self.lock:
+            counter = self.counters.setdefault(key, {'ReconciledAt': None, 'Members': {}})
+            if resourceId in counter['Members']:
+                return False
+            counter['Members'][resourceId] = group
+            self._save()
+            return True
+
+    def remove(self, key, resourceId):
+        """
+        Uncount a deleted resource
+        :return: True when the resource was counted
+        """
+        with self.lock:
+            counter = self.counters.get(key)
+            if not counter or resourceId not in counter['Members']:
+                return False
+            del counter['Members'][resourceId]
+            self._save()
+            return True
+
+    def counts(self, key):
+        """
+        :return: (reconciled at epoch or None, dict of group to count)
+        """
+        with self.lock:
+            counter = self.counters.get(key, {'ReconciledAt': None, 'Members': {}})
+            counts = defaultdict(int)
+            for group in counter['Members'].values():
+                counts[group] += 1
+            return counter['ReconciledAt'], dict(counts)
+
+    def replace(self, key, members, reconciledAt):
+        """
+        Replace a counter with the result of a full scan
+        :param members: Dict of resource id to group
+        :return: None
+        """
+        with self.lock:
+            self.counters[key] = {'ReconciledAt': reconciledAt, 'Members': dict(members)}
+            self._save()
+
+
+class DynamoCounterStore:
+    """
+    Counters kept in a DynamoDB table keyed by (CounterKey, Member) (used by the Lambda). Every counted
+    resource has a membership item, written in the same transaction as the counter update, so events
+    delivered more than once are only counted once.
+    """
+
+    COUNT_PREFIX = '#count|'
+    MEMBER_PREFIX = 'res|'
+    META = '#meta'
+
+    def __init__(self, table_name):
+        """
+        :param table_name: The DynamoDB table name
+        """
+        self.table_name = table_name
+        self.ddb = boto3.client('dynamodb')
+
+    def _count(self, key, group, delta):
+        return {'Update': {
+            'TableName': self.table_name,
+            'Key': {'CounterKey': {'S': key}, 'Member': {'S': self.COUNT_PREFIX + group}},
+            'UpdateExpression': 'ADD #c :delta',
+            'ExpressionAttributeNames': {'#c': 'Count'},
+            'ExpressionAttributeValues': {':delta': {'N': str(delta)}},
+        }}
+
+    @staticmethod
+    def _conditionFailed(e):
+        # Only a failed membership condition means the event was already applied; conflicts are retried by the caller
+        return e.response['Error']['Code'] == 'TransactionCanceledException' and any(
+            reason.get('Code') == 'ConditionalCheckFailed' for reason in e.response.get('CancellationReasons', []))
+
+    def add(self, key, resourceId, group):
+        try:
+            self.ddb.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': self.table_name,
+                    'Item': {'CounterKey': {'S': key}, 'Member': {'S': self.MEMBER_PREFIX + resourceId}, 'Group': {'S': group}},
+                    'ConditionExpression': 'attribute_not_exists(#m)',
+                    'ExpressionAttributeNames': {'#m': 'Member'},
+                }},
+                self._count(key, group, 1),
+            ])
+            return True
+        except ClientError as e:
+            if self._conditionFailed(e):
+                return False
+            raise
+
+    def remove(self, key, resourceId):
+        item = self.ddb.get_item(TableName=self.table_name, ConsistentRead=True,
+                                 Key={'CounterKey': {'S': key}, 'Member': {'S': self.MEMBER_PREFIX + resourceId}}).get('Item')
+        if not item:
+            return False
+        try:
+            self.ddb.transact_write_items(TransactItems=[
+                {'Delete': {
+                    'TableName': self.table_name,
+                    'Key': {'CounterKey': {'S': key}, 'Member': {'S': self.MEMBER_PREFIX + resourceId}},
+                    'ConditionExpression': 'attribute_exists(#m)',
+                    'ExpressionAttributeNames': {'#m': 'Member'},
+                }},
+                self._count(key, item['Group']['S'], -1),
+            ])
+            return True
+        except ClientError as e:
+            if self._conditionFailed(e):
+                return False
+            raise
+
+    def _items(self, key, prefix=None):
+        kwargs = {'TableName': self.table_name, 'ConsistentRead': True,
+                  'KeyConditionExpression': 'CounterKey = :k',
+                  'ExpressionAttributeValues': {':k': {'S': key}}}
+        if prefix:
+            # Member is a DynamoDB reserved word
+            kwargs['KeyConditionExpression'] += ' AND begins_with(#m, :p)'
+            kwargs['ExpressionAttributeNames'] = {'#m': 'Member'}
+            kwargs['ExpressionAttributeValues'][':p'] = {'S': prefix}
+        for page in self.ddb.get_paginator('query').paginate(**kwargs):
+            yield from page['Items']
+
+    def counts(self, key):
+        reconciledAt = None
+        counts = {}
+        # '#count|' and '#meta' sort before the membership items, so only the counters are read
+        for item in self._items(key, '#'):
+            member = item['Member']['S']
+            if member == self.META:
+                reconciledAt = float(item['ReconciledAt']['N'])
+            elif member.startswith(self.COUNT_PREFIX) and int(item['Count']['N']) > 0:
+                counts[member[len(self.COUNT_PREFIX):]] = int(item['Count']['N'])
+        return reconciledAt, counts
+
+    def replace(self, key, members, reconciledAt):
+        requests = [{'DeleteRequest': {'Key': {'CounterKey': item['CounterKey'], 'Member': item['Member']}}}
+                    for item in self._items(key)]
+        counts = defaultdict(int)
+        for resourceId, group in members.items():
+            counts[group] += 1
+            requests.append({'PutRequest': {'Item': {'CounterKey': {'S': key}, 'Member': {'S': self.MEMBER_PREFIX + resourceId}, 'Group': {'S': group}}}})
+        for group, count in counts.items():
+            requests.append({'PutRequest': {'Item': {'CounterKey': {'S': key}, 'Member': {'S': self.COUNT_PREFIX + group}, 'Count': {'N': str(count)}}}})
+        requests.append({'PutRequest': {'Item': {'CounterKey': {'S': key}, 'Member': {'S': self.META}, 'ReconciledAt': {'N': str(reconciledAt)}}}})
+        # Deletes of items that are written again are dropped, a batch may not touch a key twice
+        written = {request['PutRequest']['Item']['Member']['S'] for request in requests if 'PutRequest' in request}
+        requests = [request for request in requests if 'DeleteRequest' not in request or request['DeleteRequest']['Key']['Member']['S'] not in written]
+        for i in range(0, len(requests), 25):
+            pending = {self.table_name: requests[i:i + 25]}
+            while pending:
+                pending = self.ddb.batch_write_item(RequestItems=pending).get('UnprocessedItems') or None
+
+
+def applyEvent(event, store):
+    """
+    Apply a CloudTrail event delivered by EventBridge (or replayed from a recording) to the counters
+    :param event: The EventBridge event, or its detail
+    :param store: The counter store
+    :return: The number of counter changes
+    """
+    detail = event.get('detail', event)
+    if detail.get('errorCode'):
+        return 0
+    eventName = detail.get('eventName')
+    region = detail.get('awsRegion')
+    changes = 0
+    for spec in SPECS:
+        if spec.eventSource != detail.get('eventSource'):
+            continue
+        key = counterKey(spec.quotaCode, spec.counterRegion(region))
+        if eventName in spec.createEvents and (spec.where is None or spec.where(detail)):
+            resourceIds = spec.created(detail)
+            group = spec.groupOf(detail, region) if spec.groupOf and resourceIds else NO_GROUP
+            for resourceId in resourceIds:
+                changes += store.add(key, resourceId, group)
+        elif eventName in spec.deleteEvents:
+            for resourceId in spec.deleted(detail):
+                changes += store.remove(key, resourceId)
+    if changes:
+        logger.info(f"{eventName} in {region}: {changes} counter changes")
+    return changes
+
+
+def replay(path, store):
+    """
+    Local stand-in for the EventBridge source: apply recorded events in order
+    :param path: A JSON file holding a list of events, or one event per line
+    :param store: The counter store
+    :return: The set of counter keys (quotaCode, region) touched by the events
+    """
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    events = json.loads(content) if content.startswith('[') else [json.loads(line) for line in content.splitlines() if line.strip()]
+    touched = set()
+    for event in events:
+        detail = event.get('detail', event)
+        applyEvent(event, store)
+        for spec in SPECS:
+            if spec.eventSource == detail.get('eventSource') and detail.get('eventName') in spec.createEvents + spec.deleteEvents:
+                touched.add((spec.quotaCode, spec.counterRegion(detail.get('awsRegion'))))
+    logger.info(f"Replayed {len(events)} events from {path}")
+    return touched
+
+
+def reconcile(quotaCode, region, store, now=None):
+    """
+    Rebuild a counter with a full scan
+    :param region: The region checked (the counter of a global quota is shared)
+    :return: Dict of group to count
+    """
+    spec = SPECS_BY_CODE[quotaCode]
+    members = spec.scan(spec, region)
+    store.replace(counterKey(quotaCode, spec.counterRegion(region)), members, now or time.time())
+    counts = defaultdict(int)
+    for group in members.values():
+        counts[group] += 1
+    logger.info(f"Reconciled {spec.description or quotaCode} in {region}: {len(members)} resources")
+    return dict(counts)
+
+
+def usageOf(spec, counts):
+    """
+    Usage value reported for a counter: the total, or the largest group for grouped counters
+    """
+    if spec.groupOf is None:
+        return sum(counts.values())
+    return max(counts.values(), default=0)
+
+
+class CounterEvaluator:
+    """
+    Evaluates quotas from their counters when the events of the region reach this function
+    """
+
+    def __init__(self, store, eventRegions, reconcileMinutes=RECONCILE_INTERVAL_MINUTES):
+        """
+        :param store: The counter store
+        :param eventRegions: Regions whose CloudTrail events are delivered to this function
+        :param reconcileMinutes: Age after which a counter is rebuilt with a full scan
+        """
+        self.store = store
+        self.eventRegions = set(eventRegions)
+        self.reconcileMinutes = reconcileMinutes
+
+    def handles(self, quotaCode, region):
+        spec = SPECS_BY_CODE.get(quotaCode)
+        return spec is not None and spec.eventRegion(region) in self.eventRegions
+
+    def evaluate(self, serviceCode, quotaCode, threshold, region, updateQuotaUsage, now=None):
+        """
+        Report a quota from its counter, reconciling it first when it is too old
+        :return: True when the quota was reported, False to fall back to the quota function
+        """
+        if not self.handles(quotaCode, region):
+            return False
+        spec = SPECS_BY_CODE[quotaCode]
+        now = now or time.time()
+        try:
+            reconciledAt, counts = self.store.counts(counterKey(quotaCode, spec.counterRegion(region)))
+            if reconciledAt is None or now - reconciledAt > self.reconcileMinutes * 60:
+                counts = reconcile(quotaCode, region, self.store, now)
+            sq = boto3.client('service-quotas') if spec.scope == quota_specs.GLOBAL else boto3.client('service-quotas', region_name=region)
+            serviceQuotaValue = quota_specs.getServiceQuotaValue(sq, serviceCode, quotaCode)
+        except Exception as e:
+            logger.error(f"Error reading the counter of {quotaCode} in {region}, running a full check: {e}")
+            return False
+
+        usageValue = usageOf(spec, counts)
+        logger.info(f"{spec.description or quotaCode} in {region} (incremental): {usageValue} out of {serviceQuotaValue}")
+        if spec.groupOf is None:
+            resourceListCrossingThreshold = ""
+            sendQuotaThresholdEvent = quota_stream.isOverThreshold(usageValue, serviceQuotaValue, threshold)
+        else:
+            perGroup = quota_stream.MaxReducer(None, None, serviceQuotaValue, threshold)
+            for group, count in counts.items():
+                perGroup.observe(group, count)
+            resourceListCrossingThreshold = perGroup.resourceList()
+            sendQuotaThresholdEvent = bool(perGroup.resourceListCrossingThreshold)
+        updateQuotaUsage(region, quotaCode, serviceCode, str(serviceQuotaValue), str(usageValue), resourceListCrossingThreshold, sendQuotaThresholdEvent)
+        return True
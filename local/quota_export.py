@@ -0,0 +1,361 @@
+import argparse
+import csv
+import os
+import boto3
+import logging
+import sqlite3
+import sys
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+import quota_sqlite
+import quota_update_csv
+import rate_limiter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Concurrent (service, region) exports
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '16'))
+# Window searched for the latest datapoint of a quota's CloudWatch usage metric
+USAGE_METRIC_WINDOW_MINUTES = int(os.environ.get('USAGE_METRIC_WINDOW_MINUTES', '15'))
+# Queries per GetMetricData call
+METRIC_QUERIES_PER_CALL = 500
+# Rows per Parquet row group
+PARQUET_BATCH_ROWS = 10000
+# Service code of a failed region, whose services could not be listed
+ALL_SERVICES = 'all services'
+
+PARQUET_SCHEMA = pyarrow.schema([
+    ('accountId', pyarrow.string()), ('region', pyarrow.string()), ('serviceCode', pyarrow.string()),
+    ('quotaCode', pyarrow.string()), ('quotaName', pyarrow.string()), ('quotaValue', pyarrow.float64()),
+    ('defaultValue', pyarrow.float64()), ('adjustable', pyarrow.bool_()), ('usageValue', pyarrow.float64()),
+    ('usagePct', pyarrow.float64()),
+]) if pyarrow is not None else None
+
+
+class RegionClients:
+    """
+    One Service Quotas and one CloudWatch client per region, shared by all export threads. The clients
+    are created after the rate limiter is installed, so concurrent exports back off together on throttling.
+    """
+
+    def __init__(self, regions, workers=EXPORT_WORKERS):
+        rate_limiter.install()
+        config = Config(max_pool_connections=max(workers, 10))
+        self.serviceQuotas = {region: boto3.client('service-quotas', region_name=region, config=config) for region in regions}
+        self.cloudwatch = {region: boto3.client('cloudwatch', region_name=region, config=config) for region in regions}
+
+
+def listServices(client):
+    """
+    :param client: A Service Quotas client
+    :return: The service codes of the client's region
+    """
+    return [service['ServiceCode'] for page in client.get_paginator('list_services').paginate() for service in page['Services']]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def metricUsages(cloudwatch, quotas):
+    """
+    Latest datapoint of the CloudWatch usage metric of every quota that has one, in batched GetMetricData calls
+    :param cloudwatch: The CloudWatch client of the quotas' region
+    :param quotas: Quotas of list_service_quotas
+    :return: Dict of quota code to usage
+    """
+    queries = {}
+    for quota in quotas:
+        metric = quota.get('UsageMetric') or {}
+        if not metric.get('MetricNamespace') or not metric.get('MetricName'):
+            continue
+        queries[f"q{len(queries)}"] = (quota['QuotaCode'], {
+            'Metric': {
+                'Namespace': metric['MetricNamespace'],
+                'MetricName': metric['MetricName'],
+                'Dimensions': [{'Name': name, 'Value': value} for name, value in (metric.get('MetricDimensions') or {}).items()],
+            },
+            'Period': 300,
+            'Stat': metric.get('MetricStatisticRecommendation') or 'Maximum',
+        })
+    usages = {}
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(minutes=USAGE_METRIC_WINDOW_MINUTES)
+    ids = list(queries)
+    for i in range(0, len(ids), METRIC_QUERIES_PER_CALL):
+        batch = [{'Id': queryId, 'MetricStat': queries[queryId][1], 'ReturnData': True} for queryId in ids[i:i + METRIC_QUERIES_PER_CALL]]
+        for page in cloudwatch.get_paginator('get_metric_data').paginate(
+                MetricDataQueries=batch, StartTime=start, EndTime=end, ScanBy='TimestampDescending'):
+            for result in page['MetricDataResults']:
+                if result['Values'] and queries[result['Id']][0] not in usages:
+                    usages[queries[result['Id']][0]] = result['Values'][0]
+    return usages
+
+
+def exportQuotas(clients, accountId, region, serviceCode, usage, metrics=True):
+    """
+    Export the quotas of one service in one region
+    :param clients: The RegionClients
+    :param accountId: The account written with every row
+    :param usage: The UsageIndex joined to the quotas
+    :param metrics: Read the usage of quotas with a CloudWatch usage metric
+    :return: List of rows (accountId, region, serviceCode, quotaCode, quotaName, quotaValue, defaultValue,
+        adjustable, usageValue, usagePct)
+    """
+    client = clients.serviceQuotas[region]
+    quotas = [quota for page in client.get_paginator('list_service_quotas').paginate(ServiceCode=serviceCode)
+              for quota in page['Quotas']]
+    if not quotas:
+        return []
+    try:
+        defaults = {quota['QuotaCode']: quota.get('Value') for page in
+                    client.get_paginator('list_aws_default_service_quotas').paginate(ServiceCode=serviceCode)
+                    for quota in page['Quotas']}
+    except ClientError as e:
+        logger.warning(f"Unable to list the default quotas of {serviceCode} in {region}: {e}")
+        defaults = {}
+    metricUsage = {}
+    if metrics:
+        try:
+            metricUsage = metricUsages(clients.cloudwatch[region], quotas)
+        except ClientError as e:
+            logger.warning(f"Unable to read the usage metrics of {serviceCode} in {region}: {e}")
+    rows = []
+    for quota in quotas:
+        value = _number(quota.get('Value'))
+        # Usage collected by app.py takes precedence over the CloudWatch metric
+        usageValue = usage.lookup(accountId, region, serviceCode, quota['QuotaCode'])
+        if usageValue is None:
+            usageValue = metricUsage.get(quota['QuotaCode'])
+        usagePct = round(usageValue / value * 100, 2) if usageValue is not None and value else None
+        rows.append((accountId, region, serviceCode, quota['QuotaCode'], quota.get('QuotaName', ''), value,
+                     _number(defaults.get(quota['QuotaCode'], quota.get('Value'))), bool(quota.get('Adjustable')),
+                     usageValue, usagePct))
+    return rows
+
+
+class UsageIndex:
+    """
+    Quota usages collected by app.py, loaded into memory and keyed by (account, region, service, quota)
+    """
+
+    def __init__(self):
+        self.usages = {}
+
+    def load(self, path):
+        """
+        :param path: The SQLite database of the sqlite sink (.db), or a CSV of the csv sink or of a multi-account scan
+        :return: Number of usages loaded
+        """
+        before = len(self.usages)
+        if path.endswith('.db'):
+            connection = sqlite3.connect(path)
+            try:
+                for accountId, region, serviceCode, quotaCode, usageValue in connection.execute(
+                        'SELECT account_id, region, service_code, quota_code, usage_value FROM latest'):
+                    self.usages[(accountId, region, serviceCode, quotaCode)] = usageValue
+            finally:
+                connection.close()
+        else:
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    usageValue = _number(row.get('UsageValue'))
+                    if usageValue is not None:
+                        self.usages[(row.get('AccountId', ''), row['Region'], row['ServiceCode'], row['QuotaCode'])] = usageValue
+        logger.info(f"Loaded {len(self.usages) - before} quota usages from {path}")
+        return len(self.usages) - before
+
+    def lookup(self, accountId, region, serviceCode, quotaCode):
+        """
+        :return: The usage of the quota, or None. Usages collected without an account match any account.
+        """
+        usageValue = self.usages.get((accountId, region, serviceCode, quotaCode))
+        if usageValue is None:
+            usageValue = self.usages.get(('', region, serviceCode, quotaCode))
+        return usageValue
+
+
+def _csvValue(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else str(value)
+    return value
+
+
+class CsvRowWriter:
+    """
+    Streams the rows to a CSV file with the columns of quota_sqlite.EXPORT_HEADERS
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file, quoting=csv.QUOTE_ALL)
+        self.writer.writerow(quota_sqlite.EXPORT_HEADERS)
+
+    def write(self, rows):
+        for row in rows:
+            values = [_csvValue(value) for value in row]
+            values[9] = f"{row[9]:.2f}" if row[9] is not None else ''
+            self.writer.writerow(values)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetRowWriter:
+    """
+    Streams the rows to a Parquet file, one row group per PARQUET_BATCH_ROWS rows
+    """
+
+    def __init__(self, path):
+        if pyarrow is None:
+            raise ValueError('Parquet output requires pyarrow (pip install pyarrow)')
+        self.writer = pyarrow.parquet.ParquetWriter(path, PARQUET_SCHEMA)
+        self.pending = []
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) >= PARQUET_BATCH_ROWS:
+            self._writeBatch()
+
+    def _writeBatch(self):
+        if self.pending:
+            columns = list(zip(*self.pending))
+            self.writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, PARQUET_SCHEMA)], schema=PARQUET_SCHEMA))
+            self.pending = []
+
+    def close(self):
+        self._writeBatch()
+        self.writer.close()
+
+
+def export(clients, accountId, regions, services, usage, writer, metrics=True, workers=EXPORT_WORKERS):
+    """
+    Export every (service, region) concurrently, writing the rows of each as soon as it completes
+    :param clients: The RegionClients
+    :param accountId: The account written with every row
+    :param regions: The regions
+    :param services: The service codes, None exports every service of each region
+    :param usage: The UsageIndex joined to the quotas
+    :param writer: A CsvRowWriter or ParquetRowWriter
+    :return: (rows written, rows with a usage, list of the (service, region) that failed, the service being
+        ALL_SERVICES when the services of the region could not be listed)
+    """
+    total = withUsage = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if services is None:
+            regionServices = {}
+            listings = {pool.submit(listServices, clients.serviceQuotas[region]): region for region in regions}
+            for future in as_completed(listings):
+                region = listings[future]
+                try:
+                    regionServices[region] = future.result()
+                except Exception as e:
+                    # Opt-in region not enabled, access denied: the other regions still export
+                    logger.error(f"Failed to list the services in {region}: {e}")
+                    failed.append((ALL_SERVICES, region))
+        else:
+            regionServices = {region: services for region in regions}
+        futures = {pool.submit(exportQuotas, clients, accountId, region, serviceCode, usage, metrics): (serviceCode, region)
+                   for region, serviceCodes in regionServices.items() for serviceCode in serviceCodes}
+        logger.info(f"Exporting {len(futures)} (service, region) pairs with {workers} workers")
+        for future in as_completed(futures):
+            serviceCode, region = futures[future]
+            try:
+                rows = future.result()
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'NoSuchResourceException':
+                    logger.info(f"No quotas for {serviceCode} in {region}")
+                    continue
+                logger.error(f"Failed to export the quotas of {serviceCode} in {region}: {e}")
+                failed.append((serviceCode, region))
+                continue
+            except Exception as e:
+                logger.error(f"Failed to export the quotas of {serviceCode} in {region}: {e}")
+                failed.append((serviceCode, region))
+                continue
+            writer.write(rows)
+            total += len(rows)
+            withUsage += sum(1 for row in rows if row[8] is not None)
+    return total, withUsage, failed
+
+
+if __name__ == "__main__":
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description='Export the Service Quotas of the account, joined with the collected usage')
+    parser.add_argument('--services',
+                        help='Comma-separated service codes, e.g. ec2,vpc,s3 (default: every service)')
+    parser.add_argument('--regions',
+                        help='Comma-separated regions (default: REGION_LIST env var, else AWS_REGION or us-east-1)')
+    parser.add_argument('--usage', action='append',
+                        help='Usage joined to the quotas: a database of the sqlite sink (.db) or a CSV of app.py, repeatable '
+                             '(default: whichever of QUOTA_CSV_PATH, QUOTA_ACCOUNTS_CSV_PATH and QUOTA_SQLITE_PATH exist)')
+    parser.add_argument('--no-metrics', dest='metrics', action='store_false',
+                        help='Do not read the CloudWatch usage metrics of the quotas')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='Output format (default: csv; parquet requires pyarrow)')
+    parser.add_argument('--output',
+                        help='Output file (default: service_quotas_<timestamp>.<format>)')
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS,
+                        help='Concurrent (service, region) exports (default: EXPORT_WORKERS env var or 16)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pyarrow is None:
+        parser.error('--format parquet requires pyarrow (pip install pyarrow)')
+    regionList = args.regions or os.environ.get('REGION_LIST', '') or os.environ.get('AWS_REGION', 'us-east-1')
+    regions = [region.strip() for region in regionList.split(',') if region.strip()]
+    services = [service.strip() for service in args.services.split(',') if service.strip()] if args.services else None
+
+    try:
+        accountId = boto3.client('sts').get_caller_identity()['Account']
+    except Exception as e:
+        parser.error(f"Unable to retrieve the AWS account id, check your credentials: {e}")
+
+    usage = UsageIndex()
+    usagePaths = args.usage if args.usage is not None else [
+        path for path in (quota_update_csv.quota_csv_path, quota_update_csv.quota_accounts_csv_path, quota_sqlite.QUOTA_SQLITE_PATH)
+        if os.path.exists(path)]
+    for path in usagePaths:
+        usage.load(path)
+
+    output = args.output or f"service_quotas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{args.format}"
+    writer = CsvRowWriter(output) if args.format == 'csv' else ParquetRowWriter(output)
+    try:
+        total, withUsage, failed = export(RegionClients(regions, args.workers), accountId, regions, services, usage, writer,
+                                          args.metrics, args.workers)
+    finally:
+        writer.close()
+    print(f"Exported {total} quotas ({withUsage} with usage) of account {accountId} in {', '.join(regions)} to {output}")
+    if failed:
+        print(f"Failed: {', '.join(f'{serviceCode} in {region}' for serviceCode, region in failed)}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,215 @@
+import json
+import os
+import boto3
+import logging
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# How long history items are kept before DynamoDB TTL (or the SQLite pruning) removes them
+HISTORY_TTL_DAYS = float(os.environ.get('HISTORY_TTL_DAYS', '30'))
+# Window of recent observations used to fit the usage trend
+FORECAST_WINDOW_HOURS = float(os.environ.get('FORECAST_WINDOW_HOURS', '24'))
+# Alert when the quota is forecast to be exhausted within this many hours
+FORECAST_HORIZON_HOURS = float(os.environ.get('FORECAST_HORIZON_HOURS', '72'))
+# Minimum number of observations needed before a forecast is trusted
+FORECAST_MIN_POINTS = int(os.environ.get('FORECAST_MIN_POINTS', '3'))
+
+
+def fitTrend(timestamps, values):
+    """
+    Fit a least-squares line through observations
+    :param timestamps: Observation times in epoch seconds, oldest first
+    :param values: Values matching the timestamps
+    :return: (slope per hour, fitted value at the latest observation), or None when the observations span no time
+    """
+    if len(timestamps) < 2 or min(timestamps) == max(timestamps):
+        return None
+
+    if numpy is not None:
+        hours = (numpy.asarray(timestamps, dtype=float) - timestamps[-1]) / 3600.0
+        design = numpy.vstack([hours, numpy.ones(len(hours))]).T
+        (slope, intercept), *_ = numpy.linalg.lstsq(design, numpy.asarray(values, dtype=float), rcond=None)
+        return float(slope), float(intercept)
+
+    hours = [(ts - timestamps[-1]) / 3600.0 for ts in timestamps]
+    n = len(hours)
+    mean_x = sum(hours) / n
+    mean_y = sum(values) / n
+    sxx = sum((x - mean_x) ** 2 for x in hours)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(hours, values)) / sxx
+    # Fitted value at the latest observation (hours == 0)
+    return slope, mean_y - slope * mean_x
+
+
+def forecastTimeToExhaustion(timestamps, usages, limit):
+    """
+    Fit a least-squares line through recent usage and extrapolate to the limit
+    :param timestamps: Observation times in epoch seconds, oldest first
+    :param usages: Usage values matching the timestamps
+    :param limit: The quota limit
+    :return: Dict with GrowthPerHour and HoursToExhaustion (None when usage is not growing), or None without enough data
+    """
+    if len(timestamps) < FORECAST_MIN_POINTS or limit <= 0:
+        return None
+    trend = fitTrend(timestamps, usages)
+    if trend is None:
+        return None
+    slope, current = trend
+
+    hoursToExhaustion = None
+    if slope > 0:
+        hoursToExhaustion = max(0.0, (limit - current) / slope)
+    return {
+        'GrowthPerHour': slope,
+        'HoursToExhaustion': hoursToExhaustion,
+    }
+
+
+def isForecastBreach(forecast):
+    """
+    Check whether a forecast predicts exhaustion inside the alerting horizon
+    :param forecast: The result of forecastTimeToExhaustion
+    :return: True on forecast breach
+    """
+    return bool(forecast) and forecast['HoursToExhaustion'] is not None and forecast['HoursToExhaustion'] <= FORECAST_HORIZON_HOURS
+
+
+class DynamoHistoryStore:
+    """
+    Append-only usage history in a DynamoDB table keyed by (QuotaKey, Timestamp) with TTL expiry
+    """
+
+    def __init__(self, table_name):
+        """
+        :param table_name: The DynamoDB history table name
+        """
+        self.table_name = table_name
+        self.ddb = boto3.client('dynamodb')
+
+    def append(self, region, quotaCode, serviceCode, serviceQuotaValue, usageValue, timestamp):
+        """
+        Append one observation
+        :return: None
+        """
+        self.ddb.put_item(
+            Item={
+                'QuotaKey': {'S': f"{quotaCode}#{region}"},
+                'Timestamp': {'N': str(timestamp)},
+                'ServiceCode': {'S': serviceCode},
+                'LimitValue': {'N': str(serviceQuotaValue)},
+                'UsageValue': {'N': str(usageValue)},
+                'ExpiresAt': {'N': str(int(timestamp + HISTORY_TTL_DAYS * 86400))},
+            },
+            TableName=self.table_name
+        )
+
+    def recent(self, region, quotaCode, since):
+        """
+        Fetch observations newer than a point in time
+        :return: List of (timestamp, usage) tuples, oldest first
+        """
+        observations = []
+        paginator = self.ddb.get_paginator('query')
+        for page in paginator.paginate(
+            TableName=self.table_name,
+            KeyConditionExpression='QuotaKey = :key AND #ts >= :since',
+            ExpressionAttributeNames={'#ts': 'Timestamp'},
+            ExpressionAttributeValues={
+                ':key': {'S': f"{quotaCode}#{region}"},
+                ':since': {'N': str(since)},
+            },
+            ProjectionExpression='#ts, UsageValue',
+        ):
+            for item in page['Items']:
+                observations.append((float(item['Timestamp']['N']), float(item['UsageValue']['N'])))
+        return observations
+
+
+class SqliteHistoryStore:
+    """
+    Append-only usage history in a local SQLite file (used by the local runner)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path to the SQLite database
+        """
+        self.path = path
+        # Written by the sink writer thread, read by the adaptive scheduler
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS usage_history ('
+            'quota_code TEXT NOT NULL, region TEXT NOT NULL, service_code TEXT, '
+            'ts REAL NOT NULL, limit_value REAL, usage_value REAL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS usage_history_key ON usage_history (quota_code, region, ts)'
+        )
+        self.connection.execute('DELETE FROM usage_history WHERE ts < ?', (time.time() - HISTORY_TTL_DAYS * 86400,))
+        self.connection.commit()
+
+    def append(self, region, quotaCode, serviceCode, serviceQuotaValue, usageValue, timestamp):
+        """
+        Append one observation
+        :return: None
+        """
+        self.connection.execute(
+            'INSERT INTO usage_history VALUES (?, ?, ?, ?, ?, ?)',
+            (quotaCode, region, serviceCode, timestamp, float(serviceQuotaValue), float(usageValue))
+        )
+        self.connection.commit()
+
+    def recent(self, region, quotaCode, since):
+        """
+        Fetch observations newer than a point in time
+        :return: List of (timestamp, usage) tuples, oldest first
+        """
+        return self.connection.execute(
+            'SELECT ts, usage_value FROM usage_history WHERE quota_code = ? AND region = ? AND ts >= ? ORDER BY ts',
+            (quotaCode, region, since)
+        ).fetchall()
+
+
+def appendAndForecast(store, region, quotaCode, serviceCode, serviceQuotaValue, usageValue, now=None):
+    """
+    Append the latest observation to the history and forecast time-to-exhaustion from the recent window
+    :param store: A DynamoHistoryStore or SqliteHistoryStore
+    :return: The forecast dict, or None when it cannot be computed
+    """
+    now = time.time() if now is None else now
+    try:
+        limit = float(serviceQuotaValue)
+        usage = float(usageValue)
+    except (TypeError, ValueError):
+        logger.warning(f"Not recording history for {quotaCode} in {region}: non numeric usage {usageValue} / {serviceQuotaValue}")
+        return None
+    try:
+        store.append(region, quotaCode, serviceCode, limit, usage, now)
+        observations = store.recent(region, quotaCode, now - FORECAST_WINDOW_HOURS * 3600)
+    except Exception as e:
+        logger.error(f"Error accessing usage history for {quotaCode} in {region}: {e}")
+        return None
+    forecast = forecastTimeToExhaustion([ts for ts, _ in observations], [value for _, value in observations], limit)
+    if forecast and forecast['HoursToExhaustion'] is not None:
+        logger.info(f"Forecast for {quotaCode} in {region}: exhausted in {forecast['HoursToExhaustion']:.1f} hours")
+    return forecast
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import time
+import boto3
+import logging
+import sys
+import threading
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Every user is recomputed at least this often
+FULL_SCAN_INTERVAL_MINUTES = float(os.environ.get('IAM_FULL_SCAN_MINUTES', '360'))
+
+# Per-user quotas whose count only changes with the digest (groups, attached policies, tags). Access keys,
+# MFA devices, SSH keys and signing certificates are not part of the authorization details, so their
+# quotas are swept for every user on every run.
+DIGEST_COVERED_CODES = {'L-7A1621EC', 'L-4019AD8B', 'L-FC9EC213'}
+
+# Attempts of a batch with unprocessed items, backing off exponentially between them
+MAX_WRITE_ATTEMPTS = 8
+
+# Store enabling the incremental mode, None recomputes every user on every run
+_store = None
+
+
+def configure(store):
+    """
+    Enable or disable the incremental IAM mode
+    :param store: A JsonFileDigestStore or DynamoDigestStore, None disables the mode
+    :return: None
+    """
+    global _store
+    _store = store
+
+
+def activeStore():
+    """
+    :return: The configured digest store, None when the incremental mode is disabled
+    """
+    return _store
+
+
+def userDigest(user):
+    """
+    Digest of a user's entry in the authorization details: its groups, attached and inline policies,
+    tags and permissions boundary. The user's counts are recomputed when it changes.
+    :param user: An entry of the UserDetailList of get_account_authorization_details
+    :return: Hex digest
+    """
+    marker = {
+        'UserId': user.get('UserId'),
+        'Groups': sorted(user.get('GroupList', [])),
+        'AttachedPolicies': sorted(policy['PolicyArn'] for policy in user.get('AttachedManagedPolicies', [])),
+        'InlinePolicies': sorted(policy['PolicyName'] for policy in user.get('UserPolicyList', [])),
+        'Tags': sorted([tag['Key'], tag['Value']] for tag in user.get('Tags', [])),
+        'PermissionsBoundary': user.get('PermissionsBoundary', {}).get('PermissionsBoundaryArn'),
+    }
+    return hashlib.sha256(json.dumps(marker, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def staleUsers(digests, cached, fullScanAt, quotaCodes, now=None):
+    """
+    Decide which users are recomputed
+    :param digests: Dict of user Arn to its current digest
+    :param cached: Dict of user Arn to {'Digest', 'Counts'} from the store
+    :param fullScanAt: Epoch of the last full scan, None when there was none
+    :param quotaCodes: The per-user quotas of the run
+    :return: (whether this is a full scan, list of the Arns of the users to recompute)
+    """
+    now = now or time.time()
+    if fullScanAt is None or now - fullScanAt >= FULL_SCAN_INTERVAL_MINUTES * 60:
+        return True, list(digests)
+    stale = []
+    for arn, digest in digests.items():
+        entry = cached.get(arn)
+        if entry is None or entry['Digest'] != digest or not set(quotaCodes) <= set(entry['Counts']):
+            stale.append(arn)
+    return False, stale
+
+
+class JsonFileDigestStore:
+    """
+    User digests and counts kept in memory and optionally in a local JSON file (used by app.py)
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: The JSON file, None keeps the digests in memory only
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {'FullScanAt': None, 'Principals': {}}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading IAM digests from {path}, starting empty: {e}")
+
+    def load(self):
+        """
+        :return: (epoch of the last full scan or None, dict of user Arn to {'Digest', 'Counts'})
+        """
+        with self.lock:
+            return self.state['FullScanAt'], {arn: {'Digest': entry['Digest'], 'Counts': dict(entry['Counts'])}
+                                              for arn, entry in self.state['Principals'].items()}
+
+    def save(self, principals, removed, fullScanAt):
+        """
+        :param principals: Dict of user Arn to {'Digest', 'Counts'} of the recomputed users
+        :param removed: Arns of the users that no longer exist
+        :param fullScanAt: Epoch of the last full scan
+        :return: None
+        """
+        with self.lock:
+            for arn in removed:
+                self.state['Principals'].pop(arn, None)
+            self.state['Principals'].update(principals)
+            self.state['FullScanAt'] = fullScanAt
+            if self.path:
+                with open(self.path, 'w') as f:
+                    json.dump(self.state, f, indent=2)
+
+
+class DynamoDigestStore:
+    """
+    User digests and counts kept in a DynamoDB table keyed by Principal (used by the Lambda). One small
+    item per user, so a run only writes the users that changed.
+    """
+
+    META = '#meta'
+
+    def __init__(self, table_name):
+        """
+        :param table_name: The DynamoDB table name
+        """
+        self.table_name = table_name
+        self.ddb = boto3.client('dynamodb')
+
+    def load(self):
+        fullScanAt = None
+        principals = {}
+        for page in self.ddb.get_paginator('scan').paginate(TableName=self.table_name, ConsistentRead=True):
+            for item in page['Items']:
+                if item['Principal']['S'] == self.META:
+                    fullScanAt = float(item['FullScanAt']['N'])
+                    continue
+                principals[item['Principal']['S']] = {
+                    'Digest': item['Digest']['S'],
+                    'Counts': {code: int(count['N']) for code, count in item['Counts']['M'].items()},
+                }
+        return fullScanAt, principals
+
+    def save(self, principals, removed, fullScanAt):
+        requests = [{'DeleteRequest': {'Key': {'Principal': {'S': arn}}}} for arn in removed]
+        for arn, entry in principals.items():
+            requests.append({'PutRequest': {'Item': {
+                'Principal': {'S': arn},
+                'Digest': {'S': entry['Digest']},
+                'Counts': {'M': {code: {'N': str(count)} for code, count in entry['Counts'].items()}},
+            }}})
+        requests.append({'PutRequest': {'Item': {'Principal': {'S': self.META}, 'FullScanAt': {'N': str(fullScanAt)}}}})
+        for i in range(0, len(requests), 25):
+            pending = {self.table_name: requests[i:i + 25]}
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                pending = self.ddb.batch_write_item(RequestItems=pending).get('UnprocessedItems') or None
+                if not pending:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 5))
+            else:
+                raise RuntimeError(f"{len(pending[self.table_name])} IAM digest items still unprocessed after {MAX_WRITE_ATTEMPTS} attempts")
@@ -0,0 +1,320 @@
+import copy
+import json
+import os
+import boto3
+import logging
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from botocore import xform_name
+import quota_specs
+import quota_collectors
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Manifest of the "service:operation" APIs each quota function reads; "service:snapshot" entries
+# are the run scoped snapshots of quota_collectors
+MANIFEST_PATH = os.environ.get('QUOTA_DEPENDENCIES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quota_dependencies.json'))
+
+# Operations called with quota specific parameters (e.g. a different metric per quota), never shared
+QUOTA_SPECIFIC_OPERATIONS = {'cloudwatch:get_metric_statistics'}
+
+# Only responses of read operations are cached
+CACHEABLE_PREFIXES = ('describe_', 'list_', 'get_', 'search_')
+
+FETCH = 'fetch'
+EVALUATE = 'evaluate'
+RELEASE = 'release'
+
+
+@dataclass
+class Check:
+    """
+    One quota check to run in one region
+    """
+    serviceCode: str
+    quotaCode: str
+    threshold: str
+    region: str
+
+    @property
+    def functionName(self):
+        return self.quotaCode.replace('-', '_')
+
+
+@dataclass
+class Stage:
+    """
+    A node of the execution plan. Fetch stages start caching an API shared by several
+    evaluations (the first evaluation fills the cache), evaluation stages run one or more
+    checks and release stages drop the cached responses after the last consumer ran.
+    """
+    kind: str
+    region: str
+    api: str = None
+    checks: list = field(default_factory=list)
+    dependsOn: tuple = ()
+
+
+@dataclass
+class Plan:
+    """
+    Ordered stages of all regions, with the estimated API calls with and without sharing
+    """
+    stages: list
+    unplannedCalls: int = 0
+    plannedCalls: int = 0
+    quotaLookups: int = 0
+    peakCached: dict = field(default_factory=dict)
+
+    def describe(self):
+        """
+        Render the plan for the --plan dry-run
+        :return: A printable string
+        """
+        lines = []
+        region = None
+        for stage in self.stages:
+            if stage.region != region:
+                region = stage.region
+                lines.append(f"Region {region} (peak {self.peakCached.get(region, 0)} cached APIs)")
+            if stage.kind == EVALUATE:
+                codes = ', '.join(check.quotaCode for check in stage.checks)
+                needs = f" <- {', '.join(stage.dependsOn)}" if stage.dependsOn else ""
+                lines.append(f"  evaluate {codes}{needs}")
+            else:
+                lines.append(f"  {stage.kind} {stage.api}")
+        lines.append(f"Estimated API calls (one per paginated operation): {self.plannedCalls} planned, "
+                     f"{self.unplannedCalls} in config order, plus {self.quotaLookups} quota value lookups")
+        return '\n'.join(lines)
+
+
+def loadManifest(path=MANIFEST_PATH):
+    """
+    Load the per-quota dependency manifest
+    :param path: The path to the manifest JSON
+    :return: Dict of quota code to a list of "service:operation"
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading quota dependencies from {path}, planning without sharing: {e}")
+        return {}
+
+
+def dependencies(quotaCode, manifest):
+    """
+    APIs a quota reads, taken from its spec when it has one
+    :return: List of "service:operation"
+    """
+    if quota_specs.covers(quotaCode):
+        source = quota_specs.SPECS_BY_CODE[quotaCode].source
+        return [f"{source.service}:{source.operation}"]
+    return manifest.get(quotaCode, [])
+
+
+def _units(checks, manifest):
+    """
+    Turn the checks of a region into evaluation units; spec covered checks sharing a source become one unit
+    :return: List of (checks, shared APIs, quota specific API count)
+    """
+    units = []
+    specUnits = {}
+    for check in checks:
+        deps = dependencies(check.quotaCode, manifest)
+        shared = tuple(api for api in deps if api not in QUOTA_SPECIFIC_OPERATIONS)
+        private = len(deps) - len(shared)
+        if quota_specs.covers(check.quotaCode):
+            key = quota_specs.SPECS_BY_CODE[check.quotaCode].source.key()
+            if key in specUnits:
+                specUnits[key][0].append(check)
+                continue
+            specUnits[key] = ([check], shared, private)
+            units.append(specUnits[key])
+        else:
+            units.append(([check], shared, private))
+    return units
+
+
+def buildPlan(checks, manifest):
+    """
+    Order the checks of every region so evaluations sharing an API run back to back
+    :param checks: List of Check in config order
+    :param manifest: The dependency manifest
+    :return: A Plan
+    """
+    byRegion = OrderedDict()
+    for check in checks:
+        byRegion.setdefault(check.region, []).append(check)
+
+    plan = Plan(stages=[], quotaLookups=len(checks))
+    for region, regionChecks in byRegion.items():
+        units = _units(regionChecks, manifest)
+        consumers = defaultdict(int)
+        for _, shared, _ in units:
+            for api in set(shared):
+                consumers[api] += 1
+        plan.unplannedCalls += sum(len(dependencies(check.quotaCode, manifest)) for check in regionChecks)
+        plan.plannedCalls += len(consumers) + sum(private for _, _, private in units)
+
+        live = set()
+        pending = list(enumerate(units))
+        peak = 0
+        while pending:
+            # Prefer units reading what is already cached, then those opening the most shared API
+            def score(entry):
+                index, (_, shared, _) = entry
+                deps = set(shared)
+                return (len(deps & live), max((consumers[api] for api in deps), default=0), -len(deps - live), -index)
+            entry = max(pending, key=score)
+            pending.remove(entry)
+            unitChecks, shared, _ = entry[1]
+            for api in shared:
+                if api not in live and consumers[api] > 1:
+                    live.add(api)
+                    plan.stages.append(Stage(FETCH, region, api=api))
+            peak = max(peak, len(live))
+            plan.stages.append(Stage(EVALUATE, region, checks=unitChecks, dependsOn=tuple(shared)))
+            for api in set(shared):
+                consumers[api] -= 1
+                if consumers[api] == 0 and api in live:
+                    live.discard(api)
+                    plan.stages.append(Stage(RELEASE, region, api=api))
+        plan.peakCached[region] = peak
+    return plan
+
+
+class ResponseCache:
+    """
+    Run scoped cache of API responses for the APIs a plan marks as shared. Responses are keyed by
+    region and request parameters, so every page of a paginated call is cached separately.
+    """
+
+    def __init__(self):
+        self.retained = defaultdict(int)
+        self.responses = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _api(model):
+        return f"{model.service_model.service_name}:{xform_name(model.name)}"
+
+    def retain(self, api):
+        """
+        Start caching the responses of an API
+        :param api: "service:operation"
+        :return: None
+        """
+        if api.split(':', 1)[1].startswith(CACHEABLE_PREFIXES):
+            with self.lock:
+                self.retained[api] += 1
+
+    def release(self, api):
+        """
+        Stop caching an API and free its responses
+        :param api: "service:operation"
+        :return: None
+        """
+        with self.lock:
+            if self.retained.get(api, 0) > 1:
+                self.retained[api] -= 1
+                return
+            self.retained.pop(api, None)
+            for key in [key for key in self.responses if key[0] == api]:
+                del self.responses[key]
+
+    def _before_parameter_build(self, params, model, context, **kwargs):
+        api = self._api(model)
+        if api in self.retained:
+            key = (api, context.get('client_region'), json.dumps(params, sort_keys=True, default=str))
+            context['quota_guard_cache_key'] = key
+            # Lets the rate limiter skip calls answered from the cache
+            context['quota_guard_cache_hit'] = key in self.responses
+
+    def _before_call(self, model, context, **kwargs):
+        key = context.get('quota_guard_cache_key')
+        if key is not None:
+            with self.lock:
+                cached = self.responses.get(key)
+            if cached is not None:
+                self.hits += 1
+                http, parsed = cached
+                return http, copy.deepcopy(parsed)
+        return None
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        key = context.get('quota_guard_cache_key')
+        if key is not None and not context.get('quota_guard_cache_hit') and http_response is not None and http_response.status_code < 300:
+            with self.lock:
+                if key[0] in self.retained:
+                    self.responses[key] = (http_response, copy.deepcopy(parsed))
+
+    def install(self, session=None):
+        """
+        Register the cache on a boto3 session so every client created from it afterwards uses it
+        :param session: The boto3 session (defaults to the boto3 default session)
+        :return: None
+        """
+        if session is None:
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            session = boto3.DEFAULT_SESSION
+        session.events.register_first('before-parameter-build', self._before_parameter_build, unique_id='quota-guard-response-cache-before-parameter-build')
+        session.events.register_first('before-call', self._before_call, unique_id='quota-guard-response-cache-before-call')
+        session.events.register('after-call', self._after_call, unique_id='quota-guard-response-cache-after-call')
+
+
+# Shared cache used by plans executed in this process
+cache = ResponseCache()
+
+
+def execute(plan, evaluate, responseCache=None):
+    """
+    Run a plan
+    :param plan: The Plan
+    :param evaluate: Called with the list of checks of every evaluation stage
+    :param responseCache: The ResponseCache filled by fetch stages (defaults to the shared cache)
+    :return: The number of API calls answered from the cache
+    """
+    responseCache = responseCache or cache
+    responseCache.install()
+    hits = responseCache.hits
+    # Snapshots fetching per resource learn every planned consumer up front
+    for stage in plan.stages:
+        if stage.kind == EVALUATE:
+            for api in stage.dependsOn:
+                if api.endswith(':snapshot'):
+                    for check in stage.checks:
+                        quota_collectors.expect(api, stage.region, check.quotaCode)
+    try:
+        for stage in plan.stages:
+            if stage.kind == FETCH:
+                responseCache.retain(stage.api)
+            elif stage.kind == RELEASE:
+                responseCache.release(stage.api)
+                quota_collectors.release(stage.api)
+            else:
+                evaluate(stage.checks)
+    finally:
+        # Never keep responses across runs, e.g. in a warm Lambda container
+        for stage in plan.stages:
+            if stage.kind == FETCH and stage.api in responseCache.retained:
+                responseCache.release(stage.api)
+        quota_collectors.reset()
+    logger.info(f"Plan executed, {responseCache.hits - hits} API calls answered from the shared cache")
+    return responseCache.hits - hits
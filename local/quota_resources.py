@@ -0,0 +1,166 @@
+import csv
+import heapq
+import json
+import os
+import boto3
+import logging
+import sys
+from itertools import count
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Resources kept in quota usage items and threshold events, highest usage first. 100 entries stay far
+# below the 400KB DynamoDB item and 256KB EventBridge entry limits.
+TOP_K = int(os.environ.get('RESOURCE_LIST_TOP_K', '100'))
+
+
+class TopK:
+    """
+    Keeps the K resources with the highest usage on a min-heap, and the total number of resources seen
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.heap = []
+        self.total = 0
+        # Tie breaker, so resources with the same usage are never compared
+        self.sequence = count()
+
+    def add(self, resource):
+        """
+        :param resource: Dict with resourceARN and usageValue
+        :return: None
+        """
+        self.total += 1
+        try:
+            value = float(resource.get('usageValue', 0))
+        except (TypeError, ValueError):
+            value = 0.0
+        entry = (value, -next(self.sequence), resource)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        """
+        :return: The kept resources, highest usage first
+        """
+        return [resource for _, _, resource in sorted(self.heap, reverse=True)]
+
+
+class ResourceList(str):
+    """
+    JSON of the top K resources of a collector, as passed to updateQuotaUsage. Also carries the total
+    number of resources and, when there were more than K, the complete list for the overflow.
+    """
+
+    def __new__(cls, text, total=0, complete=None):
+        value = super().__new__(cls, text)
+        value.total = total
+        value.complete = complete
+        return value
+
+    def __reduce__(self):
+        # Kept through the copies of the sink records and the pickling of multi-account results
+        return (ResourceList, (str(self), self.total, self.complete))
+
+
+def topResources(resources, k=TOP_K):
+    """
+    :param resources: List of {"resourceARN", "usageValue"}
+    :return: (the k resources with the highest usage, total number of resources)
+    """
+    top = TopK(k)
+    for resource in resources:
+        top.add(resource)
+    return top.items(), top.total
+
+
+class S3Overflow:
+    """
+    Complete resource lists written to S3 as JSON (used by the Lambda)
+    """
+
+    def __init__(self, bucket, prefix='resource-lists/'):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3 = boto3.client('s3')
+
+    def write(self, key, resources):
+        """
+        :param key: Name of the list, e.g. account/region/quota code; a later list of the same name replaces it
+        :param resources: List of {"resourceARN", "usageValue"}
+        :return: The s3:// URI of the object
+        """
+        objectKey = f"{self.prefix}{key}.json"
+        self.s3.put_object(Bucket=self.bucket, Key=objectKey, Body=json.dumps(resources).encode('utf-8'),
+                           ContentType='application/json')
+        return f"s3://{self.bucket}/{objectKey}"
+
+
+class LocalFileOverflow:
+    """
+    Complete resource lists written to local CSV files (used in CSV mode)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, key, resources):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key.replace('/', '_') + '.csv')
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['resourceARN', 'usageValue'])
+            for resource in resources:
+                writer.writerow([resource.get('resourceARN', ''), resource.get('usageValue', '')])
+        return path
+
+
+def boundResourceList(resourceListCrossingThreshold, key, overflow=None, k=TOP_K):
+    """
+    Bound a resource list to its top k resources, writing the complete list to the overflow when it is longer
+    :param resourceListCrossingThreshold: JSON list of {"resourceARN", "usageValue"} (or ""), or a ResourceList
+    :param key: Name of the overflow list
+    :param overflow: An S3Overflow or LocalFileOverflow, None drops the resources beyond the top k
+    :return: (JSON list of at most k resources, total number of resources, URI of the complete list or "")
+    """
+    if isinstance(resourceListCrossingThreshold, ResourceList):
+        # Bounded by its collector already
+        uri = ''
+        if resourceListCrossingThreshold.complete and overflow:
+            try:
+                uri = overflow.write(key, resourceListCrossingThreshold.complete)
+            except Exception as e:
+                logger.error(f"Error writing the resource list of {key}: {e}")
+        return str(resourceListCrossingThreshold), resourceListCrossingThreshold.total, uri
+    if not resourceListCrossingThreshold:
+        return resourceListCrossingThreshold, 0, ''
+    try:
+        resources = json.loads(resourceListCrossingThreshold)
+    except ValueError:
+        return resourceListCrossingThreshold, 0, ''
+    if not isinstance(resources, list) or len(resources) <= k:
+        return resourceListCrossingThreshold, len(resources) if isinstance(resources, list) else 0, ''
+    top, total = topResources(resources, k)
+    uri = ''
+    if overflow:
+        try:
+            uri = overflow.write(key, resources)
+        except Exception as e:
+            logger.error(f"Error writing the resource list of {key}: {e}")
+    logger.info(f"Resource list of {key} bounded to {k} of {total} resources{f', complete list in {uri}' if uri else ''}")
+    return json.dumps(top), total, uri
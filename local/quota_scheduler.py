@@ -0,0 +1,261 @@
+import json
+import os
+import boto3
+import logging
+import sys
+import threading
+import time
+import quota_history
+import quota_sinks
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Interval of the scheduled trigger (default cron is every 10 minutes)
+TICK_MINUTES = float(os.environ.get('SCHEDULE_TICK_MINUTES', '10'))
+# Bounds for the adaptive interval of a single (quota, region) check
+MIN_INTERVAL_MINUTES = float(os.environ.get('SCHEDULE_MIN_INTERVAL_MINUTES', str(TICK_MINUTES)))
+MAX_INTERVAL_MINUTES = float(os.environ.get('SCHEDULE_MAX_INTERVAL_MINUTES', '360'))
+# Fraction of the estimated time-to-threshold we are willing to wait before checking again
+SAFETY_FACTOR = 0.25
+
+
+def growthRatePerHour(observations, limit):
+    """
+    Least-squares slope of utilization over time
+    :param observations: List of (timestamp, usage) from the usage history, oldest first
+    :param limit: The quota limit
+    :return: The utilization growth in fraction of the limit per hour (0 when unknown)
+    """
+    trend = quota_history.fitTrend([ts for ts, _ in observations], [usage for _, usage in observations])
+    if trend is None or limit <= 0:
+        return 0.0
+    return trend[0] / limit
+
+
+def nextIntervalMinutes(usage, limit, observations, threshold, min_interval=None, max_interval=None):
+    """
+    Compute how long to wait before checking a quota again
+    :param usage: The latest usage
+    :param limit: The quota limit
+    :param observations: List of (timestamp, usage) from the usage history, oldest first
+    :param threshold: The alerting threshold in percent
+    :param min_interval: Lower bound in minutes (defaults to SCHEDULE_MIN_INTERVAL_MINUTES)
+    :param max_interval: Upper bound in minutes (defaults to SCHEDULE_MAX_INTERVAL_MINUTES)
+    :return: The interval in minutes
+    """
+    min_interval = MIN_INTERVAL_MINUTES if min_interval is None else min_interval
+    max_interval = MAX_INTERVAL_MINUTES if max_interval is None else max_interval
+    if limit <= 0:
+        return min_interval
+    utilization = usage / limit
+    threshold_ratio = float(threshold) / 100
+    if threshold_ratio <= 0 or utilization >= threshold_ratio:
+        return min_interval
+
+    headroom = threshold_ratio - utilization
+    # The closer to the threshold, the lower the ceiling even when usage is flat
+    interval = min_interval + (max_interval - min_interval) * (headroom / threshold_ratio)
+
+    growth = growthRatePerHour(observations, limit)
+    if growth > 0:
+        hours_to_threshold = headroom / growth
+        interval = min(interval, hours_to_threshold * 60 * SAFETY_FACTOR)
+
+    return max(min_interval, min(max_interval, interval))
+
+
+class JsonFileScheduleStore:
+    """
+    Schedule state kept in a local JSON file (used by the local runner)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path to the JSON state file
+        """
+        self.path = path
+
+    def load(self):
+        """
+        Load all schedule entries
+        :return: Dict of "QuotaCode|Region" to {"NextDueTime": epoch}
+        """
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading schedule state from {self.path}: {e}")
+            return {}
+
+    def save(self, key, entry, entries):
+        """
+        Persist one schedule entry
+        :return: None
+        """
+        with open(self.path, 'w') as f:
+            json.dump(entries, f)
+
+
+class DynamoScheduleStore:
+    """
+    Schedule state kept in a DynamoDB table keyed by (QuotaCode, Region) (used by the Lambda)
+    """
+
+    def __init__(self, table_name):
+        """
+        :param table_name: The DynamoDB table name
+        """
+        self.table_name = table_name
+        self.ddb = boto3.client('dynamodb')
+
+    def load(self):
+        """
+        Load all schedule entries with a single paginated scan
+        :return: Dict of "QuotaCode|Region" to {"NextDueTime": epoch}
+        """
+        entries = {}
+        paginator = self.ddb.get_paginator('scan')
+        for page in paginator.paginate(TableName=self.table_name, ProjectionExpression='QuotaCode, #region, NextDueTime',
+                                       ExpressionAttributeNames={'#region': 'Region'}):
+            for item in page['Items']:
+                key = f"{item['QuotaCode']['S']}|{item['Region']['S']}"
+                entries[key] = {
+                    'NextDueTime': float(item['NextDueTime']['N']),
+                }
+        return entries
+
+    def save(self, key, entry, entries):
+        """
+        Persist one schedule entry
+        :return: None
+        """
+        quotaCode, region = key.split('|', 1)
+        self.ddb.put_item(
+            Item={
+                'QuotaCode': {'S': quotaCode},
+                'Region': {'S': region},
+                'NextDueTime': {'N': str(entry['NextDueTime'])},
+            },
+            TableName=self.table_name
+        )
+
+
+class QuotaScheduler:
+    """
+    Decides which (quota, region) checks are due on a tick, based on headroom and the growth rate
+    of the usage history
+    """
+
+    def __init__(self, store, historyStore=None, tick_minutes=TICK_MINUTES):
+        """
+        :param store: A JsonFileScheduleStore or DynamoScheduleStore
+        :param historyStore: The quota_history store the sinks append to (headroom only when None)
+        :param tick_minutes: The interval of the scheduled trigger
+        """
+        self.store = store
+        self.historyStore = historyStore
+        self.tick_minutes = tick_minutes
+        self.entries = store.load()
+        self.thresholds = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(quotaCode, region):
+        return f"{quotaCode}|{region}"
+
+    def isDue(self, quotaCode, region, threshold, now=None):
+        """
+        Check whether a (quota, region) should be evaluated on this tick
+        :param quotaCode: The quota code
+        :param region: The AWS region
+        :param threshold: The alerting threshold in percent
+        :param now: Epoch seconds (defaults to the current time)
+        :return: True when the check is due
+        """
+        now = time.time() if now is None else now
+        key = self._key(quotaCode, region)
+        self.thresholds[key] = threshold
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        # Allow half a tick of slack so trigger jitter does not push a check to the next tick
+        return now >= entry['NextDueTime'] - self.tick_minutes * 30
+
+    def record(self, quotaCode, region, serviceQuotaValue, usageValue, now=None):
+        """
+        Compute the next due time from an observation, once it was appended to the usage history
+        :param quotaCode: The quota code
+        :param region: The AWS region
+        :param serviceQuotaValue: The quota limit
+        :param usageValue: The usage value
+        :param now: Epoch seconds (defaults to the current time)
+        :return: The next due time in epoch seconds
+        """
+        now = time.time() if now is None else now
+        key = self._key(quotaCode, region)
+        try:
+            usage, limit = float(usageValue), float(serviceQuotaValue)
+        except (TypeError, ValueError):
+            logger.warning(f"Not scheduling {quotaCode} in {region}: non numeric usage {usageValue} / {serviceQuotaValue}")
+            return now
+        observations = []
+        if self.historyStore:
+            try:
+                observations = self.historyStore.recent(region, quotaCode, now - quota_history.FORECAST_WINDOW_HOURS * 3600)
+            except Exception as e:
+                logger.error(f"Error reading usage history for {quotaCode} in {region}, scheduling on headroom only: {e}")
+        with self.lock:
+            interval = nextIntervalMinutes(usage, limit, observations, self.thresholds.get(key, 100))
+            entry = self.entries[key] = {'NextDueTime': now + interval * 60}
+            logger.info(f"Next check for {quotaCode} in {region} in {interval:.0f} minutes")
+            try:
+                self.store.save(key, entry, self.entries)
+            except Exception as e:
+                logger.error(f"Error saving schedule state for {quotaCode} in {region}: {e}")
+        return entry['NextDueTime']
+
+    def wrap(self, sink):
+        """
+        Wrap the sink of the quota usages so every written usage is also recorded
+        :param sink: The quota_sinks.Sink, the fan-out when several sinks are configured
+        :return: The wrapped sink
+        """
+        return ScheduledSink(sink, self)
+
+
+class ScheduledSink(quota_sinks.Sink):
+    """
+    Records every usage in the scheduler once the wrapped sink wrote it (and appended it to the usage history)
+    """
+
+    def __init__(self, sink, scheduler):
+        """
+        :param sink: The wrapped sink
+        :param scheduler: The QuotaScheduler
+        """
+        self.sink = sink
+        self.scheduler = scheduler
+
+    def write(self, record):
+        self.sink.write(record)
+        self.scheduler.record(record.quotaCode, record.region, record.serviceQuotaValue, record.usageValue)
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
@@ -0,0 +1,311 @@
+import json
+import os
+import boto3
+import logging
+import queue
+import sys
+import threading
+from dataclasses import asdict, dataclass
+import quota_alerts
+import quota_history
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Records waiting for the background writer; quota functions only block when it falls this far behind
+QUEUE_SIZE = int(os.environ.get('SINK_QUEUE_SIZE', '1000'))
+
+
+@dataclass
+class QuotaRecord:
+    """
+    One quota usage reported by a quota function
+    """
+    region: str
+    quotaCode: str
+    serviceCode: str
+    serviceQuotaValue: str
+    usageValue: str
+    resourceListCrossingThreshold: str = ""
+    sendQuotaThresholdEvent: bool = False
+    # Filled by a storing sink for the alert sinks after it
+    forecast: dict = None
+    resourceListUri: str = ""
+
+    def arguments(self):
+        """
+        :return: The updateQuotaUsage arguments of the record
+        """
+        return (self.region, self.quotaCode, self.serviceCode, self.serviceQuotaValue, self.usageValue,
+                self.resourceListCrossingThreshold, self.sendQuotaThresholdEvent)
+
+
+class Sink:
+    """
+    Destination of the quota usage records
+    """
+
+    # Alert sinks read what the storing sinks filled in the record, a fan-out writes them last
+    sendsAlerts = False
+
+    def write(self, record):
+        """
+        :param record: A QuotaRecord
+        :return: None
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Write out anything buffered
+        :return: None
+        """
+
+    def close(self):
+        """
+        Flush and release the sink
+        :return: None
+        """
+        self.flush()
+
+
+class FunctionSink(Sink):
+    """
+    Adapts an updateQuotaUsage style function (the DynamoDB and CSV writers)
+    """
+
+    def __init__(self, updateQuotaUsage, flush=None):
+        """
+        :param updateQuotaUsage: Called with the fields of every record
+        :param flush: Called without arguments on flush, if any
+        """
+        self.updateQuotaUsage = updateQuotaUsage
+        self.flushFunc = flush
+
+    def write(self, record):
+        self.updateQuotaUsage(*record.arguments())
+
+    def flush(self):
+        if self.flushFunc:
+            self.flushFunc()
+
+
+class StoringSink(FunctionSink):
+    """
+    Adapts a storing function returning (resourceListUri, forecast), e.g. quota_update_dynamo.storeQuotaUsage,
+    and keeps them on the record for the alert sinks
+    """
+
+    def write(self, record):
+        record.resourceListUri, record.forecast = self.updateQuotaUsage(*record.arguments())
+
+
+class StdoutJsonSink(Sink):
+    """
+    Prints every record as one JSON line
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            self.stream.write(json.dumps(asdict(record)) + '\n')
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+
+class EventBridgeSink(Sink):
+    """
+    Sends threshold events through the alert pipeline only, without storing the usage. Forecast
+    breaches and resource list URIs come from the storing sink of the same fan-out, if any.
+    """
+
+    sendsAlerts = True
+
+    def __init__(self, eventBus, store=None):
+        """
+        :param eventBus: The event bus name or ARN
+        :param store: A DynamoAlertStateStore or JsonFileAlertStateStore (no suppression when None)
+        """
+        self.pipeline = quota_alerts.AlertPipeline(boto3.client('events'), eventBus, store)
+
+    def write(self, record):
+        breaching = record.sendQuotaThresholdEvent
+        if quota_history.isForecastBreach(record.forecast) and not breaching:
+            logger.warning(f"Forecast breach for {record.serviceCode}:{record.quotaCode} in {record.region}")
+            breaching = True
+        self.pipeline.submit(record.region, record.quotaCode, record.serviceCode, record.serviceQuotaValue, record.usageValue,
+                             record.resourceListCrossingThreshold, breaching, record.forecast, record.resourceListUri)
+
+    def flush(self):
+        self.pipeline.flush()
+
+
+class ListSink(Sink):
+    """
+    Keeps the records in memory (used by the multi-account scan workers)
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            self.records.append(record)
+
+
+class FanOutSink(Sink):
+    """
+    Writes every record to several sinks. A failing sink is logged and does not stop the others.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = sorted(sinks, key=lambda sink: sink.sendsAlerts)
+
+    def write(self, record):
+        for sink in self.sinks:
+            try:
+                sink.write(record)
+            except Exception as e:
+                logger.error(f"Error writing {record.quotaCode} in {record.region} to {type(sink).__name__}: {e}")
+
+    def flush(self):
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {type(sink).__name__}: {e}")
+
+    def close(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.error(f"Error closing {type(sink).__name__}: {e}")
+
+
+class QueuedSink(Sink):
+    """
+    Hands the records to a background thread writing them to a sink in order, so the quota
+    functions never wait on storage I/O
+    """
+
+    def __init__(self, sink, maxsize=QUEUE_SIZE):
+        """
+        :param sink: The sink written by the background thread
+        :param maxsize: Records queued before write() blocks
+        """
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._drain, name='QuotaSinkWriter', daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                self.sink.write(record)
+            except Exception as e:
+                logger.error(f"Error writing {record.quotaCode} in {record.region}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def flush(self):
+        """
+        Wait until every queued record is written, then flush the sink
+        :return: None
+        """
+        self.queue.join()
+        self.sink.flush()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+
+def buildSink(names, factories, wrap=None):
+    """
+    Combine the named sinks behind one background queue
+    :param names: Comma-separated sink names, e.g. "csv,stdout"
+    :param factories: Dict of sink name to a function creating the sink
+    :param wrap: Function wrapping the combined sink, so it sees every record whichever sinks are named
+        (e.g. QuotaScheduler.wrap), if any
+    :return: A QueuedSink
+    """
+    sinks = []
+    for name in [name.strip() for name in names.split(',') if name.strip()]:
+        if name not in factories:
+            raise ValueError(f"Unknown sink {name}, expected one of {', '.join(sorted(factories))}")
+        sinks.append(factories[name]())
+    sink = sinks[0] if len(sinks) == 1 else FanOutSink(sinks)
+    return QueuedSink(wrap(sink) if wrap else sink)
+
+
+# Sink receiving the records of the quota functions, set by the entry point
+_sink = None
+_lock = threading.Lock()
+
+
+def install(sink):
+    """
+    Make a sink receive the records of every quota function, closing the one installed before
+    :param sink: The sink
+    :return: The sink
+    """
+    global _sink
+    with _lock:
+        previous, _sink = _sink, sink
+    if previous is not None and previous is not sink:
+        previous.close()
+    return sink
+
+
+def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", sendQuotaThresholdEvent=False):
+    """
+    Report one quota usage to the installed sink (the updateQuotaUsage of the quota functions)
+    :return: None
+    """
+    if _sink is None:
+        logger.error(f"No sink installed, dropping the usage of {quotaCode} in {region}")
+        return
+    _sink.write(QuotaRecord(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent))
+
+
+def flush():
+    """
+    Wait until the installed sink has written every record
+    :return: None
+    """
+    if _sink is not None:
+        _sink.flush()
+
+
+def close():
+    """
+    Flush and close the installed sink
+    :return: None
+    """
+    install(None)
@@ -0,0 +1,251 @@
+import json
+import os
+import boto3
+import logging
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import quota_stream
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Reducers a spec can use
+COUNT = 'count'
+SUM = 'sum'
+MAX = 'max'
+GROUP_COUNT = 'group_count'
+
+# Scopes: regional sources get a client per region, global ones (IAM) a single default client
+REGIONAL = 'Regional'
+GLOBAL = 'Global'
+
+
+@dataclass(frozen=True)
+class Source:
+    """
+    A paginated API operation whose items feed one or more quota specs
+    """
+    service: str
+    operation: str
+    resultKey: str
+    params: dict = field(default_factory=dict, compare=False, hash=False)
+    scope: str = REGIONAL
+
+    def key(self):
+        """
+        Identity used to share one API pass between specs
+        :return: A hashable key
+        """
+        return (self.service, self.operation, json.dumps(self.params, sort_keys=True), self.scope)
+
+
+@dataclass
+class QuotaSpec:
+    """
+    Declarative description of a quota check: where the items come from and how they are reduced to a usage value
+    """
+    quotaCode: str
+    source: Source
+    reducer: str = COUNT
+    # Usage contributed by an item (SUM, MAX and GROUP_COUNT; GROUP_COUNT defaults to 1)
+    value: Optional[Callable] = None
+    # Resource id reported in the resource list (MAX)
+    resource: Optional[Callable] = None
+    # Group key of an item, e.g. its VpcId (GROUP_COUNT)
+    groupBy: Optional[Callable] = None
+    # Client-side filter applied before the reducer
+    where: Optional[Callable] = None
+    # Factor applied to the reduced value, e.g. 1/1024 to report GiB as TiB
+    scale: float = 1
+    description: str = ''
+
+    @property
+    def functionName(self):
+        return self.quotaCode.replace('-', '_')
+
+    def testFilename(self):
+        """
+        Test payload used for the source of this spec when IS_TESTING_ENABLED is set
+        :return: The path of the test payload
+        """
+        return f'tests/{self.functionName}_{self.source.operation}.json'
+
+    def buildReducer(self, serviceQuotaValue, threshold):
+        """
+        Create the quota_stream reducer evaluating this spec
+        :param serviceQuotaValue: The quota limit
+        :param threshold: The threshold in percent
+        :return: A reducer
+        """
+        if self.reducer == COUNT:
+            return quota_stream.CountReducer()
+        if self.reducer == SUM:
+            return quota_stream.SumReducer(self.value)
+        if self.reducer == MAX:
+            # Compare the scaled per-resource value, so the resource list uses the quota unit
+            return quota_stream.MaxReducer(self.resource, lambda item: self.value(item) * self.scale, serviceQuotaValue, threshold)
+        if self.reducer == GROUP_COUNT:
+            return quota_stream.GroupCountReducer(self.groupBy, serviceQuotaValue, threshold, self.value)
+        raise ValueError(f"Unknown reducer {self.reducer} for {self.quotaCode}")
+
+
+IAM_ROLES = Source('iam', 'list_roles', 'Roles', scope=GLOBAL)
+IAM_USERS = Source('iam', 'list_users', 'Users', scope=GLOBAL)
+IAM_GROUPS = Source('iam', 'list_groups', 'Groups', scope=GLOBAL)
+IAM_INSTANCE_PROFILES = Source('iam', 'list_instance_profiles', 'InstanceProfiles', scope=GLOBAL)
+IAM_LOCAL_POLICIES = Source('iam', 'list_policies', 'Policies', {'Scope': 'Local'}, scope=GLOBAL)
+EC2_VPCS = Source('ec2', 'describe_vpcs', 'Vpcs')
+EC2_SUBNETS = Source('ec2', 'describe_subnets', 'Subnets')
+EC2_NETWORK_INTERFACES = Source('ec2', 'describe_network_interfaces', 'NetworkInterfaces')
+EC2_EGRESS_ONLY_GATEWAYS = Source('ec2', 'describe_egress_only_internet_gateways', 'EgressOnlyInternetGateways')
+EC2_GP2_VOLUMES = Source('ec2', 'describe_volumes', 'Volumes', {'Filters': [{'Name': 'volume-type', 'Values': ['gp2']}]})
+ASG_LAUNCH_CONFIGURATIONS = Source('autoscaling', 'describe_launch_configurations', 'LaunchConfigurations')
+
+
+SPECS = [
+    QuotaSpec('L-FE177D64', IAM_ROLES, description='Roles per account'),
+    QuotaSpec('L-C07B4B0D', IAM_ROLES, MAX,
+              value=lambda role: len(json.dumps(role.get('AssumeRolePolicyDocument', {}))),
+              resource=lambda role: role['Arn'],
+              description='Role trust policy length'),
+    QuotaSpec('L-F55AF5E4', IAM_USERS, description='Users per account'),
+    QuotaSpec('L-F4A5425F', IAM_GROUPS, description='Groups per account'),
+    QuotaSpec('L-6E65F664', IAM_INSTANCE_PROFILES, description='Instance profiles per account'),
+    QuotaSpec('L-E95E4862', IAM_LOCAL_POLICIES, description='Customer managed policies per account'),
+    QuotaSpec('L-83CA0A9D', EC2_VPCS, MAX,
+              value=lambda vpc: len(vpc.get('CidrBlockAssociationSet', [])),
+              resource=lambda vpc: vpc['VpcId'],
+              description='IPv4 CIDR blocks per VPC'),
+    QuotaSpec('L-085A6257', EC2_VPCS, MAX,
+              value=lambda vpc: len([assoc for assoc in vpc.get('Ipv6CidrBlockAssociationSet', [])
+                                     if assoc.get('Ipv6CidrBlockState', {}).get('State') == 'associated']),
+              resource=lambda vpc: vpc['VpcId'],
+              description='IPv6 CIDR blocks per VPC'),
+    QuotaSpec('L-407747CB', EC2_SUBNETS, GROUP_COUNT,
+              groupBy=lambda subnet: subnet.get('VpcId'),
+              description='Subnets per VPC'),
+    QuotaSpec('L-DF5E4CA3', EC2_NETWORK_INTERFACES, description='Network interfaces per region'),
+    QuotaSpec('L-45FE3B85', EC2_EGRESS_ONLY_GATEWAYS, description='Egress-only internet gateways per region'),
+    QuotaSpec('L-D18FCD1D', EC2_GP2_VOLUMES, SUM,
+              value=lambda volume: volume['Size'], scale=1 / 1024,
+              description='Storage for gp2 volumes, in TiB'),
+    QuotaSpec('L-6B80B8FA', ASG_LAUNCH_CONFIGURATIONS, description='Launch configurations per region'),
+]
+
+SPECS_BY_CODE = {spec.quotaCode: spec for spec in SPECS}
+
+
+def covers(quotaCode):
+    """
+    Check whether a quota is evaluated from a declarative spec
+    :param quotaCode: The quota code
+    :return: True when a spec exists
+    """
+    return quotaCode in SPECS_BY_CODE
+
+
+def getServiceQuotaValue(sq, serviceCode, quotaCode):
+    """
+    Fetch the applied quota value, falling back to the AWS default value
+    :param sq: The service-quotas client
+    :return: The quota value
+    """
+    try:
+        serviceQuota = sq.get_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
+    except Exception as e:
+        logger.info(f"Error calling get_service_quota: {e}. Fallback to default")
+        serviceQuota = sq.get_aws_default_service_quota(ServiceCode=serviceCode, QuotaCode=quotaCode)
+    return serviceQuota['Quota']['Value']
+
+
+def _client(service, scope, region):
+    if scope == GLOBAL:
+        return boto3.client(service)
+    return boto3.client(service, region_name=region)
+
+
+def compileSources(checks):
+    """
+    Group checks by the API pass they need, so every distinct source is read once
+    :param checks: List of (serviceCode, quotaCode, threshold) for quotas covered by a spec
+    :return: OrderedDict of source key to (Source, [(spec, serviceCode, threshold)])
+    """
+    groups = OrderedDict()
+    for serviceCode, quotaCode, threshold in checks:
+        spec = SPECS_BY_CODE[quotaCode]
+        groups.setdefault(spec.source.key(), (spec.source, []))[1].append((spec, serviceCode, threshold))
+    return groups
+
+
+def evaluate(checks, region, updateQuotaUsage):
+    """
+    Evaluate spec-covered quotas for a region with one streamed pass per distinct source
+    :param checks: List of (serviceCode, quotaCode, threshold) for quotas covered by a spec
+    :param region: The AWS region
+    :param updateQuotaUsage: The sink receiving each quota usage
+    :return: None
+    """
+    for source, members in compileSources(checks).values():
+        logger.info(f"Evaluating {len(members)} quotas from {source.service}:{source.operation} in {region}")
+        sq = _client('service-quotas', source.scope, region)
+        evaluations = []
+        for spec, serviceCode, threshold in members:
+            try:
+                serviceQuotaValue = getServiceQuotaValue(sq, serviceCode, spec.quotaCode)
+            except Exception as e:
+                logger.error(f"Error getting quota value for {spec.quotaCode}: {e}")
+                continue
+            evaluations.append((spec, serviceCode, threshold, serviceQuotaValue, spec.buildReducer(serviceQuotaValue, threshold)))
+        if not evaluations:
+            continue
+
+        testFilename = next((spec.testFilename() for spec, *_ in evaluations if os.path.exists(spec.testFilename())), evaluations[0][0].testFilename())
+        try:
+            items = quota_stream.streamItems(_client(source.service, source.scope, region), source.operation, source.resultKey, testFilename=testFilename, **source.params)
+            for item in items:
+                for spec, _, _, _, reducer in evaluations:
+                    if spec.where is None or spec.where(item):
+                        reducer.add(item)
+        except Exception as e:
+            logger.error(f"Error reading {source.service}:{source.operation} in {region}: {e}")
+            continue
+
+        for spec, serviceCode, threshold, serviceQuotaValue, reducer in evaluations:
+            if hasattr(reducer, 'finish'):
+                reducer.finish()
+            if spec.reducer in (MAX, GROUP_COUNT):
+                usageValue = reducer.value
+                resourceListCrossingThreshold = reducer.resourceList()
+                sendQuotaThresholdEvent = bool(reducer.resourceListCrossingThreshold)
+            else:
+                usageValue = reducer.value * spec.scale
+                sendQuotaThresholdEvent = quota_stream.isOverThreshold(usageValue, serviceQuotaValue, threshold)
+                resourceListCrossingThreshold = ""
+            logger.info(f"{spec.description or spec.quotaCode} in {region}: {usageValue} out of {serviceQuotaValue}")
+            if sendQuotaThresholdEvent:
+                logger.warning(f"Exceeding Threshold for {spec.quotaCode} in {region}: {usageValue} out of {serviceQuotaValue}")
+            try:
+                updateQuotaUsage(region, spec.quotaCode, serviceCode, str(serviceQuotaValue), str(usageValue), resourceListCrossingThreshold, sendQuotaThresholdEvent)
+            except Exception as e:
+                logger.error(f"Error updating quota usage for {spec.quotaCode} in {region}: {e}")
+
+
+def evaluateQuota(serviceCode, quotaCode, threshold, region, updateQuotaUsage):
+    """
+    Evaluate a single spec-covered quota (used by the L_* compatibility functions)
+    :return: None
+    """
+    evaluate([(serviceCode, quotaCode, threshold)], region, updateQuotaUsage)
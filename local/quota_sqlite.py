@@ -0,0 +1,210 @@
+import argparse
+import csv
+import os
+import boto3
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+import quota_sinks
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# SQLite database of the sqlite sink (python app.py --sinks sqlite)
+QUOTA_SQLITE_PATH = os.environ.get('QUOTA_SQLITE_PATH', 'quota_usage.db')
+# Usages written per transaction
+BATCH_SIZE = int(os.environ.get('QUOTA_SQLITE_BATCH_SIZE', '200'))
+
+SCHEMA = [
+    # Latest usage per (account, region, service, quota), replaced on every run
+    'CREATE TABLE IF NOT EXISTS latest ('
+    'account_id TEXT NOT NULL, region TEXT NOT NULL, service_code TEXT NOT NULL, quota_code TEXT NOT NULL, '
+    'limit_value REAL, usage_value REAL, usage_pct REAL, resource_list TEXT, breaching INTEGER NOT NULL DEFAULT 0, '
+    'ts REAL NOT NULL, '
+    'PRIMARY KEY (account_id, region, service_code, quota_code))',
+    # Every usage ever written, for trends across runs
+    'CREATE TABLE IF NOT EXISTS history ('
+    'ts REAL NOT NULL, account_id TEXT NOT NULL, region TEXT NOT NULL, service_code TEXT NOT NULL, '
+    'quota_code TEXT NOT NULL, limit_value REAL, usage_value REAL, breaching INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX IF NOT EXISTS history_ts ON history (ts)',
+]
+
+# Columns of the service quota export (quota_export.py) and of the merged output
+EXPORT_HEADERS = ['accountId', 'region', 'serviceCode', 'quotaCode', 'quotaName', 'quotaValue', 'defaultValue', 'adjustable', 'usageValue', 'usagePct']
+
+
+def connect(path=QUOTA_SQLITE_PATH):
+    """
+    Open the database in WAL mode, so reports can read while a run writes, and create the tables
+    :param path: The SQLite file
+    :return: The connection
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.commit()
+    return connection
+
+
+def localAccountId():
+    """
+    :return: The account of the local credentials, from ACCOUNT_ID or else STS ('' when unknown)
+    """
+    accountId = os.environ.get('ACCOUNT_ID', '')
+    if accountId or 'IS_TESTING_ENABLED' in os.environ.keys():
+        return accountId
+    try:
+        return boto3.client('sts').get_caller_identity()['Account']
+    except Exception as e:
+        logger.warning(f"Unable to look up the account id, writing usages without it: {e}")
+        return ''
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SqliteSink(quota_sinks.Sink):
+    """
+    Writes the quota usages to the latest and history tables of a SQLite database, in batched transactions
+    """
+
+    def __init__(self, path=QUOTA_SQLITE_PATH, accountId='', batchSize=BATCH_SIZE):
+        """
+        :param path: The SQLite file
+        :param accountId: The account of the usages written with write()
+        :param batchSize: Usages written per transaction
+        """
+        self.path = path
+        self.accountId = accountId
+        self.batchSize = batchSize
+        self.connection = connect(path)
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        self.writeAccount(self.accountId, [(record.region, record.quotaCode, record.serviceCode, record.serviceQuotaValue,
+                                            record.usageValue, record.resourceListCrossingThreshold, record.sendQuotaThresholdEvent)])
+
+    def writeAccount(self, accountId, records):
+        """
+        Write the usages of one account
+        :param accountId: The account the usages were collected in
+        :param records: List of the updateQuotaUsage arguments (region, quotaCode, serviceCode, serviceQuotaValue,
+            usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent)
+        :return: None
+        """
+        now = time.time()
+        with self.lock:
+            for region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent in records:
+                limit, usage = _number(serviceQuotaValue), _number(usageValue)
+                pct = round(usage / limit * 100, 2) if limit and usage is not None else None
+                self.pending.append((accountId, region, serviceCode, quotaCode, limit, usage, pct,
+                                     resourceListCrossingThreshold, int(bool(sendQuotaThresholdEvent)), now))
+            full = len(self.pending) >= self.batchSize
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+            if not pending:
+                return
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', pending)
+                self.connection.executemany(
+                    'INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(ts, accountId, region, serviceCode, quotaCode, limit, usage, breaching)
+                     for accountId, region, serviceCode, quotaCode, limit, usage, _, _, breaching, ts in pending])
+        logger.info(f"Wrote {len(pending)} quota usages to {self.path}")
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+
+def mergeServiceQuotas(connection, serviceQuotasFile, outputFile):
+    """
+    Join a service quota export with the latest usages, replacing the usage columns where a usage was collected
+    :param connection: The database connection
+    :param serviceQuotasFile: CSV exported by quota_export.py
+    :param outputFile: The merged CSV
+    :return: (rows written, rows with a collected usage)
+    """
+    connection.execute('CREATE TEMP TABLE IF NOT EXISTS service_quotas ('
+                       'account_id TEXT, region TEXT, service_code TEXT, quota_code TEXT, quota_name TEXT, '
+                       'quota_value TEXT, default_value TEXT, adjustable TEXT, usage_value TEXT, usage_pct TEXT)')
+    connection.execute('DELETE FROM service_quotas')
+    with open(serviceQuotasFile, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip headers
+        connection.executemany('INSERT INTO service_quotas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               ((row + [''] * 10)[:10] for row in reader if row))
+    # Usages written without an account (unknown credentials) match the export of any account, the
+    # usage of the exact account wins when both exist
+    rows = connection.execute(
+        'SELECT account_id, region, service_code, quota_code, quota_name, quota_value, default_value, adjustable, '
+        'COALESCE(usage, usage_value), '
+        "CASE WHEN usage IS NULL THEN usage_pct "
+        "WHEN CAST(quota_value AS REAL) > 0 THEN printf('%.2f', usage * 100.0 / CAST(quota_value AS REAL)) "
+        "ELSE '' END, "
+        'usage IS NOT NULL '
+        'FROM (SELECT s.*, s.rowid AS export_row, COALESCE(a.usage_value, u.usage_value) AS usage '
+        'FROM service_quotas s '
+        'LEFT JOIN latest a ON a.account_id = s.account_id AND a.region = s.region '
+        'AND a.service_code = s.service_code AND a.quota_code = s.quota_code '
+        "LEFT JOIN latest u ON u.account_id = '' AND u.region = s.region "
+        'AND u.service_code = s.service_code AND u.quota_code = s.quota_code) '
+        'ORDER BY export_row'
+    ).fetchall()
+    with open(outputFile, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(EXPORT_HEADERS)
+        for row in rows:
+            usage = row[8]
+            # Whole numbers as written by the CSV sink
+            if isinstance(usage, float) and usage.is_integer():
+                usage = int(usage)
+            writer.writerow(list(row[:8]) + [usage, row[9]])
+    return len(rows), sum(row[10] for row in rows)
+
+
+if __name__ == "__main__":
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description='Quota usage SQLite database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    merge = subparsers.add_parser('merge', help='Merge the latest usages into a service quota export')
+    merge.add_argument('service_quotas_file', help='CSV exported by quota_export.py')
+    merge.add_argument('--db', default=QUOTA_SQLITE_PATH,
+                       help='SQLite database (default: QUOTA_SQLITE_PATH env var or quota_usage.db)')
+    merge.add_argument('--output',
+                       help='Merged CSV (default: merged_quotas_<timestamp>.csv)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"Database not found: {args.db}")
+    output = args.output or f"merged_quotas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    total, updated = mergeServiceQuotas(connect(args.db), args.service_quotas_file, output)
+    print(f"Merged {updated} of {total} quotas into {output}")
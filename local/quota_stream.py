@@ -0,0 +1,204 @@
+import json
+import os
+import logging
+import sys
+from collections import defaultdict
+import quota_resources
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+def isOverThreshold(value, serviceQuotaValue, threshold):
+    """
+    Compare a usage value against the threshold percentage of the quota
+    :param value: The usage value
+    :param serviceQuotaValue: The quota limit
+    :param threshold: The threshold in percent
+    :return: True when the usage is over the threshold
+    """
+    return float(serviceQuotaValue) > 0 and float(value) / float(serviceQuotaValue) > float(threshold) / 100
+
+
+def streamPages(client, operation, testFilename=None, resultKey=None, **kwargs):
+    """
+    Yield API response pages one at a time instead of materializing the full result
+    :param client: The boto3 client
+    :param operation: The paginated operation name (e.g. 'describe_snapshots')
+    :param testFilename: Test payload used instead of the API when IS_TESTING_ENABLED is set
+    :param resultKey: The key holding the items in a page, used to wrap flat test payloads
+    :param kwargs: Parameters passed to paginate()
+    :return: A generator of pages
+    """
+    if testFilename and 'IS_TESTING_ENABLED' in os.environ.keys():
+        logger.info(f"Detected testing enabled. Using test payload from {testFilename}")
+        with open(testFilename, 'r') as test_file_content:
+            payload = json.load(test_file_content)
+        if isinstance(payload, dict):
+            yield payload
+        elif resultKey and payload and not (isinstance(payload[0], dict) and resultKey in payload[0]):
+            # Flat list of items
+            yield {resultKey: payload}
+        else:
+            yield from payload
+        return
+    yield from client.get_paginator(operation).paginate(**kwargs)
+
+
+def streamItems(client, operation, resultKey, testFilename=None, **kwargs):
+    """
+    Yield the items of a paginated API one at a time
+    :param resultKey: The key holding the items in a page (e.g. 'Snapshots')
+    :return: A generator of items
+    """
+    for page in streamPages(client, operation, testFilename, resultKey, **kwargs):
+        yield from page.get(resultKey, [])
+
+
+class CountReducer:
+    """
+    Counts items (optionally only those matching a predicate)
+    """
+
+    def __init__(self, predicate=None):
+        self.predicate = predicate
+        self.value = 0
+
+    def add(self, item):
+        if self.predicate is None or self.predicate(item):
+            self.value += 1
+
+
+class SumReducer:
+    """
+    Sums a numeric value extracted from each item
+    """
+
+    def __init__(self, valueFunc):
+        self.valueFunc = valueFunc
+        self.value = 0
+
+    def add(self, item):
+        self.value += self.valueFunc(item)
+
+
+class MaxReducer:
+    """
+    Tracks the maximum per-resource value and the resources over the threshold, without keeping
+    the items themselves. The resources over the threshold feed a top-K heap with their total.
+    """
+
+    def __init__(self, resourceFunc, valueFunc, serviceQuotaValue, threshold):
+        """
+        :param resourceFunc: Returns the resource id (resourceARN) of an item
+        :param valueFunc: Returns the usage value of an item
+        :param serviceQuotaValue: The quota limit
+        :param threshold: The threshold in percent
+        """
+        self.resourceFunc = resourceFunc
+        self.valueFunc = valueFunc
+        self.serviceQuotaValue = serviceQuotaValue
+        self.threshold = threshold
+        self.value = 0
+        self.top = quota_resources.TopK()
+        # Every resource over the threshold as (resourceARN, usageValue), for the overflow when there are more than K
+        self.overThreshold = []
+
+    def add(self, item):
+        self.observe(self.resourceFunc(item), self.valueFunc(item))
+
+    def observe(self, resource, value):
+        """
+        Fold one (resource, value) pair into the aggregate
+        :return: None
+        """
+        if self.value < value:
+            self.value = value
+        if isOverThreshold(value, self.serviceQuotaValue, self.threshold):
+            self.top.add({"resourceARN": resource, "usageValue": value})
+            self.overThreshold.append((resource, value))
+            logger.warning(f"Resource {resource} usage ({value}) exceeds {float(self.threshold)}% of the quota ({self.serviceQuotaValue})")
+
+    @property
+    def resourceListCrossingThreshold(self):
+        """
+        :return: The top K resources over the threshold, highest usage first
+        """
+        return self.top.items()
+
+    def resourceList(self):
+        """
+        :return: quota_resources.ResourceList of the resources over the threshold, passed to updateQuotaUsage
+        """
+        complete = None
+        if self.top.total > self.top.k:
+            complete = [{"resourceARN": resource, "usageValue": value} for resource, value in self.overThreshold]
+        return quota_resources.ResourceList(json.dumps(self.top.items()), self.top.total, complete)
+
+
+class GroupCountReducer:
+    """
+    Counts items per group (e.g. per VPC or per AZ) keeping only the counters; the
+    per-group maximum is folded into a MaxReducer by finish()
+    """
+
+    def __init__(self, groupFunc, serviceQuotaValue, threshold, valueFunc=None):
+        """
+        :param groupFunc: Returns the group key of an item (None skips the item)
+        :param valueFunc: Returns the amount an item adds to its group (defaults to 1)
+        """
+        self.groupFunc = groupFunc
+        self.valueFunc = valueFunc
+        self.counts = defaultdict(int)
+        self.result = MaxReducer(None, None, serviceQuotaValue, threshold)
+
+    def add(self, item):
+        group = self.groupFunc(item)
+        if group is not None:
+            self.counts[group] += self.valueFunc(item) if self.valueFunc else 1
+
+    def finish(self):
+        """
+        Evaluate the per-group counters against the quota
+        :return: The MaxReducer holding the max and the groups over threshold
+        """
+        for group, count in self.counts.items():
+            self.result.observe(group, count)
+        return self.result
+
+    @property
+    def value(self):
+        return self.result.value
+
+    @property
+    def resourceListCrossingThreshold(self):
+        return self.result.resourceListCrossingThreshold
+
+    def resourceList(self):
+        return self.result.resourceList()
+
+
+def reduceItems(items, *reducers):
+    """
+    Feed a stream of items through one or more reducers in a single pass
+    :param items: An iterable (usually a generator from streamItems)
+    :param reducers: The reducers to update
+    :return: The reducers
+    """
+    for item in items:
+        for reducer in reducers:
+            reducer.add(item)
+    for reducer in reducers:
+        if hasattr(reducer, 'finish'):
+            reducer.finish()
+    return reducers
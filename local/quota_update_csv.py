@@ -9,6 +9,8 @@ from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
 import inspect
 import os.path
+import quota_history
+import quota_resources
 
 # Setup logger
 # Setup logging
@@ -30,6 +32,29 @@ if not logger.handlers:
 # CSV file path for quota usage (defaults to quota_usage.csv in current directory if not set)
 quota_csv_path = os.environ.get('QUOTA_CSV_PATH', 'quota_usage.csv')
 
+# SQLite file keeping the append-only usage history next to the CSV (empty value disables it)
+quota_history_path = os.environ.get('QUOTA_HISTORY_DB', 'quota_history.db')
+historyStore = None
+
+# CSV file path for the multi-account scan, keyed by account (python app.py --accounts)
+quota_accounts_csv_path = os.environ.get('QUOTA_ACCOUNTS_CSV_PATH', 'quota_usage_accounts.csv')
+ACCOUNT_CSV_HEADERS = ['AccountId', 'QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp', 'ResourceCount', 'ResourceListUri']
+
+# Directory of the complete resource lists longer than the top K kept in the CSV files
+resource_list_dir = os.environ.get('RESOURCE_LIST_DIR', 'resource_lists')
+resourceListOverflow = quota_resources.LocalFileOverflow(resource_list_dir)
+
+
+def get_history_store():
+    """
+    Get the usage history store, opened on first use
+    :return: A SqliteHistoryStore, or None when QUOTA_HISTORY_DB is empty
+    """
+    global historyStore
+    if quota_history_path and historyStore is None:
+        historyStore = quota_history.SqliteHistoryStore(quota_history_path)
+    return historyStore
+
 logger.info("Loading function")
 
 def get_quota_csv_path():
@@ -53,7 +78,7 @@ def ensure_csv_exists():
         with open(csv_path, 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
             # Write headers
-            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp'])
+            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp', 'ResourceCount', 'ResourceListUri'])
         logger.info(f"Created new CSV file with headers at {csv_path}")
 
 def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", sendQuotaThresholdEvent=False):
@@ -74,6 +99,10 @@ def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageVal
     
     # Get current timestamp
     timestamp = datetime.utcnow().isoformat()
+
+    # Keep the top K resources, the complete list goes to a file in resource_list_dir
+    resourceList, resourceCount, resourceListUri = quota_resources.boundResourceList(
+        resourceListCrossingThreshold, f"{region}/{quotaCode}", resourceListOverflow)
     
     # Read existing data
     existing_data = []
@@ -93,30 +122,67 @@ def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageVal
     for i, row in enumerate(existing_data):
         if len(row) >= 3 and row[0] == quotaCode and row[1] == serviceCode and row[2] == region:
             # Update existing entry
-            existing_data[i] = [quotaCode, serviceCode, region, serviceQuotaValue, usageValue, resourceListCrossingThreshold, timestamp]
+            existing_data[i] = [quotaCode, serviceCode, region, serviceQuotaValue, usageValue, resourceList, timestamp, resourceCount or '', resourceListUri]
             updated = True
             break
             
     if not updated:
         # Add new entry
-        existing_data.append([quotaCode, serviceCode, region, serviceQuotaValue, usageValue, resourceListCrossingThreshold, timestamp])
+        existing_data.append([quotaCode, serviceCode, region, serviceQuotaValue, usageValue, resourceList, timestamp, resourceCount or '', resourceListUri])
     
     # Write back to CSV
     try:
         with open(csv_path, 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
             # Write headers
-            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp'])
+            writer.writerow(['QuotaCode', 'ServiceCode', 'Region', 'LimitValue', 'UsageValue', 'ResourceList', 'Timestamp', 'ResourceCount', 'ResourceListUri'])
             # Write data
             writer.writerows(existing_data)
         logger.info(f"Updated quota usage in CSV file for {serviceCode}:{quotaCode} in region {region}")
     except Exception as e:
         logger.error(f"Error writing to CSV file: {e}")
     
+    if get_history_store():
+        forecast = quota_history.appendAndForecast(get_history_store(), region, quotaCode, serviceCode, serviceQuotaValue, usageValue)
+        if quota_history.isForecastBreach(forecast):
+            logger.warning(f"Quota {quotaCode} in {region} is forecast to be exhausted in {forecast['HoursToExhaustion']:.1f} hours")
+
     if sendQuotaThresholdEvent == True:
-        logger.warning(f"Quota exceeded for {quotaCode} in {region}. Service code: {serviceCode} - quota: {serviceQuotaValue} - usage: {usageValue} - Threshold: {resourceListCrossingThreshold}")
+        logger.warning(f"Quota exceeded for {quotaCode} in {region}. Service code: {serviceCode} - quota: {serviceQuotaValue} - usage: {usageValue} - Threshold: {resourceList}")
 
-    
 
+def writeAccountQuotaUsage(accountId, records):
+    """
+    Update the quota usages of one account in the multi-account CSV file, in a single write
+    :param accountId: The account the usages were collected in
+    :param records: List of the updateQuotaUsage arguments (region, quotaCode, serviceCode, serviceQuotaValue,
+        usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent)
+    :return: None
+    """
+    timestamp = datetime.utcnow().isoformat()
+    rows = {}
+    try:
+        with open(quota_accounts_csv_path, 'r', newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)  # Skip headers
+            for row in reader:
+                if len(row) >= 4:
+                    rows[tuple(row[:4])] = row
+    except FileNotFoundError:
+        logger.info(f"Creating new multi-account quota usage CSV file at {quota_accounts_csv_path}")
 
+    for region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent in records:
+        resourceList, resourceCount, resourceListUri = quota_resources.boundResourceList(
+            resourceListCrossingThreshold, f"{accountId}/{region}/{quotaCode}", resourceListOverflow)
+        rows[(accountId, quotaCode, serviceCode, region)] = [accountId, quotaCode, serviceCode, region, serviceQuotaValue, usageValue, resourceList, timestamp, resourceCount or '', resourceListUri]
+        if sendQuotaThresholdEvent == True:
+            logger.warning(f"Quota exceeded for {quotaCode} in {region} of account {accountId}. Service code: {serviceCode} - quota: {serviceQuotaValue} - usage: {usageValue} - Threshold: {resourceList}")
 
+    try:
+        with open(quota_accounts_csv_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(ACCOUNT_CSV_HEADERS)
+            writer.writerows(rows[key] for key in sorted(rows))
+        logger.info(f"Updated {len(records)} quota usages of account {accountId} in {quota_accounts_csv_path}")
+    except Exception as e:
+        logger.error(f"Error writing to CSV file: {e}")
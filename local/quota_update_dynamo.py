@@ -9,6 +9,10 @@ from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
 import inspect
 import os.path
+import quota_history
+import quota_alerts
+import quota_breaches
+import quota_resources
 
 # Setup logger
 # Setup logging
@@ -37,23 +41,58 @@ eventbridge = boto3.client('events')
 bucket = os.environ.get('SERVICEQUOTA_BUCKET', '')
 quotaUsageTable = os.environ.get('DDB_TABLE', '')
 eventBus = os.environ.get('EVENT_BUS', '')
+historyTable = os.environ.get('HISTORY_TABLE', '')
+
+alertStateTable = os.environ.get('ALERT_STATE_TABLE', '')
+accountId = os.environ.get('ACCOUNT_ID', '')
+# Resource lists longer than the top K are written completely to this bucket and referenced from the item and events
+resourceListBucket = os.environ.get('RESOURCE_LIST_BUCKET', bucket)
+resourceListPrefix = os.environ.get('RESOURCE_LIST_PREFIX', 'resource-lists/')
+
+historyStore = quota_history.DynamoHistoryStore(historyTable) if historyTable else None
+alertPipeline = quota_alerts.AlertPipeline(
+    eventbridge, eventBus,
+    quota_alerts.DynamoAlertStateStore(alertStateTable) if alertStateTable else None
+)
+
+resourceListOverflow = quota_resources.S3Overflow(resourceListBucket, resourceListPrefix) if resourceListBucket else None
 
 logger.info("Loading function")
 
-def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", sendQuotaThresholdEvent=False):
+def getAccountId():
     """
-    Update the quota usage in the DynamoDB table
+    Get the account the function runs in, from ACCOUNT_ID or else STS (looked up once)
+    :return: The account id
+    """
+    global accountId
+    if not accountId:
+        accountId = boto3.client('sts').get_caller_identity()['Account']
+    return accountId
+
+def storeQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", sendQuotaThresholdEvent=False):
+    """
+    Update the quota usage in the DynamoDB table and append it to the usage history, without alerting
     :param quotaCode: The quota code
     :param serviceCode: The service code
     :param serviceQuotaValue: The service quota value
     :param usageValue: The usage value
     :param resourceListCrossingThreshold: The resource list crossing threshold
-    :return: None
+    :param sendQuotaThresholdEvent: Whether the quota is over its threshold
+    :return: (resourceListUri, forecast) for the alert of the usage
     """
     # Update the quota usage in the DynamoDB table
     logger.info(f"Updating quota usage in DynamoDB table for {serviceCode}:{quotaCode}")
+    resourceList, resourceCount, resourceListUri = quota_resources.boundResourceList(
+        resourceListCrossingThreshold, f"{getAccountId()}/{region}/{quotaCode}", resourceListOverflow)
+    resourceAttributes = {}
+    if resourceCount:
+        resourceAttributes['ResourceCount'] = {'N': str(resourceCount)}
+    if resourceListUri:
+        resourceAttributes['ResourceListUri'] = {'S': resourceListUri}
     response = ddb.put_item(
         Item={
+            **resourceAttributes,
+            **quota_breaches.breachAttributes(getAccountId(), serviceQuotaValue, usageValue, sendQuotaThresholdEvent),
             'QuotaCode': {
                 'S': quotaCode,
             },
@@ -67,7 +106,7 @@ def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageVal
                 'N': usageValue,
             },
             'ResourceList': {
-                'S': resourceListCrossingThreshold,
+                'S': resourceList,
             },
             'Region': {
                 'S': region,
@@ -78,42 +117,54 @@ def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageVal
     )
     
     logger.debug(response)
-    if sendQuotaThresholdEvent == True:
-        sendQuotaExceededEvent(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold)
 
+    forecast = None
+    if historyStore:
+        forecast = quota_history.appendAndForecast(historyStore, region, quotaCode, serviceCode, serviceQuotaValue, usageValue)
+    return resourceListUri, forecast
 
 
-def sendQuotaExceededEvent(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold=""):
+def updateQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", sendQuotaThresholdEvent=False):
     """
-    Send the quota exceeded event to the event bridge
+    Update the quota usage in the DynamoDB table and alert on it
     :param quotaCode: The quota code
     :param serviceCode: The service code
     :param serviceQuotaValue: The service quota value
     :param usageValue: The usage value
     :param resourceListCrossingThreshold: The resource list crossing threshold
+    :param sendQuotaThresholdEvent: Whether the quota is over its threshold
+    :return: None
+    """
+    resourceListUri, forecast = storeQuotaUsage(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent)
+
+    # Alert when exhaustion is forecast, even below the threshold
+    if quota_history.isForecastBreach(forecast) and sendQuotaThresholdEvent == False:
+        logger.warning(f"Forecast breach for {serviceCode}:{quotaCode} in {region}")
+        sendQuotaThresholdEvent = True
+
+    # Alerts are suppressed while a breach persists and sent in batches by flushAlerts()
+    alertPipeline.submit(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, sendQuotaThresholdEvent, forecast, resourceListUri)
+
+
+
+def sendQuotaExceededEvent(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold="", forecast=None):
+    """
+    Queue a quota exceeded event for the event bridge, bypassing breach suppression
+    :param quotaCode: The quota code
+    :param serviceCode: The service code
+    :param serviceQuotaValue: The service quota value
+    :param usageValue: The usage value
+    :param resourceListCrossingThreshold: The resource list crossing threshold
+    :param forecast: The time-to-exhaustion forecast, if any
     :return: None
     """
-    # Update the quota usage in the DynamoDB table
     logger.info(f"Sending quota exceeded event for {serviceCode}:{quotaCode}")    
+    alertPipeline.enqueue(region, quotaCode, serviceCode, serviceQuotaValue, usageValue, resourceListCrossingThreshold, forecast)
 
-    data = {
-        "QuotaCode" : quotaCode,
-        "LimitValue" : serviceQuotaValue,
-        "Region" : region,
-        "ResourceList" : resourceListCrossingThreshold,
-        "ServiceCode" : serviceCode,
-        "UsageValue" : usageValue
-        }    
-
-    response = eventbridge.put_events(
-        Entries=[
-            {
-                'Source':'quota-guard',
-                'DetailType':'quota-threshold-event',
-                'Detail': json.dumps(data),
-                'EventBusName': eventBus
-            }
-        ]
-    )
-    
-    logger.info(response)
\ No newline at end of file
+
+def flushAlerts():
+    """
+    Send all queued quota events and persist the alert state
+    :return: None
+    """
+    alertPipeline.flush()
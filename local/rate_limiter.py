@@ -0,0 +1,239 @@
+import json
+import os
+import boto3
+import logging
+import sys
+import threading
+import time
+
+
+# Setup logger
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Add a stdout handler if one doesn't exist already
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+# Default client-side rate (requests per second) applied to every (service, operation, region)
+# key that has no explicit entry in API_RATE_LIMITS. A value of 0 disables the limiter.
+DEFAULT_RATE = float(os.environ.get('API_RATE_LIMIT_DEFAULT', '10'))
+
+# Lowest rate a bucket can be backed off to after repeated throttling
+MIN_RATE = float(os.environ.get('API_RATE_LIMIT_MIN', '0.5'))
+
+# Error codes returned by AWS APIs when a request is throttled
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'SlowDown',
+    'EC2ThrottledException',
+}
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate backs off on throttling and recovers on success
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: The configured refill rate in requests per second
+        :param burst: The bucket capacity (defaults to the rate, minimum 1)
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, float(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it
+        :return: The number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self):
+        """
+        Halve the refill rate and drain the bucket after a throttling error
+        :return: The new rate
+        """
+        with self.lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            return self.rate
+
+    def succeeded(self):
+        """
+        Recover the refill rate additively towards the configured rate
+        :return: The new rate
+        """
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + max(0.1, self.max_rate / 20))
+            return self.rate
+
+
+class ApiRateLimiter:
+    """
+    Client-side rate limiter keyed by (service, operation, region)
+
+    Rates are looked up from the most to the least specific entry, e.g.
+    {"ec2:DescribeVpcs:us-east-1": 2, "ec2:DescribeVpcs": 5, "ec2": 20}, falling back to the default rate.
+    """
+
+    def __init__(self, rates=None, default_rate=DEFAULT_RATE):
+        """
+        :param rates: Dict of "service[:operation[:region]]" to requests per second
+        :param default_rate: Rate used when no entry in rates matches
+        """
+        self.rates = rates or {}
+        self.default_rate = float(default_rate)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Build a limiter from the API_RATE_LIMITS (JSON) and API_RATE_LIMIT_DEFAULT environment variables
+        :return: An ApiRateLimiter
+        """
+        rates = {}
+        raw_rates = os.environ.get('API_RATE_LIMITS', '')
+        if raw_rates:
+            try:
+                rates = json.loads(raw_rates)
+            except ValueError as e:
+                logger.error(f"Ignoring invalid API_RATE_LIMITS value: {e}")
+        return cls(rates, DEFAULT_RATE)
+
+    def rate_for(self, service, operation, region):
+        """
+        Resolve the configured rate for a key
+        :return: The rate in requests per second (0 means unlimited)
+        """
+        for candidate in (f"{service}:{operation}:{region}", f"{service}:{operation}", service):
+            if candidate in self.rates:
+                return float(self.rates[candidate])
+        return self.default_rate
+
+    def bucket(self, service, operation, region):
+        """
+        Get or create the bucket for a key
+        :return: A TokenBucket, or None when the key is unlimited
+        """
+        key = (service, operation, region)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    rate = self.rate_for(service, operation, region)
+                    bucket = TokenBucket(rate) if rate > 0 else None
+                    self.buckets[key] = bucket
+        return bucket
+
+    def acquire(self, service, operation, region):
+        """
+        Wait for permission to issue one call
+        :return: None
+        """
+        bucket = self.bucket(service, operation, region)
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited > 1:
+                logger.debug(f"Rate limiter delayed {service}:{operation} in {region} by {waited:.2f}s")
+
+    def throttled(self, service, operation, region):
+        """
+        Back off the rate for a key after a throttling error
+        :return: None
+        """
+        bucket = self.bucket(service, operation, region)
+        if bucket is not None:
+            rate = bucket.throttled()
+            logger.warning(f"Throttled on {service}:{operation} in {region}. Backing off to {rate:.2f} requests/s")
+
+    def succeeded(self, service, operation, region):
+        """
+        Let the rate for a key recover after a successful call
+        :return: None
+        """
+        bucket = self.bucket(service, operation, region)
+        if bucket is not None:
+            bucket.succeeded()
+
+    def _before_parameter_build(self, model, context, **kwargs):
+        if context.get('quota_guard_cache_hit'):
+            # Answered from the plan's response cache, no request is sent
+            return
+        self.acquire(model.service_model.service_name, model.name, context.get('client_region'))
+
+    def _after_call(self, http_response, model, context, **kwargs):
+        if http_response is not None and http_response.status_code < 300:
+            self.succeeded(model.service_model.service_name, model.name, context.get('client_region'))
+
+    def _needs_retry(self, response=None, operation=None, request_dict=None, **kwargs):
+        if response is None or operation is None:
+            return None
+        error_code = response[1].get('Error', {}).get('Code')
+        if error_code in THROTTLING_ERROR_CODES:
+            context = (request_dict or {}).get('context', {})
+            self.throttled(operation.service_model.service_name, operation.name, context.get('client_region'))
+        # Never decide on the retry itself, botocore's retry handler does that
+        return None
+
+    def install(self, session=None):
+        """
+        Register the limiter on a boto3 session so every client created from it afterwards is limited
+        :param session: The boto3 session (defaults to the boto3 default session)
+        :return: None
+        """
+        if session is None:
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            session = boto3.DEFAULT_SESSION
+        session.events.register('before-parameter-build', self._before_parameter_build, unique_id='quota-guard-rate-limiter-before-parameter-build')
+        session.events.register('after-call', self._after_call, unique_id='quota-guard-rate-limiter-after-call')
+        session.events.register('needs-retry', self._needs_retry, unique_id='quota-guard-rate-limiter-needs-retry')
+
+
+# Shared limiter used by all quota functions and parallel executors in this process
+limiter = ApiRateLimiter.from_environment()
+
+
+def install(session=None):
+    """
+    Install the shared limiter on a boto3 session
+    :param session: The boto3 session (defaults to the boto3 default session)
+    :return: None
+    """
+    limiter.install(session)
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import sys
+
+import boto3
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_accounts
+import quota_cache
+import quota_planner
+
+# SAML providers of each fake account
+PROVIDERS = {'111111111111': 3, '222222222222': 50}
+
+
+class FakeClient:
+    """
+    IAM and Service Quotas stand-in answering for the account of the current default session credentials
+    """
+
+    def __init__(self, accountId):
+        self.accountId = accountId
+
+    def get_service_quota(self, ServiceCode, QuotaCode):
+        return {'Quota': {'Value': 100.0}}
+
+    def list_saml_providers(self):
+        return {'SAMLProviderList': [{'Arn': f"arn:aws:iam::{self.accountId}:saml-provider/p{i}"}
+                                     for i in range(PROVIDERS[self.accountId])]}
+
+    def get_saml_provider(self, SAMLProviderArn):
+        return {'SAMLMetadataDocument': ''}
+
+
+def fakeClient(service, *args, **kwargs):
+    # LocalSts access keys end with the account id
+    accessKey = boto3.DEFAULT_SESSION.get_credentials().access_key
+    return FakeClient(accessKey[-12:])
+
+
+def evaluate(checks):
+    import aws_quotas
+    for check in checks:
+        getattr(aws_quotas, check.functionName)(serviceCode=check.serviceCode, quotaCode=check.quotaCode,
+                                                threshold=check.threshold, region=check.region)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='the fake clients reach the workers by forking')
+def test_worker_reused_across_accounts_reports_each_account(monkeypatch):
+    monkeypatch.setenv('IS_TESTING_ENABLED', '1')
+    monkeypatch.setattr(boto3, 'client', fakeClient)
+    quota_cache.configure([{'QuotaCode': 'L-DB618D39', 'CacheTTLMinutes': 60}])
+    plan = quota_planner.buildPlan([quota_planner.Check('iam', 'L-DB618D39', '80', 'us-east-1')], quota_planner.loadManifest())
+    written = {}
+
+    errors = quota_accounts.scanAccounts(list(PROVIDERS), 'QuotaGuardScannerRole', plan, evaluate,
+                                         lambda accountId, records: written.setdefault(accountId, records), maxWorkers=1)
+
+    assert errors == {}
+    usage = {accountId: {record[1]: record[4] for record in records} for accountId, records in written.items()}
+    assert usage == {'111111111111': {'L-DB618D39': '3'}, '222222222222': {'L-DB618D39': '50'}}
@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_alerts
+
+
+class FakeEvents:
+    """
+    EventBridge stand-in recording the PutEvents calls, rejecting the entries of the quotas in reject
+    """
+
+    def __init__(self, reject=()):
+        self.calls = []
+        self.reject = set(reject)
+
+    def put_events(self, Entries):
+        self.calls.append(Entries)
+        results = [{'ErrorCode': 'InternalFailure'} if json.loads(entry['Detail'])['QuotaCode'] in self.reject else {'EventId': 'id'}
+                   for entry in Entries]
+        return {'FailedEntryCount': sum('ErrorCode' in result for result in results), 'Entries': results}
+
+    def alertTypes(self):
+        return [json.loads(entry['Detail'])['AlertType'] for call in self.calls for entry in call]
+
+
+class FakeDynamo:
+    """
+    DynamoDB stand-in keeping the alert state items of one table
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.writes = []
+
+    def batch_write_item(self, RequestItems):
+        for requests in RequestItems.values():
+            self.writes.extend(requests)
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    self.items[(item['StateKey']['S'], item['Resource']['S'])] = item
+                else:
+                    key = request['DeleteRequest']['Key']
+                    del self.items[(key['StateKey']['S'], key['Resource']['S'])]
+        return {}
+
+    def get_paginator(self, operation):
+        items = list(self.items.values())
+        return type('Paginator', (), {'paginate': lambda self, **kwargs: [{'Items': items}]})()
+
+
+def run(events, store, observations):
+    """
+    One run of the pipeline over (quotaCode, usage, breaching) observations of a quota with a limit of 100
+    """
+    pipeline = quota_alerts.AlertPipeline(events, 'bus', store)
+    for quotaCode, usage, breaching in observations:
+        pipeline.submit('us-east-1', quotaCode, 'ec2', '100', str(usage), '', breaching)
+    pipeline.flush()
+
+
+def test_batches_stay_within_the_put_events_limits():
+    events = FakeEvents()
+    pipeline = quota_alerts.AlertPipeline(events, 'bus')
+    bigList = json.dumps([{'resourceARN': 'r' * 60000, 'usageValue': 1}])
+    for i in range(23):
+        pipeline.enqueue('us-east-1', f"L-{i}", 'ec2', '100', '90', bigList if i % 3 == 0 else '')
+    pipeline.flush()
+
+    assert sum(len(call) for call in events.calls) == 23
+    for call in events.calls:
+        assert len(call) <= quota_alerts.MAX_ENTRIES_PER_CALL
+        assert sum(quota_alerts.entrySize(entry) for entry in call) <= quota_alerts.MAX_BYTES_PER_CALL
+
+
+def test_rejected_alert_is_sent_again_on_the_next_run(tmp_path):
+    store = quota_alerts.JsonFileAlertStateStore(str(tmp_path / 'alerts.json'))
+    rejecting = FakeEvents(reject={'L-1'})
+    run(rejecting, store, [('L-1', 90, True), ('L-2', 90, True)])
+    assert rejecting.alertTypes() == [quota_alerts.NEW_BREACH, quota_alerts.NEW_BREACH]
+
+    events = FakeEvents()
+    run(events, quota_alerts.JsonFileAlertStateStore(store.path), [('L-1', 90, True), ('L-2', 90, True)])
+
+    assert [json.loads(entry['Detail'])['QuotaCode'] for call in events.calls for entry in call] == ['L-1']
+
+
+def test_repeated_breach_is_suppressed(tmp_path):
+    path = str(tmp_path / 'alerts.json')
+    run(FakeEvents(), quota_alerts.JsonFileAlertStateStore(path), [('L-1', 85, True)])
+    events = FakeEvents()
+    run(events, quota_alerts.JsonFileAlertStateStore(path), [('L-1', 85 + quota_alerts.ESCALATION_STEP_PERCENT - 1, True)])
+
+    assert events.calls == []
+
+
+def test_escalation_fires_at_the_step(tmp_path):
+    path = str(tmp_path / 'alerts.json')
+    run(FakeEvents(), quota_alerts.JsonFileAlertStateStore(path), [('L-1', 80, True)])
+    events = FakeEvents()
+    run(events, quota_alerts.JsonFileAlertStateStore(path), [('L-1', 80 + quota_alerts.ESCALATION_STEP_PERCENT, True)])
+
+    assert events.alertTypes() == [quota_alerts.ESCALATION]
+
+
+def test_recovery_fires_after_the_clear_runs(tmp_path):
+    path = str(tmp_path / 'alerts.json')
+    run(FakeEvents(), quota_alerts.JsonFileAlertStateStore(path), [('L-1', 90, True)])
+    sent = []
+    for _ in range(quota_alerts.RECOVERY_RUNS):
+        events = FakeEvents()
+        run(events, quota_alerts.JsonFileAlertStateStore(path), [('L-1', 10, False)])
+        sent.append(events.alertTypes())
+
+    assert sent == [[]] * (quota_alerts.RECOVERY_RUNS - 1) + [[quota_alerts.RECOVERY]]
+    events = FakeEvents()
+    run(events, quota_alerts.JsonFileAlertStateStore(path), [('L-1', 90, True)])
+    assert events.alertTypes() == [quota_alerts.NEW_BREACH]
+
+
+def test_dynamo_store_writes_one_item_per_changed_resource(monkeypatch):
+    ddb = FakeDynamo()
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: ddb)
+    resources = json.dumps([{'resourceARN': f"vpc-{i}", 'usageValue': 90} for i in range(30)])
+
+    pipeline = quota_alerts.AlertPipeline(FakeEvents(), 'bus', quota_alerts.DynamoAlertStateStore('alerts'))
+    pipeline.submit('us-east-1', 'L-1', 'ec2', '100', '90', resources, True)
+    pipeline.flush()
+    assert len(ddb.items) == 30
+
+    ddb.writes.clear()
+    pipeline = quota_alerts.AlertPipeline(FakeEvents(), 'bus', quota_alerts.DynamoAlertStateStore('alerts'))
+    pipeline.submit('us-east-1', 'L-1', 'ec2', '100', '90', json.dumps([{'resourceARN': 'vpc-0', 'usageValue': 90}]), True)
+    pipeline.flush()
+    # Only the cleared resources are rewritten, vpc-0 is unchanged
+    assert len(ddb.writes) == 29 and all('PutRequest' in request for request in ddb.writes)
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import quota_counters
+import quota_specs
+
+# Recorded CloudTrail events and the scan payloads they are compared with
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'lambda-code')
+
+ZONES = {'subnet-0000000000000000a': 'us-east-1a', 'subnet-0000000000000000b': 'us-east-1b'}
+
+
+class FakeEc2:
+    """
+    Answers the subnet lookups of NAT gateway events
+    """
+
+    def describe_subnets(self, SubnetIds):
+        return {'Subnets': [{'SubnetId': subnetId, 'AvailabilityZone': ZONES[subnetId]} for subnetId in SubnetIds]}
+
+
+def test_replayed_events_match_full_scans(monkeypatch, capsys):
+    monkeypatch.setenv('IS_TESTING_ENABLED', '1')
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: FakeEc2())
+    monkeypatch.chdir(FIXTURES)
+    store = quota_counters.JsonFileCounterStore(None)
+
+    touched = quota_counters.replay('tests/counter_events.json', store)
+
+    assert touched == {('L-1B52E74A', 'us-east-1'), ('L-FE5A380F', 'us-east-1'), ('L-F55AF5E4', quota_specs.GLOBAL)}
+    # 17 gateway endpoints created, one of them twice, one deleted; the Interface endpoint is not counted
+    assert store.counts(quota_counters.counterKey('L-1B52E74A', 'us-east-1')) == (None, {'': 16})
+    assert store.counts(quota_counters.counterKey('L-FE5A380F', 'us-east-1')) == (None, {'us-east-1a': 1, 'us-east-1b': 1})
+    # The failed CreateUser is ignored
+    assert store.counts(quota_counters.counterKey('L-F55AF5E4', quota_specs.GLOBAL)) == (None, {'': 2})
+
+    assert app.compare_counters(touched, store, 'us-east-1') == 0
+    assert 'MISMATCH' not in capsys.readouterr().out
+
+
+def test_redelivered_delete_is_applied_once():
+    store = quota_counters.JsonFileCounterStore(None)
+    create = {'eventSource': 'iam.amazonaws.com', 'eventName': 'CreateUser', 'awsRegion': 'us-east-1',
+              'responseElements': {'user': {'userName': 'alice'}}}
+    delete = {'eventSource': 'iam.amazonaws.com', 'eventName': 'DeleteUser', 'awsRegion': 'us-east-1',
+              'requestParameters': {'userName': 'alice'}}
+
+    assert [quota_counters.applyEvent(event, store) for event in (create, create, delete, delete)] == [1, 0, 1, 0]
+    assert store.counts(quota_counters.counterKey('L-F55AF5E4', quota_specs.GLOBAL)) == (None, {})
+
+
+def test_reconcile_replaces_a_drifted_counter(monkeypatch):
+    monkeypatch.setenv('IS_TESTING_ENABLED', '1')
+    monkeypatch.chdir(FIXTURES)
+    store = quota_counters.JsonFileCounterStore(None)
+    key = quota_counters.counterKey('L-F55AF5E4', quota_specs.GLOBAL)
+    store.add(key, 'mallory', quota_counters.NO_GROUP)
+
+    assert quota_counters.reconcile('L-F55AF5E4', 'us-east-1', store, now=1000.0) == {'': 2}
+    assert store.counts(key) == (1000.0, {'': 2})
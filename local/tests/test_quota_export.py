@@ -0,0 +1,48 @@
+import os
+import sys
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_export
+
+
+class FakeServiceQuotas:
+    """
+    Service Quotas stand-in of one region, denying every call when the region is not enabled
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def get_paginator(self, operation):
+        return type('Paginator', (), {'paginate': lambda paginator, **kwargs: self._pages(operation, **kwargs)})()
+
+    def _pages(self, operation, ServiceCode=None):
+        if not self.enabled:
+            raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, operation)
+        if operation == 'list_services':
+            return [{'Services': [{'ServiceCode': 'ec2'}]}]
+        return [{'Quotas': [{'QuotaCode': 'L-1', 'QuotaName': 'Quota', 'Value': 10.0, 'Adjustable': True}]}]
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+
+def test_failed_region_does_not_stop_the_other_regions():
+    clients = SimpleNamespace(serviceQuotas={'us-east-1': FakeServiceQuotas(), 'ap-east-1': FakeServiceQuotas(enabled=False)})
+    writer = ListWriter()
+
+    total, withUsage, failed = quota_export.export(clients, '111111111111', ['us-east-1', 'ap-east-1'], None,
+                                                   quota_export.UsageIndex(), writer, metrics=False, workers=2)
+
+    assert (total, withUsage) == (1, 0)
+    assert [row[1:4] for row in writer.rows] == [('us-east-1', 'ec2', 'L-1')]
+    assert failed == [(quota_export.ALL_SERVICES, 'ap-east-1')]
@@ -0,0 +1,160 @@
+import os
+import sys
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_collectors
+import quota_iam_digests
+
+GROUPS = 'L-7A1621EC'
+POLICIES = 'L-4019AD8B'
+ACCESS_KEYS = 'L-8758042E'
+
+
+class FakeIam:
+    """
+    IAM stand-in: users with their groups (part of the digest) and the item count of every per-user
+    listing, recording the per-user listings issued
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self.failing = set()
+        self.calls = []
+
+    def get_paginator(self, operation):
+        return type('Paginator', (), {'paginate': lambda paginator, **kwargs: self._pages(operation, **kwargs)})()
+
+    def _pages(self, operation, UserName=None, **kwargs):
+        if operation == 'get_account_authorization_details':
+            return [{'UserDetailList': [{'UserName': name, 'Arn': arn(name), 'UserId': name.upper(), 'GroupList': user['Groups']}
+                                        for name, user in self.users.items()]}]
+        self.calls.append((operation, UserName))
+        if operation in self.failing:
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'denied'}}, operation)
+        resultKey = dict(quota_collectors.IAM_PER_USER_OPERATIONS.values())[operation]
+        return [{resultKey: [{}] * self.users[UserName].get(operation, 1)}]
+
+    def swept(self, operation):
+        return sorted(user for called, user in self.calls if called == operation)
+
+
+def arn(name):
+    return f"arn:aws:iam::111111111111:user/{name}"
+
+
+@pytest.fixture
+def iam(monkeypatch):
+    iam = FakeIam({name: {'Groups': ['dev']} for name in ('alice', 'bob', 'carol')})
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: iam)
+    yield iam
+    quota_iam_digests.configure(None)
+    quota_collectors.reset()
+
+
+def run(iam, store, quotaCodes):
+    """
+    One run of the per-user quotas in incremental mode
+    :return: Dict of quota code to {user Arn: count}, or to the error of its listing
+    """
+    iam.calls.clear()
+    quota_collectors.reset()
+    quota_iam_digests.configure(store)
+    for quotaCode in quotaCodes:
+        quota_collectors.expect(quota_collectors.IAM_SNAPSHOT, 'us-east-1', quotaCode)
+    snapshot = quota_collectors.iamSnapshot('us-east-1')
+    results = {}
+    for quotaCode in quotaCodes:
+        try:
+            results[quotaCode] = snapshot.perUserCounts(quotaCode)
+        except ClientError as e:
+            results[quotaCode] = e
+    return results
+
+
+def test_unchanged_digest_keeps_its_stored_counts(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    run(iam, store, [GROUPS])
+    # A count change without a digest change is only seen by the next full scan
+    iam.users['alice']['list_groups_for_user'] = 5
+
+    results = run(iam, store, [GROUPS])
+
+    assert iam.swept('list_groups_for_user') == []
+    assert results[GROUPS] == {arn(name): 1 for name in ('alice', 'bob', 'carol')}
+
+
+def test_changed_digest_is_swept_again(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    run(iam, store, [GROUPS])
+    iam.users['bob'] = {'Groups': ['dev', 'ops'], 'list_groups_for_user': 2}
+
+    results = run(iam, store, [GROUPS])
+
+    assert iam.swept('list_groups_for_user') == ['bob']
+    assert results[GROUPS][arn('bob')] == 2
+    assert store.load()[1][arn('bob')]['Counts'] == {GROUPS: 2}
+
+
+def test_due_full_scan_sweeps_every_user(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    run(iam, store, [GROUPS])
+    iam.users['alice']['list_groups_for_user'] = 5
+    store.state['FullScanAt'] -= quota_iam_digests.FULL_SCAN_INTERVAL_MINUTES * 60 + 1
+
+    results = run(iam, store, [GROUPS])
+
+    assert iam.swept('list_groups_for_user') == ['alice', 'bob', 'carol']
+    assert results[GROUPS][arn('alice')] == 5
+
+
+def test_deleted_users_are_removed(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    run(iam, store, [GROUPS])
+    del iam.users['carol']
+
+    results = run(iam, store, [GROUPS])
+
+    assert arn('carol') not in results[GROUPS]
+    assert sorted(store.load()[1]) == [arn('alice'), arn('bob')]
+
+
+def test_failed_quota_counts_are_not_persisted(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    iam.failing.add('list_attached_user_policies')
+
+    results = run(iam, store, [GROUPS, POLICIES])
+
+    assert isinstance(results[POLICIES], ClientError)
+    assert all(entry['Counts'] == {GROUPS: 1} for entry in store.load()[1].values())
+
+    iam.failing.clear()
+    results = run(iam, store, [GROUPS, POLICIES])
+
+    assert iam.swept('list_attached_user_policies') == ['alice', 'bob', 'carol']
+    assert iam.swept('list_groups_for_user') == ['alice', 'bob', 'carol']
+    assert results[POLICIES] == {arn(name): 1 for name in ('alice', 'bob', 'carol')}
+
+
+def test_quotas_outside_the_digest_are_swept_on_every_run(iam):
+    store = quota_iam_digests.JsonFileDigestStore(None)
+    run(iam, store, [GROUPS, ACCESS_KEYS])
+    iam.users['alice']['list_access_keys'] = 2
+
+    results = run(iam, store, [GROUPS, ACCESS_KEYS])
+
+    assert iam.swept('list_access_keys') == ['alice', 'bob', 'carol']
+    assert iam.swept('list_groups_for_user') == []
+    assert results[ACCESS_KEYS][arn('alice')] == 2
+    assert all(ACCESS_KEYS not in entry['Counts'] for entry in store.load()[1].values())
+
+
+def test_stale_users_without_the_counts_of_a_new_quota():
+    cached = {'a': {'Digest': 'd1', 'Counts': {GROUPS: 1}}, 'b': {'Digest': 'd2', 'Counts': {GROUPS: 1, POLICIES: 1}}}
+
+    assert quota_iam_digests.staleUsers({'a': 'd1', 'b': 'd2'}, cached, 1000.0, [GROUPS, POLICIES], now=1001.0) == (False, ['a'])
+    assert quota_iam_digests.staleUsers({'a': 'd1', 'b': 'd2'}, cached, None, [GROUPS], now=1001.0) == (True, ['a', 'b'])
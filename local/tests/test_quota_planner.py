@@ -0,0 +1,115 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import boto3
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_planner
+import rate_limiter
+
+# Two quotas reading the VPCs, so the plan shares ec2:describe_vpcs between them
+CHECKS = [quota_planner.Check('vpc', 'L-83CA0A9D', '80', 'us-east-1'), quota_planner.Check('vpc', 'L-7E9ECCDB', '80', 'us-east-1')]
+
+
+class CountingLimiter(rate_limiter.ApiRateLimiter):
+    """
+    Limiter counting the calls it let through per operation
+    """
+
+    def __init__(self):
+        super().__init__(default_rate=1000)
+        self.acquired = []
+
+    def acquire(self, service, operation, region):
+        self.acquired.append(operation)
+        super().acquire(service, operation, region)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """
+    Default session whose calls are answered by a before-call stub counting the requests that reached it
+    """
+    session = boto3.Session(aws_access_key_id='testing', aws_secret_access_key='testing', region_name='us-east-1')
+    session.sent = []
+
+    def answer(model, **kwargs):
+        session.sent.append(model.name)
+        return SimpleNamespace(status_code=200), {'Vpcs': [{'VpcId': 'vpc-1'}], 'VpcPeeringConnections': []}
+
+    session.events.register('before-call', answer)
+    monkeypatch.setattr(boto3, 'DEFAULT_SESSION', session)
+    session.limiter = CountingLimiter()
+    session.limiter.install(session)
+    return session
+
+
+def readVpcs(checks):
+    ec2 = boto3.client('ec2', region_name=checks[0].region)
+    ec2.describe_vpcs()
+    if checks[0].quotaCode == 'L-7E9ECCDB':
+        ec2.describe_vpc_peering_connections()
+
+
+def test_shared_api_is_answered_from_the_cache(session):
+    cache = quota_planner.ResponseCache()
+    plan = quota_planner.buildPlan(CHECKS, quota_planner.loadManifest())
+
+    hits = quota_planner.execute(plan, readVpcs, cache)
+
+    assert hits == 1
+    assert session.sent == ['DescribeVpcs', 'DescribeVpcPeeringConnections']
+    # The cache hit never waited on the limiter
+    assert session.limiter.acquired == ['DescribeVpcs', 'DescribeVpcPeeringConnections']
+    # Released after its last consumer
+    assert cache.responses == {} and not cache.retained
+
+
+def test_cached_responses_are_copies(session):
+    cache = quota_planner.ResponseCache()
+    plan = quota_planner.buildPlan(CHECKS, quota_planner.loadManifest())
+    seen = []
+
+    def mutate(checks):
+        vpcs = boto3.client('ec2', region_name=checks[0].region).describe_vpcs()['Vpcs']
+        seen.append(len(vpcs))
+        vpcs.clear()
+
+    quota_planner.execute(plan, mutate, cache)
+
+    assert seen == [1, 1]
+
+
+def test_responses_are_dropped_when_an_evaluation_fails(session):
+    cache = quota_planner.ResponseCache()
+    plan = quota_planner.buildPlan(CHECKS, quota_planner.loadManifest())
+
+    def failing(checks):
+        readVpcs(checks)
+        raise RuntimeError('evaluation failed')
+
+    with pytest.raises(RuntimeError):
+        quota_planner.execute(plan, failing, cache)
+
+    assert cache.responses == {} and not cache.retained
+
+
+def test_only_retained_read_apis_are_cached(session):
+    cache = quota_planner.ResponseCache()
+    cache.retain('ec2:create_vpc')
+    cache.retain('ec2:describe_vpcs')
+    cache.install(session)
+    ec2 = boto3.client('ec2', region_name='us-east-1')
+
+    ec2.describe_subnets()
+    ec2.describe_subnets()
+    ec2.describe_vpcs()
+    ec2.describe_vpcs()
+    cache.release('ec2:describe_vpcs')
+    ec2.describe_vpcs()
+
+    assert 'ec2:create_vpc' not in cache.retained
+    assert session.sent == ['DescribeSubnets', 'DescribeSubnets', 'DescribeVpcs', 'DescribeVpcs']
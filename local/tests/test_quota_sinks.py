@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import time
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import quota_alerts
+import quota_history
+import quota_resources
+import quota_sinks
+
+
+class FakeAws:
+    """
+    DynamoDB and EventBridge stand-in recording the stored items and the sent events
+    """
+
+    def __init__(self):
+        self.items = []
+        self.events = []
+
+    def put_item(self, Item, **kwargs):
+        self.items.append(Item)
+
+    def put_events(self, Entries):
+        self.events.extend(json.loads(entry['Detail']) for entry in Entries)
+        return {'FailedEntryCount': 0, 'Entries': [{'EventId': 'id'} for _ in Entries]}
+
+
+def test_dynamodb_and_eventbridge_sinks_send_each_alert_once_with_forecast_and_uri(monkeypatch, tmp_path):
+    aws = FakeAws()
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: aws)
+    import quota_update_dynamo
+    monkeypatch.setattr(quota_update_dynamo, 'ddb', aws)
+    monkeypatch.setattr(quota_update_dynamo, 'accountId', '111111111111')
+    monkeypatch.setattr(quota_update_dynamo, 'resourceListOverflow', quota_resources.LocalFileOverflow(str(tmp_path)))
+    history = quota_history.SqliteHistoryStore(str(tmp_path / 'history.db'))
+    now = time.time()
+    for hoursAgo, usage in ((3, 10), (2, 40), (1, 70)):
+        history.append('us-east-1', 'L-1', 'ec2', 100, usage, now - hoursAgo * 3600)
+    monkeypatch.setattr(quota_update_dynamo, 'historyStore', history)
+
+    # Listed first, the alert sink still runs after the storing sink
+    sink = quota_sinks.buildSink('eventbridge,dynamodb', {
+        'dynamodb': app.dynamodb_sink,
+        'eventbridge': lambda: quota_sinks.EventBridgeSink('bus', quota_alerts.JsonFileAlertStateStore(str(tmp_path / 'alerts.json'))),
+    })
+    # Below the threshold but growing 30 per hour towards the limit
+    sink.write(quota_sinks.QuotaRecord('us-east-1', 'L-1', 'ec2', '100', '75'))
+    resources = json.dumps([{'resourceARN': f"vpc-{i}", 'usageValue': 90} for i in range(quota_resources.TOP_K + 1)])
+    sink.write(quota_sinks.QuotaRecord('us-east-1', 'L-2', 'ec2', '100', '90', resources, True))
+    sink.close()
+
+    assert [item['QuotaCode']['S'] for item in aws.items] == ['L-1', 'L-2']
+    assert [(event['QuotaCode'], event['AlertType']) for event in aws.events] == [('L-1', quota_alerts.NEW_BREACH), ('L-2', quota_alerts.NEW_BREACH)]
+    assert aws.events[0]['Forecast']['HoursToExhaustion'] < quota_history.FORECAST_HORIZON_HOURS
+    assert aws.events[1]['ResourceListUri'] == aws.items[1]['ResourceListUri']['S']
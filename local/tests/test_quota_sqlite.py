@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota_sqlite
+
+ACCOUNT = '111111111111'
+OTHER = '222222222222'
+
+
+def test_exact_account_usage_wins_over_the_account_less_one(tmp_path):
+    path = str(tmp_path / 'quota_usage.db')
+    # Written without credentials, then by the account itself
+    sink = quota_sqlite.SqliteSink(path, accountId='')
+    sink.writeAccount('', [('us-east-1', 'L-1', 'ec2', '10', '3', '', False)])
+    sink.writeAccount(ACCOUNT, [('us-east-1', 'L-1', 'ec2', '10', '5', '', False)])
+    sink.close()
+    export = tmp_path / 'service_quotas.csv'
+    with open(export, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(quota_sqlite.EXPORT_HEADERS)
+        for accountId in (ACCOUNT, OTHER):
+            writer.writerow([accountId, 'us-east-1', 'ec2', 'L-1', 'Quota', '10', '10', 'True', '', ''])
+
+    output = tmp_path / 'merged.csv'
+    assert quota_sqlite.mergeServiceQuotas(quota_sqlite.connect(path), str(export), str(output)) == (2, 2)
+
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['accountId'], row['usageValue'], row['usagePct']) for row in rows] == [(ACCOUNT, '5', '50.00'), (OTHER, '3', '30.00')]
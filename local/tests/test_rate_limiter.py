@@ -0,0 +1,93 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+
+
+def operationModel(service, operation):
+    return SimpleNamespace(name=operation, service_model=SimpleNamespace(service_name=service))
+
+
+def test_throttled_halves_the_rate_down_to_the_floor(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'MIN_RATE', 1.5)
+    bucket = rate_limiter.TokenBucket(10)
+
+    assert bucket.throttled() == 5
+    assert bucket.tokens == 0
+    assert bucket.throttled() == 2.5
+    assert bucket.throttled() == 1.5
+    assert bucket.throttled() == 1.5
+
+
+def test_succeeded_recovers_additively_up_to_the_configured_rate():
+    bucket = rate_limiter.TokenBucket(10)
+    bucket.throttled()
+    bucket.throttled()
+
+    # A twentieth of the configured rate per success
+    assert bucket.succeeded() == pytest.approx(3.0)
+    assert bucket.succeeded() == pytest.approx(3.5)
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_succeeded_recovers_slow_rates_by_at_least_a_tenth():
+    bucket = rate_limiter.TokenBucket(1)
+    bucket.rate = 0.5
+
+    assert bucket.succeeded() == pytest.approx(0.6)
+
+
+def test_rate_for_prefers_the_most_specific_entry():
+    limiter = rate_limiter.ApiRateLimiter({'ec2:DescribeVpcs:us-east-1': 2, 'ec2:DescribeVpcs': 5, 'ec2': 20}, default_rate=7)
+
+    assert limiter.rate_for('ec2', 'DescribeVpcs', 'us-east-1') == 2
+    assert limiter.rate_for('ec2', 'DescribeVpcs', 'eu-west-1') == 5
+    assert limiter.rate_for('ec2', 'DescribeSubnets', 'us-east-1') == 20
+    assert limiter.rate_for('iam', 'ListUsers', 'us-east-1') == 7
+
+
+def test_zero_rate_keys_are_unlimited():
+    limiter = rate_limiter.ApiRateLimiter({'iam': 0}, default_rate=10)
+
+    assert limiter.bucket('iam', 'ListUsers', 'us-east-1') is None
+    assert limiter.bucket('ec2', 'DescribeVpcs', 'us-east-1') is not None
+
+
+def test_from_environment_ignores_invalid_rates(monkeypatch):
+    monkeypatch.setenv('API_RATE_LIMITS', '{not json')
+
+    assert rate_limiter.ApiRateLimiter.from_environment().rates == {}
+
+
+def test_cache_hits_do_not_consume_tokens():
+    limiter = rate_limiter.ApiRateLimiter(default_rate=2)
+    model = operationModel('ec2', 'DescribeVpcs')
+
+    limiter._before_parameter_build(model, {'client_region': 'us-east-1', 'quota_guard_cache_hit': True})
+    assert ('ec2', 'DescribeVpcs', 'us-east-1') not in limiter.buckets
+
+    limiter._before_parameter_build(model, {'client_region': 'us-east-1'})
+    limiter._before_parameter_build(model, {'client_region': 'us-east-1', 'quota_guard_cache_hit': True})
+    assert limiter.bucket('ec2', 'DescribeVpcs', 'us-east-1').tokens == pytest.approx(1, abs=0.01)
+
+
+def test_throttling_errors_back_off_only_their_key():
+    limiter = rate_limiter.ApiRateLimiter(default_rate=8)
+    model = operationModel('ec2', 'DescribeVpcs')
+    context = {'client_region': 'us-east-1'}
+
+    limiter._needs_retry(response=(None, {'Error': {'Code': 'RequestLimitExceeded'}}), operation=model, request_dict={'context': context})
+    limiter._needs_retry(response=(None, {'Error': {'Code': 'AccessDenied'}}), operation=operationModel('ec2', 'DescribeSubnets'),
+                         request_dict={'context': context})
+
+    assert limiter.bucket('ec2', 'DescribeVpcs', 'us-east-1').rate == 4
+    assert limiter.bucket('ec2', 'DescribeSubnets', 'us-east-1').rate == 8
+    limiter._after_call(SimpleNamespace(status_code=200), model, context)
+    assert limiter.bucket('ec2', 'DescribeVpcs', 'us-east-1').rate == pytest.approx(4.4)